@@ -0,0 +1,92 @@
+import asyncio
+from collections import defaultdict
+import logging
+from typing import Awaitable, Callable
+from Common import Answer, Config
+
+logger = logging.getLogger('backend.answers')
+
+
+class AnswerBuffer:
+    """
+    Write-behind buffer for answers. Answers are acknowledged once buffered, and stored in batches
+    shortly afterwards. This smooths the burst of writes right after a question is opened.
+
+    It is only suitable for a long-running process that handles all messages for a quiz, i.e. the
+    LocalGateway. The buffer itself guarantees that each player answers a question at most once.
+    Buffered answers are lost when the process terminates.
+    """
+
+    def __init__(self, flush: Callable[[str], Awaitable], flush_interval=Config.ANSWER_FLUSH_INTERVAL):
+        """
+        The flush coroutine is invoked with the ID of a quiz that has buffered answers.
+        """
+        self.flush = flush
+        self.flush_interval = flush_interval
+
+        # Quiz ID => Question ID => Answers
+        self.__pending: dict[str, defaultdict[int, list[Answer]]] = {}
+        # Quiz ID => (Question ID, Client IDs that answered it)
+        self.__answered: dict[str, tuple[int, set[str]]] = {}
+        # Quizzes for which a flush is scheduled or running
+        self.__scheduled: set[str] = set()
+        # Quiz ID => Number of consecutive flushes that failed
+        self.__failures: dict[str, int] = {}
+        # References to the flush tasks, as the event loop only keeps weak ones
+        self.__tasks: set[asyncio.Task] = set()
+
+    def add(self, quiz_id, question_id, answer: Answer) -> bool:
+        """
+        Buffers the answer. Returns False if the client already answered the question.
+        """
+        answered_question_id, client_ids = self.__answered.get(quiz_id, (None, None))
+        if answered_question_id != question_id:
+            # Only the open question can be answered, so the index of a previous one can go
+            client_ids = set()
+            self.__answered[quiz_id] = (question_id, client_ids)
+        if answer.client_id in client_ids:
+            return False
+        client_ids.add(answer.client_id)
+
+        self.__pending.setdefault(quiz_id, defaultdict(list))[question_id].append(answer)
+        if quiz_id not in self.__scheduled:
+            self._schedule_flush(quiz_id)
+
+        return True
+
+    def take(self, quiz_id) -> dict[int, list[Answer]]:
+        """
+        Removes and returns the buffered answers for the quiz, grouped by question.
+        """
+        return self.__pending.pop(quiz_id, {})
+
+    def _schedule_flush(self, quiz_id):
+        def start_flush():
+            task = asyncio.create_task(self._flush_pending(quiz_id))
+            self.__tasks.add(task)
+            task.add_done_callback(self.__tasks.discard)
+
+        self.__scheduled.add(quiz_id)
+        asyncio.get_running_loop().call_later(self.flush_interval, start_flush)
+
+    async def _flush_pending(self, quiz_id):
+        try:
+            # The answers may have been taken already, e.g. when the question was closed
+            if quiz_id in self.__pending:
+                await self.flush(quiz_id)
+            self.__failures.pop(quiz_id, None)
+        except Exception as e:
+            logger.error(f"Failed to flush answers for Quiz {quiz_id}: {e}")
+
+            failures = self.__failures[quiz_id] = self.__failures.get(quiz_id, 0) + 1
+            if failures >= Config.MAX_ATTEMPTS:
+                # E.g. the quiz no longer exists. Give up, instead of retrying forever.
+                self.__failures.pop(quiz_id)
+                if (pending := self.__pending.pop(quiz_id, None)) is not None:
+                    logger.error(f"Dropped {sum(len(answers) for answers in pending.values())} "
+                                 f"answers for Quiz {quiz_id} after {failures} failed flushes")
+        finally:
+            # Answers that were not taken, or that were added during the flush, need another flush
+            self.__scheduled.discard(quiz_id)
+            if quiz_id in self.__pending:
+                self._schedule_flush(quiz_id)
@@ -0,0 +1,76 @@
+import asyncio
+from concurrent.futures import Executor
+import contextvars
+import functools
+from typing import Optional
+
+# Methods that only create an access wrapper, without accessing storage
+WRAPPER_METHODS = {"quiz_access", "globals_access"}
+# Methods whose result is an access wrapper
+WRAPPER_RESULT_METHODS = WRAPPER_METHODS | {"create_quiz"}
+# Properties that may access storage, as their values are loaded on first access
+LAZY_PROPERTIES = {"clients", "players", "root_user", "default_quiz_id"}
+
+
+class AsyncStorage:
+    """
+    Awaitable access to storage, and to the quiz and globals access wrappers it creates.
+
+    Methods, and properties that are loaded lazily, become awaitable. Other properties (e.g. the
+    fields of the quiz instance) are returned as is, as these do not access storage.
+
+    Storage calls block. When an executor is provided, calls run in its threads, so that the event
+    loop can serve other connections in the meantime. Otherwise, calls run inline, which suits
+    storage that is fast (i.e. local) or not thread-safe, and processes that handle one request at
+    a time.
+    """
+
+    def __init__(self, storage, executor: Optional[Executor] = None):
+        self.storage = storage
+        self.executor = executor
+
+    async def run(self, fn, *args, **kwargs):
+        if self.executor is None:
+            return fn(*args, **kwargs)
+
+        # Run in a copy of the current context, so that storage operations are attributed to the
+        # request being handled
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(context.run, fn, *args, **kwargs))
+
+    def __getattr__(self, name):
+        return _async_attr(self.storage, name, self)
+
+
+class AsyncAccess:
+    """
+    Awaitable access to a quiz or the globals. It shares the executor of its storage.
+    """
+
+    def __init__(self, target, storage: AsyncStorage):
+        self.target = target
+        self.storage = storage
+
+    def __getattr__(self, name):
+        return _async_attr(self.target, name, self.storage)
+
+
+def _async_attr(target, name, storage: AsyncStorage):
+    if name in LAZY_PROPERTIES:
+        return storage.run(getattr, target, name)
+
+    value = getattr(target, name)
+    if not callable(value):
+        return value
+
+    if name in WRAPPER_METHODS:
+        return lambda *args, **kwargs: AsyncAccess(value(*args, **kwargs), storage)
+
+    async def method(*args, **kwargs):
+        result = await storage.run(value, *args, **kwargs)
+        if name in WRAPPER_RESULT_METHODS and result is not None:
+            return AsyncAccess(result, storage)
+        return result
+
+    return method
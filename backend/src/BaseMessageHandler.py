@@ -1,7 +1,10 @@
-import json
 import logging
 import traceback
 from enum import IntEnum
+from AsyncStorage import AsyncStorage
+from Common import Payload
+from ConnectionRegistry import ConnectionRegistry
+import Instrumentation
 
 logger = logging.getLogger('backend.handlers')
 
@@ -28,11 +31,11 @@ def error_message(error_code=ErrorCode.UnspecifiedError, details=None):
     }
     if details:
         msg["details"] = details
-    return json.dumps(msg)
+    return Payload.from_message(msg)
 
 
 def ok_message(info={}):
-    return json.dumps({
+    return Payload.from_message({
         "type": "response",
         "result": "ok",
         **info
@@ -46,12 +49,23 @@ class HandlerException(Exception):
 
 
 class BaseHandler:
-    def __init__(self, db, comms, connection):
-        self.db = db
+    def __init__(self, db, comms, connection, registry=None):
+        # Storage is accessed asynchronously. Plain storage is wrapped, and then invoked inline
+        self.db = db if isinstance(db, AsyncStorage) else AsyncStorage(db)
         self.comms = comms
         self.connection = connection
+        # Without a registry, the quiz of the connection is always looked up in storage
+        self.registry = registry if registry is not None else ConnectionRegistry()
         self.logger = logger
 
+    async def quiz_for_connection(self):
+        if (quiz_id := self.registry.get(self.connection)) is not None or self.registry.complete:
+            return quiz_id
+
+        if (quiz_id := await self.db.quiz_for_connection(self.connection)) is not None:
+            self.registry.set(self.connection, quiz_id)
+        return quiz_id
+
 
 class BaseMessageHandler(BaseHandler):
     async def send_message(self, message, connection=None):
@@ -63,14 +77,15 @@ class BaseMessageHandler(BaseHandler):
         pass
 
     async def handle_message(self, message):
-        try:
-            self.logger.info("Handling message %s from connection %s", message, self.connection)
-            await self._handle_message(message)
-            self.logger.info("Handled message")
-        except HandlerException as e:
-            self.logger.warn(e.message)
-            return await self.send_message(error_message(error_code=e.error_code, details=e.message))
-        except Exception as e:
-            self.logger.warn(e)
-            traceback.print_exc()
-            raise e
+        with Instrumentation.request_scope():
+            try:
+                self.logger.info("Handling message %s from connection %s", message, self.connection)
+                await self._handle_message(message)
+                self.logger.info("Handled message")
+            except HandlerException as e:
+                self.logger.warn(e.message)
+                return await self.send_message(error_message(error_code=e.error_code, details=e.message))
+            except Exception as e:
+                self.logger.warn(e)
+                traceback.print_exc()
+                raise e
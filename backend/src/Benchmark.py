@@ -0,0 +1,329 @@
+"""
+Load-generation and latency benchmark for the quiz backend.
+
+It simulates a party: a host creates a quiz, players register, all clients connect, players
+submit pool questions, and then the host runs several rounds in which a question is opened, all
+players answer it at (nearly) the same time, and the question is closed.
+
+The backend can be driven directly, by invoking QuizMessageHandler in-process, or through an
+in-process LocalGateway over (loopback) websockets. Example:
+
+    python Benchmark.py --mode direct --storage memory --players 40 --rounds 10
+"""
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import time
+from typing import Optional
+import websockets
+from Common import Config
+import Instrumentation
+from LocalGateway import LocalGateway, STORAGE_TYPES, create_storage
+from QuizMessageHandler import QuizMessageHandler
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class CountingProxy:
+    """
+    Counts the method calls on the wrapped storage object. Objects returned by quiz_access and
+    create_quiz are wrapped as well, so that calls on quiz access wrappers are also counted.
+    """
+
+    def __init__(self, target, counter: collections.Counter):
+        self._target = target
+        self._counter = counter
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not callable(value):
+            return value
+
+        def wrapper(*args, **kwargs):
+            self._counter[name] += 1
+            result = value(*args, **kwargs)
+            if name in ["quiz_access", "create_quiz"] and result is not None:
+                return CountingProxy(result, self._counter)
+            return result
+
+        return wrapper
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = collections.defaultdict(list)
+        self.broadcast_times = collections.defaultdict(list)
+        self.storage_calls = collections.Counter()
+        self.num_commands = collections.Counter()
+        self.phase_storage_calls = collections.Counter()
+
+    def add_latency(self, cmd, seconds):
+        self.latencies[cmd].append(seconds)
+
+    def add_broadcast_time(self, cmd, seconds):
+        self.broadcast_times[cmd].append(seconds)
+
+    def report(self):
+        def row(name, values, calls=""):
+            ms = [v * 1000 for v in values]
+            return (f"{name:<22} {len(ms):>6} {percentile(ms, 50):>9.2f} {percentile(ms, 95):>9.2f}"
+                    f" {percentile(ms, 99):>9.2f} {calls:>10}")
+
+        lines = [f"{'command':<22} {'count':>6} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}"
+                 f" {'calls/cmd':>10}"]
+        for cmd, values in self.latencies.items():
+            calls = self.phase_storage_calls[cmd] / self.num_commands[cmd]
+            lines.append(row(cmd, values, f"{calls:.1f}"))
+
+        lines.append("")
+        lines.append("Broadcast completion (until last recipient received message)")
+        for cmd, values in self.broadcast_times.items():
+            lines.append(row(cmd, values))
+
+        lines.append("")
+        lines.append("Storage calls: " + ", ".join(
+            f"{name}={count}" for name, count in self.storage_calls.most_common()))
+
+        return "\n".join(lines)
+
+
+class DirectClient:
+    """
+    Client that invokes the message handler in-process.
+    """
+
+    def __init__(self, bench, connection):
+        self.bench = bench
+        self.connection = connection
+        self.responses = []
+
+    async def request(self, msg: dict) -> Optional[dict]:
+        handler = QuizMessageHandler(self.bench.db, self.bench, self.connection)
+        num_responses = len(self.responses)
+
+        start = time.perf_counter()
+        await handler.handle_message(msg)
+        self.bench.stats.add_latency(msg["action"], time.perf_counter() - start)
+
+        for response in self.responses[num_responses:]:
+            if response.get("type") == "response":
+                return response
+
+    async def close(self):
+        handler = QuizMessageHandler(self.bench.db, self.bench, self.connection)
+        await handler.handle_message({"action": "disconnect"})
+
+
+class WebsocketClient:
+    """
+    Client that sends messages to the gateway over a websocket connection.
+    """
+
+    def __init__(self, bench, websocket):
+        self.bench = bench
+        self.websocket = websocket
+        self.messages = asyncio.Queue()
+        self.reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        async for message in self.websocket:
+            msg = json.loads(message)
+            self.bench.on_receive(msg)
+            await self.messages.put(msg)
+
+    async def request(self, msg: dict, reply_type="response") -> Optional[dict]:
+        start = time.perf_counter()
+        await self.websocket.send(json.dumps(msg))
+        while (reply := await self.messages.get()).get("type") != reply_type:
+            pass
+        self.bench.stats.add_latency(msg["action"], time.perf_counter() - start)
+
+        return reply
+
+    async def close(self):
+        await self.websocket.close()
+        self.reader.cancel()
+
+
+class Benchmark:
+
+    def __init__(self, args):
+        self.args = args
+        self.stats = Stats()
+        self.question_opened_at = {}
+        self.last_received = {}
+        self.num_received = collections.Counter()
+
+    def on_receive(self, msg):
+        if msg.get("type") == "question-opened":
+            question_id = msg["question_id"]
+            self.last_received[question_id] = time.perf_counter()
+            self.num_received[question_id] += 1
+
+    async def send(self, connection, message):
+        """
+        Comms interface used in direct mode
+        """
+        if self.args.send_latency:
+            await asyncio.sleep(self.args.send_latency / 1000)
+        self.on_receive(msg := json.loads(message))
+        self.clients[connection].responses.append(msg)
+
+    async def phase(self, cmd, requests):
+        """
+        Executes the requests concurrently. All requests should be for the same command, so that
+        the storage calls made during the phase can be attributed to it.
+        """
+        calls_before = sum(self.stats.storage_calls.values())
+        results = await asyncio.gather(*requests)
+        self.stats.phase_storage_calls[cmd] += sum(self.stats.storage_calls.values()) - calls_before
+        self.stats.num_commands[cmd] += len(results)
+
+        return results
+
+    async def create_clients(self, num_clients):
+        if self.args.mode == "direct":
+            self.clients = {
+                f"C{i}": DirectClient(self, f"C{i}") for i in range(num_clients)
+            }
+            return list(self.clients.values())
+
+        return [
+            WebsocketClient(self, await websockets.connect(self.url))
+            for _ in range(num_clients)
+        ]
+
+    async def run_scenario(self, hosts, players):
+        host = hosts[0]
+        response = await self.phase("create-quiz", [
+            host.request({"action": "create-quiz", "quiz_name": "Benchmark"})
+        ])
+        quiz_id, host_id = response[0]["quiz_id"], response[0]["host_id"]
+
+        responses = await self.phase("register", [
+            player.request({"action": "register", "quiz_id": quiz_id, "player_name": f"Player{i}"})
+            for i, player in enumerate(players)
+        ])
+        player_ids = [response["client_id"] for response in responses]
+
+        await self.phase("connect", [
+            *(
+                host.request({"action": "connect", "quiz_id": quiz_id, "client_id": host_id,
+                              "batch_events": self.args.batch_events})
+                for host in hosts
+            ),
+            *(
+                player.request({"action": "connect", "quiz_id": quiz_id, "client_id": player_id})
+                for player, player_id in zip(players, player_ids)
+            )
+        ])
+
+        await self.phase("set-pool-question", [
+            player.request({
+                "action": "set-pool-question", "quiz_id": quiz_id,
+                "question": f"Question of player {i}?", "choices": ["A", "B", "C", "D"],
+                "answer": 1 + i % 4
+            })
+            for i, player in enumerate(players)
+        ])
+
+        for round in range(self.args.rounds):
+            question_id = round + 1
+            author_id = player_ids[round % len(player_ids)]
+
+            self.question_opened_at[question_id] = time.perf_counter()
+            await self.phase("open-question", [
+                host.request({
+                    "action": "open-question", "quiz_id": quiz_id, "author_id": author_id,
+                    "question": f"Question of {author_id}?", "choices": ["A", "B", "C", "D"],
+                    "answer": 1 + round % 4
+                }, **self.reply_type("question-opened"))
+            ])
+            # Wait until all clients received the question
+            while self.num_received[question_id] < len(hosts) + len(players):
+                await asyncio.sleep(0.001)
+            self.stats.add_broadcast_time(
+                "open-question",
+                self.last_received[question_id] - self.question_opened_at[question_id])
+
+            await self.phase("answer", [
+                player.request({
+                    "action": "answer", "quiz_id": quiz_id, "question_id": question_id,
+                    "answer": 1 + i % 4
+                })
+                for i, player in enumerate(players)
+            ])
+
+            await self.phase("close-question", [
+                host.request({"action": "close-question", "quiz_id": quiz_id},
+                             **self.reply_type("question-closed"))
+            ])
+
+        await self.phase("get-leaderboard", [
+            host.request({"action": "get-leaderboard", "quiz_id": quiz_id},
+                         **self.reply_type("leaderboard"))
+        ])
+
+    def reply_type(self, reply_type):
+        # In direct mode the handler has finished when the request returns
+        return {"reply_type": reply_type} if self.args.mode == "websocket" else {}
+
+    async def run(self):
+        server = None
+        if self.args.mode == "direct":
+            self.db = CountingProxy(create_storage(self.args.storage, self.args.sqlite_path),
+                                    self.stats.storage_calls)
+        else:
+            gateway = LocalGateway(self.args.storage, self.args.sqlite_path,
+                                   buffer_answers=self.args.buffer_answers)
+            gateway.db.storage = CountingProxy(gateway.db.storage, self.stats.storage_calls)
+            server = await websockets.serve(gateway.main, "localhost", 0)
+            port = server.sockets[0].getsockname()[1]
+            self.url = f"ws://localhost:{port}"
+
+        clients = await self.create_clients(self.args.hosts + self.args.players)
+        hosts, players = clients[:self.args.hosts], clients[self.args.hosts:]
+
+        await self.run_scenario(hosts, players)
+
+        for client in clients:
+            await client.close()
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+        print(self.stats.report())
+        if (metrics := Instrumentation.metrics.dump()):
+            print(json.dumps(metrics, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the quiz backend")
+    parser.add_argument("--mode", choices=["direct", "websocket"], default="direct",
+                        help="Invoke the message handler directly, or via a websocket gateway")
+    parser.add_argument("--storage", choices=STORAGE_TYPES, default="memory")
+    parser.add_argument("--sqlite-path", default=Config.SQLITE_PATH)
+    parser.add_argument("--players", type=int, default=Config.MAX_PLAYERS_PER_QUIZ)
+    parser.add_argument("--hosts", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--buffer-answers", action="store_true",
+                        help="Buffer answers in the gateway (websocket mode only)")
+    parser.add_argument("--batch-events", action="store_true",
+                        help="Hosts opt in to coalesced notifications (websocket mode only)")
+    parser.add_argument("--send-latency", type=float, default=0,
+                        help="Simulated latency (in ms) of each send in direct mode")
+    args = parser.parse_args()
+
+    logging.getLogger('backend').setLevel(logging.ERROR)
+    logging.getLogger('backend').addHandler(logging.StreamHandler())
+
+    asyncio.run(Benchmark(args).run())
+
+
+if __name__ == "__main__":
+    main()
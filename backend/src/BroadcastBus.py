@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import stat
+import struct
+from typing import Awaitable, Callable, Optional, Union
+from Common import Config, ConnectionGone, Payload, create_id
+
+logger = logging.getLogger('backend.bus')
+
+# Frame header: kind, is_text, worker ID, length of connection ID, length of data
+HEADER = struct.Struct("!BBHHI")
+
+# Worker => broker. Registers the worker
+KIND_HELLO = 1
+# Worker => broker => worker. A message for a connection owned by the worker in the header
+KIND_SEND = 2
+# Broker => worker. The data lists the IDs of the workers that are connected
+KIND_WORKERS = 3
+
+
+def encode_frame(kind, worker_id=0, connection="", message: Union[str, bytes] = b"") -> bytes:
+    is_text = isinstance(message, str)
+    if isinstance(message, Payload):
+        data = message.data
+    elif is_text:
+        data = message.encode()
+    else:
+        data = message
+    connection_data = connection.encode()
+
+    return b"".join([
+        HEADER.pack(kind, is_text, worker_id, len(connection_data), len(data)),
+        connection_data,
+        data
+    ])
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple[int, int, str, Union[str, bytes]]:
+    kind, is_text, worker_id, connection_len, data_len = HEADER.unpack(
+        await reader.readexactly(HEADER.size))
+    connection = (await reader.readexactly(connection_len)).decode()
+    data = await reader.readexactly(data_len)
+
+    return kind, worker_id, connection, data.decode() if is_text else data
+
+
+def worker_of(connection: str) -> Optional[int]:
+    """
+    The ID of the worker that owns the connection, which is the prefix of its ID.
+    """
+    worker_id, sep, _ = connection.partition("-")
+    return int(worker_id) if sep and worker_id.isdigit() else None
+
+
+class BroadcastBroker:
+    """
+    Relays messages between the worker processes of the local service. Each worker handles its
+    own websocket connections, but the clients of a quiz can be spread over all workers. When a
+    worker sends to a connection of another worker, the message goes via the broker.
+
+    The broker listens on a Unix socket, so it only serves workers on the same machine.
+    """
+
+    def __init__(self):
+        # Worker ID => Stream to the worker
+        self.workers: dict[int, asyncio.StreamWriter] = {}
+
+    @staticmethod
+    def listen(path=Config.BROADCAST_SOCKET_PATH) -> socket.socket:
+        """
+        Creates the socket that the broker listens on. Do so before starting the workers, so that
+        these can connect right away.
+
+        Any process that can connect could inject messages for all connections, so only the user
+        that runs the service may access the socket.
+        """
+        try:
+            status = os.lstat(path)
+        except FileNotFoundError:
+            pass
+        else:
+            # Only remove a socket left behind by an earlier run, not anything another user created
+            if not stat.S_ISSOCK(status.st_mode) or status.st_uid != os.getuid():
+                raise PermissionError(f"Refusing to replace {path}, which is not a socket owned by"
+                                      " this user")
+            os.unlink(path)
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Bind with a umask that leaves no access to others, so that there is no window in which
+        # these can connect
+        umask = os.umask(0o177)
+        try:
+            sock.bind(path)
+        finally:
+            os.umask(umask)
+        os.chmod(path, 0o600)
+        sock.listen()
+        return sock
+
+    async def serve(self, sock: socket.socket):
+        server = await asyncio.start_unix_server(self._serve_worker, sock=sock)
+        async with server:
+            await server.serve_forever()
+
+    async def _serve_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        worker_id = None
+        try:
+            kind, worker_id, _, _ = await read_frame(reader)
+            if kind != KIND_HELLO:
+                return logger.warn(f"Expected hello from worker, got frame of kind {kind}")
+
+            self.workers[worker_id] = writer
+            logger.info(f"Worker {worker_id} connected")
+            self._announce_workers()
+
+            while True:
+                kind, target_id, connection, message = await read_frame(reader)
+                if (target := self.workers.get(target_id)) is None:
+                    # The sender finds out via the next announcement
+                    logger.warn(f"Dropped message for {connection} of unknown worker {target_id}")
+                    continue
+                target.write(encode_frame(KIND_SEND, target_id, connection, message))
+                await target.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            if worker_id is not None and self.workers.get(worker_id) is writer:
+                del self.workers[worker_id]
+                logger.info(f"Worker {worker_id} disconnected")
+                self._announce_workers()
+            writer.close()
+
+    def _announce_workers(self):
+        frame = encode_frame(KIND_WORKERS, message=json.dumps(list(self.workers)))
+        for writer in list(self.workers.values()):
+            writer.write(frame)
+
+
+class BroadcastBus:
+    """
+    The connection of a worker to the broker. It publishes messages for connections of other
+    workers, and delivers the messages that other workers publish for its own connections.
+    """
+
+    def __init__(self, worker_id: int, path=Config.BROADCAST_SOCKET_PATH):
+        self.worker_id = worker_id
+        self.path = path
+        # IDs of the workers that are connected to the broker
+        self.workers: set[int] = set()
+
+        self.__writer: Optional[asyncio.StreamWriter] = None
+
+    def create_connection_id(self) -> str:
+        """
+        Creates an ID for a new connection of this worker, from which other workers can tell
+        where to send its messages.
+        """
+        return f"{self.worker_id}-{create_id()}"
+
+    async def connect(self, deliver: Callable[[str, Union[str, bytes]], Awaitable]):
+        """
+        Connects to the broker. Messages for connections of this worker are passed to deliver, one
+        at a time so that their order is retained.
+        """
+        reader, self.__writer = await asyncio.open_unix_connection(self.path)
+        self.__writer.write(encode_frame(KIND_HELLO, self.worker_id))
+
+        # Wait until the broker announced the workers. Until then, connections of other workers
+        # would wrongly be considered gone.
+        kind, _, _, message = await read_frame(reader)
+        if kind != KIND_WORKERS:
+            raise ConnectionError(f"Expected workers from broker, got frame of kind {kind}")
+        self.workers = set(json.loads(message))
+
+        asyncio.create_task(self._receive(reader, deliver))
+
+    async def _receive(self, reader: asyncio.StreamReader, deliver):
+        try:
+            while True:
+                kind, _, connection, message = await read_frame(reader)
+                if kind == KIND_WORKERS:
+                    self.workers = set(json.loads(message))
+                else:
+                    await deliver(connection, message)
+        except asyncio.IncompleteReadError:
+            logger.error(f"Worker {self.worker_id} lost its connection to the broker")
+            self.__writer = None
+
+    async def publish(self, connection: str, message: Union[str, bytes]):
+        """
+        Sends the message to the worker that owns the connection. Delivery is not confirmed. Raises
+        ConnectionGone when that worker is not (or no longer) connected to the broker.
+        """
+        if self.__writer is None:
+            # Not ConnectionGone, as the connection may well exist
+            raise ConnectionError("Not connected to the broker")
+        if (worker_id := worker_of(connection)) not in self.workers or worker_id == self.worker_id:
+            raise ConnectionGone(connection)
+
+        self.__writer.write(encode_frame(KIND_SEND, worker_id, connection, message))
+        await self.__writer.drain()
@@ -0,0 +1,55 @@
+import json
+from typing import Union
+
+# Optional dependencies. Without these, the JSON codec uses the json module, and only the JSON
+# codec is available.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class JsonCodec:
+    """
+    The default codec, which sends messages as JSON text. When orjson is installed, it is used as
+    it serializes considerably faster than the json module.
+    """
+    name = "json"
+
+    def encode(self, message: dict) -> str:
+        if orjson is not None:
+            # Text frames require a string
+            return orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS).decode()
+        return json.dumps(message)
+
+    def decode(self, data: Union[str, bytes]) -> dict:
+        if orjson is not None:
+            # orjson rejects subclasses of str, such as Payload
+            return orjson.loads(str(data) if isinstance(data, str) else data)
+        return json.loads(data)
+
+
+class MsgpackCodec:
+    """
+    Sends messages in MessagePack binary frames, which are more compact than JSON.
+    """
+    name = "msgpack"
+
+    def encode(self, message: dict) -> bytes:
+        return msgpack.packb(message)
+
+    def decode(self, data: Union[str, bytes]) -> dict:
+        if isinstance(data, str):
+            # Clients may keep sending their requests as JSON text
+            return JSON.decode(data)
+        return msgpack.unpackb(data)
+
+
+JSON = JsonCodec()
+
+# Name => Codec, for the codecs that are available
+CODECS = {codec.name: codec for codec in [JSON, *([MsgpackCodec()] if msgpack is not None else [])]}
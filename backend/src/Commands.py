@@ -0,0 +1,241 @@
+"""
+Declarative description of the commands that clients can send.
+
+Each command declares the fields it accepts, the role that the sender must have, and which quiz
+state it needs. QuizMessageHandler uses this to validate messages before invoking the command,
+and to only load the quiz data that the command uses.
+"""
+from dataclasses import dataclass, field
+from enum import IntEnum
+import sys
+from typing import Any, Optional
+from BaseMessageHandler import ErrorCode, HandlerException
+from Common import ClientRole, Config
+
+
+def check_int_value(name: str, value: int | str, value_range: tuple[int, int]) -> int:
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise HandlerException(
+            f"{name} is not an integer", ErrorCode.InvalidValue)
+
+    if value < value_range[0]:
+        raise HandlerException(
+            f"{name} is too small ({value} < {value_range[0]})",
+            ErrorCode.InvalidValue)
+    if value > value_range[1]:
+        raise HandlerException(
+            f"{name} is too big ({value} > {value_range[1]})",
+            ErrorCode.InvalidValue)
+
+    return value
+
+
+def check_string_value(name: str, value: str, len_range: tuple[int, int]) -> str:
+    if not isinstance(value, str):
+        raise HandlerException(f"{name} is not a string", ErrorCode.InvalidValue)
+
+    if value != value.strip():
+        raise HandlerException(
+            f"{name} contains leading or trailing whitespace",
+            ErrorCode.InvalidValue
+        )
+
+    if len(value) < len_range[0]:
+        raise HandlerException(
+            f"{name} is too short ({len(value)} < {len_range[0]})",
+            ErrorCode.InvalidValue
+        )
+    if len(value) > len_range[1]:
+        raise HandlerException(
+            f"{name} is too long ({len(value)} > {len_range[1]})",
+            ErrorCode.InvalidValue
+        )
+
+    return value
+
+
+class QuizState(IntEnum):
+    # The command does not operate on a quiz
+    NoQuiz = 0
+    # Only the quiz instance (host, question state). Connections and players are each loaded
+    # separately when first accessed
+    Instance = 1
+    # The quiz instance, its connections and its players. Storage may load these together
+    Full = 2
+
+
+class Field:
+    """
+    A message field. The base class accepts any value.
+    """
+
+    def __init__(self, name: str, required: bool = True):
+        self.name = name
+        self.required = required
+
+    def check(self, value) -> Any:
+        return value
+
+
+class StrField(Field):
+    def __init__(self, name: str, len_range: tuple[int, int], required: bool = True):
+        super().__init__(name, required)
+        self.len_range = len_range
+
+    def check(self, value) -> str:
+        return check_string_value(self.name, value, self.len_range)
+
+
+class IntField(Field):
+    def __init__(self, name: str, value_range: tuple[int, int], required: bool = True):
+        super().__init__(name, required)
+        self.value_range = value_range
+
+    def check(self, value) -> int:
+        return check_int_value(self.name, value, self.value_range)
+
+
+class BoolField(Field):
+    def check(self, value) -> bool:
+        if not isinstance(value, bool):
+            raise HandlerException(f"{self.name} is not a boolean", ErrorCode.InvalidValue)
+        return value
+
+
+class DictField(Field):
+    def check(self, value) -> dict:
+        if not isinstance(value, dict):
+            raise HandlerException(f"{self.name} is not an object", ErrorCode.InvalidValue)
+        return value
+
+
+class ListField(Field):
+    def __init__(self, name: str, item: Field, len_range: tuple[int, int], required: bool = True):
+        super().__init__(name, required)
+        self.item = item
+        self.len_range = len_range
+
+    def check(self, value) -> list:
+        if not isinstance(value, list):
+            raise HandlerException(f"{self.name} is not a list", ErrorCode.InvalidValue)
+        check_int_value(f"number of {self.name}", len(value), self.len_range)
+
+        return [self.item.check(item) for item in value]
+
+
+def id_field(name, required=True):
+    return StrField(name, Config.RANGE_ID_LENGTH, required)
+
+
+def question_fields():
+    return [
+        StrField("question", Config.RANGE_QUESTION_LENGTH),
+        ListField("choices", StrField("choice", Config.RANGE_CHOICE_LENGTH),
+                  Config.RANGE_CHOICES_PER_QUESTION),
+        # Checked against the actual number of choices when the question is created
+        IntField("answer", (1, Config.RANGE_CHOICES_PER_QUESTION[1])),
+    ]
+
+
+# Optional field of all commands that operate on a quiz
+QUIZ_ID_FIELD = id_field("quiz_id", required=False)
+
+
+@dataclass
+class Command:
+    # Name of the QuizMessageHandler method that executes the command. It is invoked with the
+    # (validated) fields as keyword arguments
+    handler: str
+    fields: list[Field] = field(default_factory=list)
+    state: QuizState = QuizState.Instance
+    # When set, the connection must belong to a client with this role
+    role: Optional[ClientRole] = None
+    # Use the default quiz when the message does not specify one, instead of the quiz the
+    # connection belongs to
+    default_quiz: bool = False
+
+    def parse(self, msg: dict) -> dict:
+        """
+        Returns the validated fields of the message. Optional fields that are missing are omitted.
+        """
+        args = {}
+        for f in self.fields:
+            if (value := msg.get(f.name)) is None:
+                if f.required:
+                    raise HandlerException(f"Field '{f.name}' is missing", ErrorCode.MissingField)
+            else:
+                args[f.name] = f.check(value)
+
+        return args
+
+
+COMMANDS: dict[str, Command] = {
+    # Admin commands
+    "set-root-user": Command("set_root_user", [
+        id_field("value"),
+        id_field("old_value", required=False),
+    ], state=QuizState.NoQuiz),
+    "set-default-quiz": Command("set_default_quiz", [
+        id_field("quiz_id"),
+        id_field("client_id"),
+    ], state=QuizState.NoQuiz),
+
+    # Quiz creation and registration
+    "create-quiz": Command("create_quiz", [
+        StrField("quiz_name", Config.RANGE_NAME_LENGTH),
+        id_field("host_id", required=False),
+        BoolField("try_make_default", required=False),
+    ], state=QuizState.NoQuiz),
+    "register": Command("register", [
+        StrField("player_name", Config.RANGE_NAME_LENGTH),
+        id_field("client_id", required=False),
+        Field("avatar", required=False),
+    ], state=QuizState.Full, default_quiz=True),
+
+    "notify-hosts": Command("notify_hosts", [DictField("message")]),
+    "get-clients": Command("get_clients", state=QuizState.Full, role=ClientRole.Host),
+
+    "connect": Command("connect", [
+        id_field("client_id"),
+        BoolField("batch_events", required=False),
+        StrField("codec", (1, 20), required=False),
+    ], state=QuizState.Full),
+    "disconnect": Command("disconnect", state=QuizState.Full),
+
+    "get-status": Command("send_status_message", [id_field("client_id", required=False)],
+                          state=QuizState.Instance),
+
+    "set-pool-question": Command("set_pool_question", question_fields(), role=ClientRole.Player),
+    "get-pool-question": Command("get_pool_question", role=ClientRole.Player),
+    "get-pool-questions": Command("get_pool_questions", role=ClientRole.Host),
+
+    "open-question": Command("open_question", [id_field("author_id"), *question_fields()],
+                             role=ClientRole.Host),
+    "get-question": Command("get_question", role=ClientRole.Player),
+    "answer": Command("answer", [
+        IntField("question_id", (1, sys.maxsize)),
+        # Checked against the number of choices of the current question by the handler
+        IntField("answer", (1, Config.RANGE_CHOICES_PER_QUESTION[1])),
+    ], role=ClientRole.Player),
+
+    "close-question": Command("close_question", role=ClientRole.Host),
+    "sync-since": Command("sync_since", [IntField("seq", (0, sys.maxsize))]),
+
+    "get-questions": Command("get_questions", role=ClientRole.Host),
+    "get-answers": Command("get_answers", role=ClientRole.Host),
+    "get-question-stats": Command("get_question_stats", [
+        IntField("question_id", (1, sys.maxsize), required=False),
+    ], role=ClientRole.Host),
+    "get-leaderboard": Command("get_leaderboard", [
+        IntField("limit", (1, Config.MAX_PLAYERS_PER_QUIZ), required=False),
+    ], role=ClientRole.Host),
+
+    # Quiz archival
+    "archive-quiz": Command("archive_quiz", state=QuizState.Full, role=ClientRole.Host),
+    "get-results": Command("get_results", [
+        id_field("quiz_id"),
+        id_field("client_id"),
+    ], state=QuizState.NoQuiz),
+}
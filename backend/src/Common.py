@@ -1,7 +1,10 @@
 from dataclasses import asdict, dataclass
 from enum import IntEnum
+import functools
+import os
 import random
-from typing import Optional
+from typing import Optional, Union
+from Codecs import JSON
 
 
 class Config:
@@ -9,11 +12,35 @@ class Config:
     MAX_PLAYERS_PER_QUIZ = 40
     MAX_CLIENTS_PER_QUIZ = 50
     MAX_ATTEMPTS = 3
+    # Attempts of a DynamoDB write that conflicts with a concurrent transaction
+    MAX_WRITE_ATTEMPTS = 5
+    RETRY_BASE_DELAY = 0.05  # seconds
+    MAX_CACHED_QUIZZES = 64
+    MAX_REGISTERED_CONNECTIONS = 4096
+    MAX_SEND_CONCURRENCY = 16
+    MAX_STORAGE_CONCURRENCY = 16
+    SEND_TIMEOUT = 5.0  # seconds
+    ANSWER_FLUSH_INTERVAL = 0.25  # seconds
+    EVENT_BATCH_WINDOW = 0.05  # seconds
+    SNAPSHOT_INTERVAL = 5  # questions
+    # How long DynamoDB keeps the items of a quiz, and of its archive, before expiring them
+    QUIZ_RETENTION = 7 * 24 * 3600  # seconds
+    ARCHIVE_RETENTION = 365 * 24 * 3600  # seconds
     RANGE_ID_LENGTH = (4, 12)
     RANGE_NAME_LENGTH = (2, 20)
     RANGE_CHOICES_PER_QUESTION = (4, 4)
     RANGE_QUESTION_LENGTH = (10, 160)
     RANGE_CHOICE_LENGTH = (1, 80)
+    QSCORE_MIN_ANSWERS = 5
+    QSCORE_MAX = 5
+    SQLITE_PATH = "partyquiz.db"
+    # Directory where the memory storage writes the archives of quizzes
+    ARCHIVE_PATH = "archives"
+    BROADCAST_SOCKET_PATH = "/tmp/partyquiz-broadcast.sock"
+    # Set via the environment, so that these can be enabled for a deployed Lambda function.
+    # Storage metrics request the consumed capacity of each DynamoDB call, and log it per request.
+    STORAGE_METRICS = os.environ.get("STORAGE_METRICS", "") == "1"
+    STARTUP_PROFILE = os.environ.get("STARTUP_PROFILE", "") == "1"
 
 
 class ClientRole(IntEnum):
@@ -21,6 +48,53 @@ class ClientRole(IntEnum):
     Player = 2
 
 
+class DeliveryStatus(IntEnum):
+    Delivered = 0
+    Gone = 1
+    TimedOut = 2
+    Failed = 3
+
+
+class ConnectionGone(Exception):
+    """
+    Raised by comms when a message cannot be delivered because the connection no longer exists.
+    """
+
+
+class Payload(str):
+    """
+    A message that is serialized once, and then sent to many recipients. It can be used wherever
+    a (JSON) message string is expected. Comms that need bytes or another codec can use its
+    (cached) encodings.
+    """
+
+    @classmethod
+    def from_message(cls, message: dict) -> "Payload":
+        payload = cls(JSON.encode(message))
+        payload.message = message
+        return payload
+
+    @functools.cached_property
+    def message(self) -> dict:
+        return JSON.decode(self)
+
+    @functools.cached_property
+    def data(self) -> bytes:
+        return self.encode()
+
+    def encoded(self, codec) -> Union[str, bytes]:
+        """
+        The message encoded by the codec. Each codec encodes it only once.
+        """
+        if codec is JSON:
+            return self
+
+        encodings = self.__dict__.setdefault("encodings", {})
+        if (data := encodings.get(codec.name)) is None:
+            data = encodings[codec.name] = codec.encode(self.message)
+        return data
+
+
 @dataclass
 class Player:
     name: str
@@ -44,5 +118,43 @@ class Question:
         return d
 
 
+@dataclass
+class Answer:
+    client_id: str
+    answer: int
+    is_correct: bool
+
+
+@dataclass
+class PlayerScore:
+    answer_score: int = 0
+    question_score: int = 0
+
+    @property
+    def total_score(self) -> int:
+        return self.answer_score + self.question_score
+
+    def asdict(self):
+        return {**asdict(self), "total_score": self.total_score}
+
+
+@dataclass
+class QuestionStats:
+    num_answers: int
+    num_correct: int
+    choice_counts: list[int]
+
+    def asdict(self):
+        return asdict(self)
+
+
+@dataclass
+class QuizCounts:
+    num_players: int
+    num_pool_questions: int
+    num_host_connections: int
+    num_player_connections: int
+
+
 def create_id():
     return ''.join(chr(random.randint(ord('A'), ord('Z'))) for _ in range(6))
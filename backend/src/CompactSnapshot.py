@@ -0,0 +1,104 @@
+from dataclasses import asdict, dataclass, field
+import json
+import os
+from typing import Optional
+import zlib
+from Common import Player, PlayerScore, Question
+
+
+@dataclass
+class CompactSnapshot:
+    """
+    The state of a quiz in a single, compressed blob. It is written periodically, so that loading
+    a quiz does not require reassembling it from the many small items across its partitions.
+
+    The snapshot is taken when a question has just been closed (and scored). The questions and
+    answers up to and including question_id are therefore final, and remain valid when the quiz
+    advances. Only newer questions and answers need to be loaded on top of it. The exception are
+    answers to question_id that raced its closing, and were stored after the snapshot was taken.
+    The roster and scores are only valid until the roster changes and the next question is
+    opened, respectively.
+
+    The same format is used to archive a finished quiz. Its archive is a final snapshot, which
+    also holds the name and host of the quiz, as the quiz itself is then removed.
+    """
+    # Version of the roster that the snapshot contains
+    version: int
+    # The last question that the snapshot covers
+    question_id: int
+    # Sequence number of the last event at the time of the snapshot
+    event_seq: int
+    # Sequence number of the snapshot itself, which identifies the latest one
+    seq: int = 0
+
+    # Connection => Client ID
+    clients: dict[str, str] = field(default_factory=dict)
+    # Client ID => Player
+    players: dict[str, Player] = field(default_factory=dict)
+    # Question ID => Question
+    questions: dict[int, Question] = field(default_factory=dict)
+    # Question ID => Client ID => Answer
+    answers: dict[int, dict[str, int]] = field(default_factory=dict)
+    # Client ID => PlayerScore
+    scores: dict[str, PlayerScore] = field(default_factory=dict)
+
+    # Only set for archives
+    name: Optional[str] = None
+    host_id: Optional[str] = None
+
+    def encode(self) -> bytes:
+        return zlib.compress(json.dumps({
+            "version": self.version,
+            "question_id": self.question_id,
+            "event_seq": self.event_seq,
+            "seq": self.seq,
+            "clients": self.clients,
+            "players": {client_id: player.asdict() for client_id, player in self.players.items()},
+            "questions": {id: asdict(question) for id, question in self.questions.items()},
+            "answers": self.answers,
+            "scores": {client_id: asdict(score) for client_id, score in self.scores.items()},
+            "name": self.name,
+            "host_id": self.host_id,
+        }, separators=(",", ":")).encode())
+
+    @classmethod
+    def decode(cls, data: bytes) -> "CompactSnapshot":
+        d = json.loads(zlib.decompress(data))
+        # JSON object keys are always strings, so convert the question IDs back
+        return cls(
+            version=d["version"],
+            question_id=d["question_id"],
+            event_seq=d["event_seq"],
+            # Absent in archives written before snapshots were numbered
+            seq=d.get("seq", 0),
+            clients=d["clients"],
+            players={client_id: Player(**player) for client_id, player in d["players"].items()},
+            questions={int(id): Question(**question) for id, question in d["questions"].items()},
+            answers={int(id): answers for id, answers in d["answers"].items()},
+            scores={client_id: PlayerScore(**score) for client_id, score in d["scores"].items()},
+            # Absent in snapshots written before archives were introduced
+            name=d.get("name"),
+            host_id=d.get("host_id"),
+        )
+
+    def write_file(self, path):
+        """
+        Writes the encoded snapshot to the file. The file is replaced atomically, so that readers
+        never see a partially written snapshot.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(self.encode())
+        os.replace(temp_path, path)
+
+    @classmethod
+    def read_file(cls, path) -> Optional["CompactSnapshot"]:
+        """
+        Reads the snapshot from the file. Returns None if the file does not exist.
+        """
+        try:
+            with open(path, "rb") as f:
+                return cls.decode(f.read())
+        except FileNotFoundError:
+            return None
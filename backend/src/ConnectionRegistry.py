@@ -0,0 +1,50 @@
+from collections import Counter, OrderedDict
+from typing import Optional
+from Common import Config
+
+
+class ConnectionRegistry:
+    """
+    Remembers the quiz that each connection is connected to, so that it need not be looked up in
+    storage when a request omits the quiz ID, or when the connection disconnects.
+
+    A complete registry sees all connects and disconnects of its connections, as is the case for
+    the LocalGateway, which handles all messages of its sockets. Connections that it does not know
+    are then not connected to any quiz, and connections need not be linked to their quiz in
+    storage. Otherwise, the registry is an (incomplete) cache of the links in storage. It should
+    then only be used while handling a single request, e.g. in a Lambda invocation, as another
+    container may link the connection to another quiz in the meantime.
+    """
+
+    def __init__(self, complete=False, max_size=Config.MAX_REGISTERED_CONNECTIONS):
+        self.complete = complete
+        self.max_size = max_size
+        self.__quizzes: OrderedDict[str, str] = OrderedDict()
+        # Quiz ID => Number of its connections
+        self.__counts: Counter[str] = Counter()
+
+    def get(self, connection) -> Optional[str]:
+        if (quiz_id := self.__quizzes.get(connection)) is not None:
+            self.__quizzes.move_to_end(connection)
+        return quiz_id
+
+    def set(self, connection, quiz_id):
+        self.remove(connection)
+        self.__quizzes[connection] = quiz_id
+        self.__counts[quiz_id] += 1
+
+        # A complete registry cannot forget connections
+        if not self.complete and len(self.__quizzes) > self.max_size:
+            self.remove(next(iter(self.__quizzes)))
+
+    def remove(self, connection):
+        if (quiz_id := self.__quizzes.pop(connection, None)) is not None:
+            self.__counts[quiz_id] -= 1
+            if self.__counts[quiz_id] == 0:
+                del self.__counts[quiz_id]
+
+    def is_connected(self, quiz_id) -> bool:
+        """
+        Whether any of the known connections is connected to the quiz.
+        """
+        return quiz_id in self.__counts
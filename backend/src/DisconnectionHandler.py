@@ -1,18 +1,28 @@
 from BaseMessageHandler import BaseHandler
+import Instrumentation
 from QuizMessageHandler import QuizMessageHandler
 
 
 class DisconnectionHandler(BaseHandler):
+    def __init__(self, db, comms, connection, event_batcher=None, actor=None, registry=None):
+        super().__init__(db, comms, connection, registry)
+        self.event_batcher = event_batcher
+        self.actor = actor
+
     async def handle_disconnect(self):
-        try:
-            self.logger.info("Handling disconnect of Connection %s", self.connection)
-            quiz_id = self.db.quiz_for_connection(self.connection)
+        with Instrumentation.request_scope():
+            Instrumentation.set_action("$disconnect")
+            try:
+                self.logger.info("Handling disconnect of Connection %s", self.connection)
+                quiz_id = await self.quiz_for_connection()
 
-            if quiz_id:
-                handler = QuizMessageHandler(self.db, self.comms, self.connection)
-                handler.fetch_quiz(quiz_id)
-                await handler.disconnect()
+                if quiz_id:
+                    handler = QuizMessageHandler(self.db, self.comms, self.connection,
+                                                 event_batcher=self.event_batcher,
+                                                 actor=self.actor, registry=self.registry)
+                    await handler.fetch_quiz(quiz_id)
+                    await handler.disconnect()
 
-            self.logger.info("Handled disconnect of Connection %s", self.connection)
-        except Exception as e:
-            self.logger.warn("Exception while handling disconnect: %s", str(e))
+                self.logger.info("Handled disconnect of Connection %s", self.connection)
+            except Exception as e:
+                self.logger.warn("Exception while handling disconnect: %s", str(e))
@@ -1,29 +1,163 @@
 from collections import defaultdict
 import functools
+import json
 import logging
-from typing import Optional
+import random
+import time
+from typing import Iterator, Optional
 import boto3
-from Common import Player, Config, Question
+import Scoring
+from Common import Answer, ClientRole, Player, PlayerScore, Config, Question, QuestionStats, QuizCounts
+from CompactSnapshot import CompactSnapshot
+from Instrumentation import InstrumentedClient
+from QuizCache import QuizCache, QuizSnapshot
 
 logger = logging.getLogger('backend.dynamodb')
 
-DEFAULT_CLIENT = boto3.client('dynamodb')
+
+@functools.cache
+def default_client():
+    """
+    Client for the default endpoint. It is created on first use, instead of when this module is
+    imported, and then shared by all storage instances.
+    """
+    return boto3.client('dynamodb')
+
+
+# SKEY prefixes of the connection and player items in a quiz partition
+ROSTER_PREFIXES = ["Conn#", "Player#"]
+# Counters on the Instance item, in the order of the QuizCounts fields
+COUNTERS = ["NumPlayers", "NumPoolQuestions", "NumHostConnections", "NumPlayerConnections"]
+# Answers per transaction of store_answers. Each answer takes at most two actions (the answer and
+# the player's score), and the tally one more, within the maximum of 100 actions.
+ANSWERS_PER_TRANSACTION = 49
+# PKEY prefixes of the partitions that hold the data of a quiz
+QUIZ_PARTITIONS = ["Quiz#", "Pool#", "Questions#", "Answers#", "Scores#", "Events#", "Snapshot#"]
 
 
 def optional_str(item, name):
     return item[name]["S"] if name in item else None
 
 
+def _query_args(pkey, prefix=None, projection=None, after=None, **kwargs):
+    args = {
+        "TableName": Config.MAIN_TABLE,
+        "KeyConditionExpression": "PKEY = :pkey",
+        "ExpressionAttributeValues": {":pkey": {"S": pkey}},
+        **kwargs
+    }
+    if prefix is not None:
+        args["KeyConditionExpression"] += " AND begins_with(SKEY, :prefix)"
+        args["ExpressionAttributeValues"][":prefix"] = {"S": prefix}
+    elif after is not None:
+        args["KeyConditionExpression"] += " AND SKEY > :after"
+        args["ExpressionAttributeValues"][":after"] = {"S": after}
+    if projection is not None:
+        # Use placeholders to avoid clashes with reserved words
+        names = {f"#p{i}": name for i, name in enumerate(projection)}
+        args["ProjectionExpression"] = ", ".join(names)
+        args["ExpressionAttributeNames"] = names
+
+    return args
+
+
+def query_items(client, pkey, prefix=None, projection=None, after=None, **kwargs) -> Iterator[dict]:
+    """
+    Yields the items in the partition, optionally only those whose sort key starts with the given
+    prefix or comes after the given key, and only with the given attributes.
+
+    Follows LastEvaluatedKey, so that results are not truncated when they exceed the page size
+    limit (1 MB). Pages are only retrieved when the caller iterates that far.
+    """
+    args = _query_args(pkey, prefix, projection, after, **kwargs)
+    while True:
+        response = client.query(**args)
+        yield from response["Items"]
+
+        if (last_key := response.get("LastEvaluatedKey")) is None:
+            return
+        args["ExclusiveStartKey"] = last_key
+
+
+def expiry_time(retention: int) -> int:
+    """
+    Value of the TTL attribute of an item that should be kept for the given number of seconds.
+    DynamoDB deletes items some time after they expire.
+    """
+    return int(time.time()) + retention
+
+
+def is_expired(item) -> bool:
+    """
+    Checks if the item expired. Expired items may linger until DynamoDB gets round to deleting
+    them, so should be ignored.
+    """
+    return (ttl := item.get("TTL")) is not None and int(ttl["N"]) < time.time()
+
+
+def condition_failed(e: Exception) -> bool:
+    """
+    Checks if a transaction was cancelled because a condition of one of its actions failed
+    """
+    reasons = getattr(e, "response", {}).get("CancellationReasons", [])
+    return any(reason.get("Code") == "ConditionalCheckFailed" for reason in reasons)
+
+
+def is_conflict(e: Exception) -> bool:
+    """
+    Checks if a write failed because it conflicted with a concurrent transaction on the same item.
+    Such writes had no effect, so can safely be retried.
+    """
+    response = getattr(e, "response", {})
+    if response.get("Error", {}).get("Code") == "TransactionConflictException":
+        return True
+    reasons = response.get("CancellationReasons", [])
+    return any(reason.get("Code") == "TransactionConflict" for reason in reasons)
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter, so that clients that conflicted do not retry in lockstep
+    """
+    return random.uniform(0, Config.RETRY_BASE_DELAY * 2 ** attempt)
+
+
+def with_retries(fn, *args, **kwargs):
+    """
+    Invokes the write, and retries it with backoff while it conflicts with concurrent transactions.
+    botocore does not retry these conflicts itself. Writes to the Instance item of a quiz are
+    prone to these, as most changes to the quiz also update it.
+    """
+    for attempt in range(Config.MAX_WRITE_ATTEMPTS):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt + 1 == Config.MAX_WRITE_ATTEMPTS or not is_conflict(e):
+                raise
+            time.sleep(backoff_delay(attempt))
+
+
 class DynamoDbStorage:
 
-    def __init__(self, client=DEFAULT_CLIENT):
+    def __init__(self, client=None, link_connections=True):
+        """
+        Without link_connections, connections are not linked to their quiz in storage, so
+        quiz_for_connection cannot find them. This suits a gateway that keeps track of the quiz of
+        each of its connections itself.
+        """
+        if client is None:
+            client = default_client()
+        if Config.STORAGE_METRICS:
+            client = InstrumentedClient(client)
         self.client = client
+        self.cache = QuizCache()
+        self.link_connections = link_connections
 
     def globals_access(self):
         return Globals(self.client)
 
     def quiz_access(self, quiz_id):
-        return DynamoDbQuiz(quiz_id, self.client)
+        return DynamoDbQuiz(quiz_id, self.client, self.cache, self.link_connections)
 
     def create_quiz(self, quiz_id, host_id, name):
         """
@@ -41,40 +175,23 @@ class DynamoDbStorage:
                     "QuestionId": {"N": str(0)},
                     "IsQuestionOpen": {"BOOL": False},
                     "NumChoices": {"N": str(0)},
+                    "Version": {"N": str(0)},
+                    **{counter: {"N": str(0)} for counter in COUNTERS},
+                    # All items of the quiz expire together. The quiz should be archived before
+                    # then, if its results are to be kept.
+                    "TTL": {"N": str(expiry_time(Config.QUIZ_RETENTION))},
                 },
                 ConditionExpression="attribute_not_exists(PKEY)"
             )
-            return DynamoDbQuiz(quiz_id, self.client)
+            return DynamoDbQuiz(quiz_id, self.client, self.cache, self.link_connections)
         except Exception as e:
             logger.warn(f"Failed to create Quiz {quiz_id}: {e}")
 
-    def set_quiz_for_connection(self, connection, quiz_id):
-        try:
-            response = self.client.put_item(
-                TableName=Config.MAIN_TABLE,
-                Item={
-                    "PKEY": {"S": f"Conn#{connection}"},
-                    "SKEY": {"S": "Instance"},
-                    "QuizId": {"S": quiz_id}
-                },
-                ReturnValues="ALL_OLD"
-            )
-
-            if "Attributes" in response:
-                old_quiz = response["Attributes"]["QuizId"]["S"]
-                logger.warn(f"Replaced quiz {old_quiz} for Connection {connection} by {quiz_id}")
-            return True
-        except Exception as e:
-            logger.warn(f"Failed to set quiz for connection {connection}: {e}")
-
     def quiz_for_connection(self, connection):
         try:
             response = self.client.get_item(
                 TableName=Config.MAIN_TABLE,
-                Key={
-                    "PKEY": {"S": f"Conn#{connection}"},
-                    "SKEY": {"S": "Instance"}
-                }
+                Key=connection_key(connection)
             )
 
             if "Item" in response:
@@ -82,17 +199,69 @@ class DynamoDbStorage:
         except Exception as e:
             logger.warn(f"Failed to get quiz for connection {connection}: {e}")
 
-    def clear_quiz_for_connection(self, connection):
+    def load_archive(self, quiz_id) -> Optional[CompactSnapshot]:
+        """
+        Returns the archive of the quiz, if it was archived and the archive did not expire yet.
+        """
         try:
-            response = self.client.delete_item(
+            response = self.client.get_item(
                 TableName=Config.MAIN_TABLE,
-                Key={
-                    "PKEY": {"S": f"Conn#{connection}"},
-                    "SKEY": {"S": "Instance"}
-                },
+                Key=archive_key(quiz_id)
             )
+
+            if (item := response.get("Item")) is not None and not is_expired(item):
+                return CompactSnapshot.decode(item["Data"]["B"])
         except Exception as e:
-            logger.warn(f"Failed to clear quiz for connection {connection}: {e}")
+            logger.warn(f"Failed to load archive of Quiz {quiz_id}: {e}")
+
+
+def connection_key(connection):
+    """
+    Key of the item that links a connection to its quiz
+    """
+    return {
+        "PKEY": {"S": f"Conn#{connection}"},
+        "SKEY": {"S": "Instance"}
+    }
+
+
+def archive_key(quiz_id):
+    return {
+        "PKEY": {"S": f"Archive#{quiz_id}"},
+        "SKEY": {"S": "Instance"}
+    }
+
+
+def client_item(quiz_id, connection, client_id):
+    return {
+        "PKEY": {"S": f"Quiz#{quiz_id}"},
+        "SKEY": {"S": f"Conn#{connection}"},
+        "ClientId": {"S": client_id},
+    }
+
+
+def player_item(quiz_id, client_id, player: Player):
+    item = {
+        "PKEY": {"S": f"Quiz#{quiz_id}"},
+        "SKEY": {"S": f"Player#{client_id}"},
+        "Name": {"S": player.name},
+    }
+    if player.avatar:
+        item["Avatar"] = {"S": player.avatar}
+
+    return item
+
+
+def clients_from_items(items) -> dict[str, str]:
+    return {item["SKEY"]["S"][5:]: item["ClientId"]["S"] for item in items}
+
+
+def players_from_items(items) -> dict[str, Player]:
+    return {
+        item["SKEY"]["S"][7:]: Player(name=item["Name"]["S"],
+                                      avatar=col["S"] if (col := item.get("Avatar")) else None)
+        for item in items
+    }
 
 
 def question_from_item(item, author_id=None):
@@ -173,13 +342,95 @@ class Globals:
 
 class DynamoDbQuiz:
 
-    def __init__(self, quiz_id, client):
+    def __init__(self, quiz_id, client, cache=None, link_connections=True):
         self.quiz_id = quiz_id
         self.client = client
+        self.cache = cache if cache is not None else QuizCache()
+        self.link_connections = link_connections
 
-        self.__items = None
+        self.__snapshot: Optional[QuizSnapshot] = None
         self.__instance_item = None
 
+    @property
+    def _instance_key(self):
+        return {
+            "PKEY": {"S": f"Quiz#{self.quiz_id}"},
+            "SKEY": {"S": "Instance"}
+        }
+
+    @property
+    def _ttl(self) -> dict:
+        """
+        The TTL attribute, which is set on all items of the quiz
+        """
+        return {"TTL": {"N": str(self.expires_at)}}
+
+    def _add_score_action(self, client_id, score: str, delta: int):
+        """
+        Transaction action that adds to a score of the player. The first score creates the item,
+        so the update also sets its TTL.
+        """
+        return {
+            "Update": {
+                "TableName": Config.MAIN_TABLE,
+                "Key": {
+                    "PKEY": {"S": f"Scores#{self.quiz_id}"},
+                    "SKEY": {"S": f"Player#{client_id}"}
+                },
+                # TTL is a reserved word
+                "UpdateExpression": f"ADD {score} :delta SET #ttl = :ttl",
+                "ExpressionAttributeNames": {"#ttl": "TTL"},
+                "ExpressionAttributeValues": {
+                    ":delta": {"N": str(delta)},
+                    ":ttl": self._ttl["TTL"]
+                }
+            }
+        }
+
+    def _roster_changed(self, counters: Optional[dict[str, int]] = None):
+        """
+        Signals (to cached snapshots) that the roster changed, after its items were written, and
+        adds the given deltas to the counters on the Instance item.
+
+        This is a separate write, as a transaction would double the cost of every connect and
+        disconnect. A snapshot that was loaded in between the two writes is tagged with the old
+        roster version, so is not used once the version is incremented.
+        """
+        counters = counters or {}
+        try:
+            with_retries(
+                self.client.update_item,
+                TableName=Config.MAIN_TABLE,
+                Key=self._instance_key,
+                UpdateExpression=", ".join([
+                    "ADD Version :one, RosterVersion :one",
+                    *(f"{counter} :{counter}" for counter in counters)
+                ]),
+                ExpressionAttributeValues={
+                    ":one": {"N": "1"},
+                    **{f":{counter}": {"N": str(delta)} for counter, delta in counters.items()}
+                }
+            )
+            self._update_counters(counters)
+        except Exception as e:
+            # The roster items were written, so the change itself succeeded
+            logger.error(f"Failed to update roster version of Quiz {self.quiz_id}: {e}")
+        self.cache.invalidate(self.quiz_id)
+
+    def _counter(self, counter) -> int:
+        # Quizzes created before the counters were introduced lack these
+        return int(self.__instance_item.get(counter, {"N": "0"})["N"])
+
+    def _update_counters(self, counters: dict[str, int]):
+        """
+        Applies the deltas, after these were written, to the Instance item that was loaded
+        """
+        for counter, delta in counters.items():
+            self.__instance_item[counter] = {"N": str(self._counter(counter) + delta)}
+
+    def _connections_counter(self, client_id) -> str:
+        return "NumHostConnections" if client_id == self.host_id else "NumPlayerConnections"
+
     @property
     def host_id(self) -> str:
         return self.__instance_item["Host"]["S"]
@@ -203,63 +454,241 @@ class DynamoDbQuiz:
         """
         return int(self.__instance_item["NumChoices"]["N"])
 
-    def exists(self):
+    @property
+    def solution(self) -> Optional[int]:
+        """
+        Answer to current question
+        """
+        if (value := self.__instance_item.get("Solution")) is not None:
+            return int(value["N"])
+
+    @property
+    def version(self) -> int:
+        """
+        Incremented on every change to the quiz state, i.e. to the Instance item or the roster
+        """
+        return int(self.__instance_item.get("Version", {"N": "0"})["N"])
+
+    @property
+    def roster_version(self) -> int:
+        """
+        Incremented on every change to the connections and players. The cached snapshots are
+        tagged with it, so remain valid when only the question state changes.
+        """
+        return int(self.__instance_item.get("RosterVersion", {"N": "0"})["N"])
+
+    def get_counts(self) -> QuizCounts:
+        """
+        The counters are maintained on the Instance item, so these do not require any reads
+        """
+        return QuizCounts(*(self._counter(counter) for counter in COUNTERS))
+
+    @property
+    def event_seq(self) -> int:
+        """
+        Sequence number of the last event appended to the event log
+        """
+        return int(self.__instance_item.get("EventSeq", {"N": "0"})["N"])
+
+    @property
+    def snapshot_seq(self) -> int:
+        """
+        Sequence number of the latest compact snapshot. It is zero when none was written yet.
+        """
+        return int(self.__instance_item.get("SnapshotSeq", {"N": "0"})["N"])
+
+    @property
+    def expires_at(self) -> int:
+        """
+        Time (in seconds since the epoch) at which the items of the quiz expire
+        """
+        if (value := self.__instance_item.get("TTL")) is not None:
+            return int(value["N"])
+        # Quizzes created before TTLs were introduced expire a full retention period from now
+        return expiry_time(Config.QUIZ_RETENTION)
+
+    def exists(self, roster=True):
         """
         Checks if the quiz exists. This should be invoked first. This access wrapper can only be
         used when it returns True
+
+        Only the Instance item is read. The connections and players are each loaded when first
+        accessed, unless the cache holds them for the current roster version of the quiz. When
+        roster is True, both are loaded right away using a single query of the quiz partition.
+        When the quiz is not cached yet, the roster is taken from its compact snapshot, if still up
+        to date.
         """
         try:
-            response = self.client.query(
+            response = self.client.get_item(
                 TableName=Config.MAIN_TABLE,
-                KeyConditionExpression="PKEY = :pkey",
-                ExpressionAttributeValues={
-                    ":pkey": {"S": f"Quiz#{self.quiz_id}"}
-                }
+                Key=self._instance_key
             )
+            if (instance_item := response.get("Item")) is None or is_expired(instance_item):
+                return False
+            self.__instance_item = instance_item
+
+            if (snapshot := self.cache.get(self.quiz_id, self.roster_version)) is not None:
+                logger.info(f"Using cached snapshot for Quiz {self.quiz_id}")
+                self.__snapshot = snapshot
+            elif self.quiz_id in self.cache or not self._load_compact_roster():
+                if roster:
+                    self._load_partition()
+                else:
+                    self.__snapshot = self.cache.put(self.quiz_id, self.roster_version)
 
-            self.__items = response["Items"]
-            # logger.info("Data for quiz %s: %s", self.quiz_id, self.__items)
-            self.__instance_item = next(item for item in self.__items
-                                        if item["SKEY"]["S"] == "Instance")
-
-            return self.__instance_item is not None
+            return True
         except Exception as e:
             logger.warn(f"Failed to check existence of Quiz {self.quiz_id}: {e}")
 
+    def _load_partition(self):
+        # Tag the snapshot with the version read before the query. When the roster was modified in
+        # the meantime, this only causes an unneeded refresh later on.
+        version = self.roster_version
+
+        # Use consistent read, so that the snapshot contains all changes up to version
+        collections = {prefix: [] for prefix in ROSTER_PREFIXES}
+        for item in query_items(self.client, f"Quiz#{self.quiz_id}", ConsistentRead=True):
+            skey = item["SKEY"]["S"]
+            if skey == "Instance":
+                self.__instance_item = item
+            elif (prefix := skey[:skey.find("#") + 1]) in collections:
+                collections[prefix].append(item)
+
+        self.__snapshot = self.cache.put(self.quiz_id, version, collections)
+
+    def _load_compact_roster(self) -> bool:
+        """
+        Initializes the cached snapshot from the compact snapshot, if the roster did not change
+        since it was taken. Returns True on success.
+        """
+        self.__snapshot = self.cache.put(self.quiz_id, None)
+        if (compact := self._compact_snapshot()) is None or compact.version != self.roster_version:
+            return False
+
+        logger.info(f"Using compact snapshot for Quiz {self.quiz_id}")
+        self.__snapshot.version = self.roster_version
+        self.__snapshot.collections = {
+            "Conn#": [
+                client_item(self.quiz_id, connection, client_id)
+                for connection, client_id in compact.clients.items()
+            ],
+            "Player#": [
+                player_item(self.quiz_id, client_id, player)
+                for client_id, player in compact.players.items()
+            ],
+        }
+
+        return True
+
+    def _collection(self, prefix) -> list[dict]:
+        """
+        Returns the items in the quiz partition whose SKEY starts with the prefix. These are
+        queried only when not yet in the snapshot.
+        """
+        if (items := self.__snapshot.collections.get(prefix)) is None:
+            items = list(query_items(self.client, f"Quiz#{self.quiz_id}", prefix,
+                                     ConsistentRead=True))
+            self.__snapshot.collections[prefix] = items
+
+        return items
+
+    def has_changed(self) -> bool:
+        """
+        Cheap check if the quiz changed since it was loaded.
+
+        Some attributes of the Instance item (i.e. the event sequence and the pool counter) change
+        without incrementing the version. When the quiz did not change, the freshly read item
+        therefore replaces the loaded one.
+        """
+        try:
+            response = self.client.get_item(
+                TableName=Config.MAIN_TABLE,
+                Key=self._instance_key
+            )
+
+            if (instance_item := response.get("Item")) is None:
+                return True
+            if int(instance_item.get("Version", {"N": "0"})["N"]) != self.version:
+                return True
+
+            self.__instance_item = instance_item
+            return False
+        except Exception as e:
+            logger.warn(f"Failed to check version of Quiz {self.quiz_id}: {e}")
+            return True
+
     @property
     @functools.cache
     def clients(self) -> dict[str, str]:
-        return {
-            skey[5:]: item["ClientId"]["S"]
-            for item in self.__items
-            if (skey := item["SKEY"]["S"]).startswith("Conn#")
-        }
+        return clients_from_items(self._collection("Conn#"))
 
     @property
     @functools.cache
     def players(self) -> dict[str, Player]:
-        return {
-            skey[7:]: Player(name=item["Name"]["S"],
-                             avatar=col["S"] if (col := item.get("Avatar")) else None)
-            for item in self.__items
-            if (skey := item["SKEY"]["S"]).startswith("Player#")
-        }
+        return players_from_items(self._collection("Player#"))
 
-    def add_client(self, connection, client_id):
+    def _delete_client_item(self, connection, client_id) -> bool:
+        """
+        Deletes the connection item. Returns False when it was already deleted, e.g. because a
+        concurrent request reaped the connection.
+        """
         try:
-            item = {
-                "PKEY": {"S": f"Quiz#{self.quiz_id}"},
-                "SKEY": {"S": f"Conn#{connection}"},
-                "ClientId": {"S": client_id},
-            }
+            self.client.delete_item(
+                TableName=Config.MAIN_TABLE,
+                Key={
+                    "PKEY": {"S": f"Quiz#{self.quiz_id}"},
+                    "SKEY": {"S": f"Conn#{connection}"}
+                },
+                # Ensures that the connection counter is only decremented once
+                ConditionExpression="ClientId = :client_id",
+                ExpressionAttributeValues={":client_id": {"S": client_id}}
+            )
+            return True
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def _link_connection(self, connection):
+        """
+        Links the connection to the quiz. The link is written separately from the connection item,
+        so that it does not add to the cost of the transaction.
+        """
+        self.client.put_item(
+            TableName=Config.MAIN_TABLE,
+            Item={**connection_key(connection), "QuizId": {"S": self.quiz_id}, **self._ttl}
+        )
 
+    def _unlink_connection(self, connection):
+        try:
+            self.client.delete_item(
+                TableName=Config.MAIN_TABLE,
+                Key=connection_key(connection),
+                # The connection may have been linked to another quiz since
+                ConditionExpression="QuizId = :quiz_id",
+                ExpressionAttributeValues={":quiz_id": {"S": self.quiz_id}}
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            # Already unlinked, e.g. when the connection was reaped
+            pass
+        except Exception as e:
+            # The link expires eventually
+            logger.warn(f"Failed to unlink Connection {connection} from Quiz {self.quiz_id}: {e}")
+
+    def add_client(self, connection, client_id):
+        """
+        Adds the connection of the client, and links the connection to the quiz
+        """
+        try:
+            # Linked first, so that the connection can always be resolved once it was added. A
+            # link without connection item is harmless, as removing the connection is then a no-op.
+            if self.link_connections:
+                self._link_connection(connection)
             self.client.put_item(
                 TableName=Config.MAIN_TABLE,
-                Item=item,
-                # A client should disconnect first before re-joining using an
-                # existing connection
+                Item={**client_item(self.quiz_id, connection, client_id), **self._ttl},
+                # A client should disconnect first before re-joining using an existing connection
                 ConditionExpression="attribute_not_exists(PKEY)"
             )
+            self._roster_changed({self._connections_counter(client_id): 1})
 
             self.clients[connection] = client_id
 
@@ -267,41 +696,111 @@ class DynamoDbQuiz:
         except Exception as e:
             logger.warn(f"Failed to add Client {client_id} to Quiz {self.quiz_id}: {e}")
 
+    def _remove_connections(self, client_ids: dict[str, str]):
+        """
+        Removes the connections of the clients. Connections that were already removed, e.g.
+        because a concurrent request reaped them, are skipped. Their counters were decremented by
+        that request.
+        """
+        counters = {}
+        for connection, client_id in client_ids.items():
+            if self._delete_client_item(connection, client_id):
+                counter = self._connections_counter(client_id)
+                counters[counter] = counters.get(counter, 0) - 1
+
+        if counters:
+            self._roster_changed(counters)
+        else:
+            # The loaded connections are outdated
+            self.cache.invalidate(self.quiz_id)
+
     def remove_client(self, connection):
         try:
-            response = self.client.delete_item(
-                TableName=Config.MAIN_TABLE,
-                Key={
-                    "PKEY": {"S": f"Quiz#{self.quiz_id}"},
-                    "SKEY": {"S": f"Conn#{connection}"}
-                }
-            )
-
-            del self.clients[connection]
+            if (client_id := self.clients.get(connection)) is not None:
+                self._remove_connections({connection: client_id})
+                self.clients.pop(connection)
+                if self.link_connections:
+                    self._unlink_connection(connection)
 
             return self.clients
         except Exception as e:
             logger.warn(f"Failed to remove Connection {connection} from Room {self.quiz_id}: {e}")
 
-    def get_client_id(self, connection) -> str:
-        return self.clients.get(connection)
+    def _delete_items(self, keys: list[dict]):
+        """
+        Deletes the items in batches. Requests that DynamoDB did not process, e.g. due to
+        throttling, are retried with backoff.
+        """
+        for i in range(0, len(keys), 25):  # Max batch size
+            requests = [{"DeleteRequest": {"Key": key}} for key in keys[i:i + 25]]
+            for attempt in range(Config.MAX_WRITE_ATTEMPTS):
+                if attempt > 0:
+                    time.sleep(backoff_delay(attempt - 1))
+                response = self.client.batch_write_item(RequestItems={Config.MAIN_TABLE: requests})
+                if not (requests := response.get("UnprocessedItems", {}).get(Config.MAIN_TABLE)):
+                    break
+            else:
+                raise RuntimeError(f"Failed to delete {len(requests)} unprocessed items")
 
-    def add_or_update_player(self, client_id: str, name: str, avatar: Optional[str] = None) -> dict[str, Player]:
+    def _unlink_connections(self, connections):
+        # Not part of the transaction that removes the connections, as it could then exceed the
+        # maximum number of items
         try:
-            item = {
-                "PKEY": {"S": f"Quiz#{self.quiz_id}"},
-                "SKEY": {"S": f"Player#{client_id}"},
-                "Name": {"S": name},
+            self._delete_items([connection_key(connection) for connection in connections])
+        except Exception as e:
+            logger.warn(f"Failed to unlink Connections {connections} from Quiz {self.quiz_id}: {e}")
+
+    def remove_clients(self, connections):
+        try:
+            client_ids = {
+                connection: client_id for connection in connections
+                if (client_id := self.clients.get(connection)) is not None
             }
-            if avatar:
-                item["Avatar"] = {"S": avatar}
+            if client_ids:
+                self._remove_connections(client_ids)
 
+                for connection in client_ids:
+                    self.clients.pop(connection)
+                if self.link_connections:
+                    self._unlink_connections(list(client_ids))
+
+            return self.clients
+        except Exception as e:
+            logger.warn(f"Failed to remove Connections {connections} from Quiz {self.quiz_id}: {e}")
+
+    def get_client_id(self, connection) -> Optional[str]:
+        if "Conn#" in self.__snapshot.collections:
+            return self.clients.get(connection)
+
+        # Point lookup, to avoid loading all connections
+        try:
+            response = self.client.get_item(
+                TableName=Config.MAIN_TABLE,
+                Key={
+                    "PKEY": {"S": f"Quiz#{self.quiz_id}"},
+                    "SKEY": {"S": f"Conn#{connection}"}
+                },
+                ConsistentRead=True
+            )
+            if (item := response.get("Item")) is not None:
+                return item["ClientId"]["S"]
+        except Exception as e:
+            logger.warn(f"Failed to get Client for Connection {connection} in Quiz {self.quiz_id}: {e}")
+
+    def add_or_update_player(self, client_id: str, name: str, avatar: Optional[str] = None) -> dict[str, Player]:
+        try:
+            player = Player(name, avatar)
+            # The condition ensures that a player is counted only once
+            is_new = client_id not in self.players
             self.client.put_item(
                 TableName=Config.MAIN_TABLE,
-                Item=item
+                Item={**player_item(self.quiz_id, client_id, player), **self._ttl},
+                ConditionExpression=("attribute_not_exists(PKEY)" if is_new
+                                     else "attribute_exists(PKEY)")
             )
+            self._roster_changed({"NumPlayers": 1} if is_new else None)
 
-            self.players[client_id] = Player(name, avatar)
+            self.players[client_id] = player
 
             return self.players
         except Exception as e:
@@ -309,17 +808,41 @@ class DynamoDbQuiz:
                 f"Failed to add player {client_id} named {name}: {e}")
 
     def set_pool_question(self, question: Question):
+        item = {
+            "PKEY": {"S": f"Pool#{self.quiz_id}"},
+            "SKEY": {"S": f"ClientId#{question.author_id}"},
+            "Question": {"S": question.question},
+            "Choices": {"L": [{"S": choice} for choice in question.choices]},
+            "Answer": {"N": str(question.answer)},
+            **self._ttl
+        }
         try:
-            self.client.put_item(
-                TableName=Config.MAIN_TABLE,
-                Item={
-                    "PKEY": {"S": f"Pool#{self.quiz_id}"},
-                    "SKEY": {"S": f"ClientId#{question.author_id}"},
-                    "Question": {"S": question.question},
-                    "Choices": {"L": [{"S": choice} for choice in question.choices]},
-                    "Answer": {"N": str(question.answer)}
-                }
-            )
+            try:
+                # Add the question and count it. The pool is not part of the cached snapshot, so
+                # Version is not changed.
+                with_retries(self.client.transact_write_items, TransactItems=[
+                    {
+                        "Put": {
+                            "TableName": Config.MAIN_TABLE,
+                            "Item": item,
+                            "ConditionExpression": "attribute_not_exists(PKEY)"
+                        }
+                    },
+                    {
+                        "Update": {
+                            "TableName": Config.MAIN_TABLE,
+                            "Key": self._instance_key,
+                            "UpdateExpression": "ADD NumPoolQuestions :one",
+                            "ExpressionAttributeValues": {":one": {"N": "1"}},
+                        }
+                    }
+                ])
+                self._update_counters({"NumPoolQuestions": 1})
+            except self.client.exceptions.TransactionCanceledException as e:
+                if not condition_failed(e):
+                    raise
+                # The player already had a question in the pool, which is replaced
+                self.client.put_item(TableName=Config.MAIN_TABLE, Item=item)
 
             return True
         except Exception as e:
@@ -328,16 +851,9 @@ class DynamoDbQuiz:
 
     def get_pool_questions(self) -> list[Question]:
         try:
-            response = self.client.query(
-                TableName=Config.MAIN_TABLE,
-                KeyConditionExpression="PKEY = :pkey",
-                ExpressionAttributeValues={":pkey": {"S": f"Pool#{self.quiz_id}"}}
-            )
-
             return [
-                question_from_item(item, author_id=skey[9:])
-                for item in response["Items"]
-                if (skey := item["SKEY"]["S"]).startswith("ClientId#")
+                question_from_item(item, author_id=item["SKEY"]["S"][9:])
+                for item in query_items(self.client, f"Pool#{self.quiz_id}", prefix="ClientId#")
             ]
         except Exception as e:
             logger.warn(f"Failed to get pool questions for Quiz {self.quiz_id}: {e}")
@@ -371,6 +887,7 @@ class DynamoDbQuiz:
                     "Choices": {"L": [{"S": choice} for choice in question.choices]},
                     "Answer": {"N": str(question.answer)},
                     "Author": {"S": question.author_id},
+                    **self._ttl
                 },
             )
 
@@ -380,6 +897,9 @@ class DynamoDbQuiz:
                 f"Failed to set question {question_id} for Quiz {self.quiz_id}: {e}")
 
     def get_question(self, question_id) -> Optional[Question]:
+        if (question := self.cache.get_question(self.quiz_id, question_id)) is not None:
+            return question
+
         try:
             response = self.client.get_item(
                 TableName=Config.MAIN_TABLE,
@@ -390,36 +910,36 @@ class DynamoDbQuiz:
             )
 
             if (item := response.get("Item")):
-                return question_from_item(item)
+                question = question_from_item(item)
+                self.cache.put_question(self.quiz_id, question_id, question)
+                return question
         except Exception as e:
             logger.warn(f"Failed to get question {question_id} for Quiz {self.quiz_id}: {e}")
 
     def get_questions(self) -> dict[str, Question]:
         try:
-            response = self.client.query(
-                TableName=Config.MAIN_TABLE,
-                KeyConditionExpression="PKEY = :pkey",
-                ExpressionAttributeValues={":pkey": {"S": f"Questions#{self.quiz_id}"}}
-            )
+            if (compact := self._compact_snapshot()) is None:
+                return {
+                    item["SKEY"]["S"]: question_from_item(item)
+                    for item in query_items(self.client, f"Questions#{self.quiz_id}")
+                }
 
-            return {
-                item["SKEY"]["S"]: question_from_item(item)
-                for item in response["Items"]
-            }
+            # Only the questions asked after the snapshot need to be retrieved
+            questions = {str(id): question for id, question in compact.questions.items()}
+            for question_id in range(compact.question_id + 1, self.question_id + 1):
+                if (question := self.get_question(question_id)) is not None:
+                    questions[str(question_id)] = question
+
+            return questions
         except Exception as e:
             logger.warn(f"Failed to get questions for Quiz {self.quiz_id}: {e}")
 
     def get_solutions(self) -> dict[str, int]:
         try:
-            response = self.client.query(
-                TableName=Config.MAIN_TABLE,
-                KeyConditionExpression="PKEY = :pkey",
-                ExpressionAttributeValues={":pkey": {"S": f"Questions#{self.quiz_id}"}}
-            )
-
             return {
                 item["SKEY"]["S"]: int(item["Answer"]["N"])
-                for item in response["Items"]
+                for item in query_items(self.client, f"Questions#{self.quiz_id}",
+                                        projection=["SKEY", "Answer"])
             }
         except Exception as e:
             logger.warn(f"Failed to get solutions for Quiz {self.quiz_id}: {e}")
@@ -433,19 +953,35 @@ class DynamoDbQuiz:
             if not self.set_question(question, new_id):
                 return
 
+            # Reset its tally. Overwriting is safe, as no answers can be stored until the question
+            # is opened.
+            self.client.put_item(
+                TableName=Config.MAIN_TABLE,
+                Item={
+                    "PKEY": {"S": f"Scores#{self.quiz_id}"},
+                    "SKEY": {"S": f"Question#{new_id}"},
+                    "Author": {"S": question.author_id},
+                    "NumChoices": {"N": str(len(question.choices))},
+                    "NumAnswers": {"N": str(0)},
+                    "NumCorrect": {"N": str(0)},
+                    **self._ttl
+                }
+            )
+
             # Next update the active question index
-            response = self.client.update_item(
+            response = with_retries(
+                self.client.update_item,
                 TableName=Config.MAIN_TABLE,
-                Key={
-                    "PKEY": {"S": f"Quiz#{self.quiz_id}"},
-                    "SKEY": {"S": "Instance"}
-                },
-                UpdateExpression="SET QuestionId = :new_id, IsQuestionOpen = :open, NumChoices = :nc",
+                Key=self._instance_key,
+                UpdateExpression=("SET QuestionId = :new_id, IsQuestionOpen = :open, NumChoices = :nc,"
+                                  " Solution = :solution ADD Version :one"),
                 ExpressionAttributeValues={
                     ":old_id": {"N": str(old_id)},
                     ":new_id": {"N": str(new_id)},
                     ":nc": {"N": str(len(question.choices))},
-                    ":open": {"BOOL": True}
+                    ":solution": {"N": str(question.answer)},
+                    ":open": {"BOOL": True},
+                    ":one": {"N": "1"}
                 },
                 ConditionExpression="QuestionId = :old_id",
                 ReturnValues="UPDATED_NEW"
@@ -453,59 +989,460 @@ class DynamoDbQuiz:
 
             for key, value in response["Attributes"].items():
                 self.__instance_item[key] = value
+            # The roster did not change, so the cached snapshot remains valid
+            self.cache.put_question(self.quiz_id, new_id, question)
 
             return self.question_id
         except Exception as e:
             logger.warn(f"Failed to open new question: {e}")
 
-    def store_answer(self, question_id, client_id, answer: int):
+    def store_answer(self, question_id, client_id, answer: int, is_correct: bool):
+        """
+        Stores the answer, and updates the question tally and the player's score, in a single
+        transaction. Returns False when the player already answered the question.
+
+        The tally is shared by all answers to the question, so the transactions of players that
+        answer at the same time may conflict. These are retried.
+        """
         try:
-            self.client.put_item(
-                TableName=Config.MAIN_TABLE,
-                Item={
-                    "PKEY": {"S": f"Answers#{self.quiz_id}"},
-                    "SKEY": {"S": f"{question_id}#{client_id}"},
-                    "Answer": {"N": str(answer)}
-                },
-                ConditionExpression="attribute_not_exists(PKEY)"
-            )
+            with_retries(self.client.transact_write_items,
+                         TransactItems=self._store_answers_actions(
+                             question_id, [Answer(client_id, answer, is_correct)]))
 
             return True
         except Exception as e:
+            if condition_failed(e):
+                return False
             logger.warn(
                 f"Failed to store answer for client {client_id} for question {question_id}: {e}")
 
-    def get_answers(self) -> dict[str, dict[str, int]]:
-        try:
-            response = self.client.query(
-                TableName=Config.MAIN_TABLE,
-                KeyConditionExpression="PKEY = :pkey",
-                ExpressionAttributeValues={":pkey": {"S": f"Answers#{self.quiz_id}"}}
+    def _store_answers_actions(self, question_id, answers: list[Answer]) -> list[dict]:
+        """
+        Transaction actions that store the answers, and add these to the question tally and the
+        players' scores. The answers are stored first, in the order given.
+        """
+        choice_counts = defaultdict(int)
+        for answer in answers:
+            choice_counts[answer.answer] += 1
+        correct_answers = [answer for answer in answers if answer.is_correct]
+
+        return [
+            *(
+                {
+                    "Put": {
+                        "TableName": Config.MAIN_TABLE,
+                        "Item": {
+                            "PKEY": {"S": f"Answers#{self.quiz_id}"},
+                            "SKEY": {"S": f"{question_id}#{answer.client_id}"},
+                            "Answer": {"N": str(answer.answer)},
+                            **self._ttl
+                        },
+                        "ConditionExpression": "attribute_not_exists(PKEY)"
+                    }
+                }
+                for answer in answers
+            ),
+            {
+                "Update": {
+                    "TableName": Config.MAIN_TABLE,
+                    "Key": {
+                        "PKEY": {"S": f"Scores#{self.quiz_id}"},
+                        "SKEY": {"S": f"Question#{question_id}"}
+                    },
+                    "UpdateExpression": "ADD NumAnswers :num_answers, NumCorrect :num_correct, " +
+                    ", ".join(f"#choice{choice} :choice{choice}" for choice in choice_counts),
+                    "ExpressionAttributeNames": {
+                        f"#choice{choice}": f"Choice{choice}" for choice in choice_counts
+                    },
+                    "ExpressionAttributeValues": {
+                        ":num_answers": {"N": str(len(answers))},
+                        ":num_correct": {"N": str(len(correct_answers))},
+                        **{
+                            f":choice{choice}": {"N": str(count)}
+                            for choice, count in choice_counts.items()
+                        }
+                    }
+                }
+            },
+            *(
+                self._add_score_action(answer.client_id, "AnswerScore", 1)
+                for answer in correct_answers
             )
+        ]
+
+    def store_answers(self, question_id, answers: list[Answer]) -> list[Answer]:
+        """
+        Stores a batch of answers, and updates the question tally and the players' scores. Returns
+        the answers that were stored. Answers of players that already answered the question are
+        ignored. Each player may only occur once in the batch.
+
+        The answers are written in chunks. Each chunk is a single transaction that stores the
+        answers together with their effect on the tally and scores, so that answers are never
+        stored without being counted. When a chunk fails, the answers of the chunks before it
+        remain stored, and are returned.
+        """
+        stored = []
+        try:
+            for i in range(0, len(answers), ANSWERS_PER_TRANSACTION):
+                chunk = answers[i:i + ANSWERS_PER_TRANSACTION]
+                while chunk:
+                    try:
+                        with_retries(self.client.transact_write_items,
+                                     TransactItems=self._store_answers_actions(question_id, chunk))
+                        stored.extend(chunk)
+                        break
+                    except self.client.exceptions.TransactionCanceledException as e:
+                        if not condition_failed(e):
+                            raise
+                        # The reasons match the actions, which start with the answers. Retry
+                        # without the answers that were stored already.
+                        reasons = e.response["CancellationReasons"]
+                        for answer, reason in zip(chunk, reasons):
+                            if reason.get("Code") == "ConditionalCheckFailed":
+                                logger.warn(f"Ignored answer for client {answer.client_id} for "
+                                            f"question {question_id}: Already answered")
+                        chunk = [
+                            answer for answer, reason in zip(chunk, reasons)
+                            if reason.get("Code") != "ConditionalCheckFailed"
+                        ]
+
+            return stored
+        except Exception as e:
+            logger.warn(f"Failed to store {len(answers) - len(stored)} of {len(answers)} answers "
+                        f"for question {question_id}: {e}")
+            return stored
+
+    def _add_answers(self, answers: dict[str, dict[str, int]], prefix=None):
+        # Build the result while iterating over the (possibly many) pages, without first
+        # collecting all items
+        for item in query_items(self.client, f"Answers#{self.quiz_id}", prefix,
+                                projection=["SKEY", "Answer"]):
+            question_id, client_id = item["SKEY"]["S"].split("#", 2)
+            answer = int(item["Answer"]["N"])
+            answers[question_id][client_id] = answer
 
+    def get_answers(self) -> dict[str, dict[str, int]]:
+        try:
             answers = defaultdict(dict)
-            for item in response["Items"]:
-                question_id, client_id = item["SKEY"]["S"].split("#", 2)
-                answer = int(item["Answer"]["N"])
-                answers[question_id][client_id] = answer
+            if (compact := self._compact_snapshot()) is None:
+                self._add_answers(answers)
+                return answers
+
+            # Only the answers to questions asked after the snapshot need to be retrieved, and
+            # those to its last question when some were stored after it was taken
+            first_id = compact.question_id + (1 if self._has_all_answers(compact) else 0)
+            for question_id, question_answers in compact.answers.items():
+                if question_id < first_id:
+                    answers[str(question_id)].update(question_answers)
+            for question_id in range(first_id, self.question_id + 1):
+                self._add_answers(answers, prefix=f"{question_id}#")
 
             return answers
         except Exception as e:
             logger.warn(
                 f"Failed to retrieve answers for quiz {self.quiz_id}: {e}")
 
-    def close_question(self):
+    def score_question(self, question_id) -> Optional[int]:
+        """
+        (Re-)calculates the score for the question. It becomes the question score of its author,
+        unless a later question of the author was scored already. This is idempotent.
+
+        A compact snapshot of the quiz is written after every SNAPSHOT_INTERVAL questions.
+        """
+        try:
+            response = self.client.get_item(
+                TableName=Config.MAIN_TABLE,
+                Key={
+                    "PKEY": {"S": f"Scores#{self.quiz_id}"},
+                    "SKEY": {"S": f"Question#{question_id}"}
+                },
+                ConsistentRead=True
+            )
+            if (item := response.get("Item")) is None:
+                return None
+
+            author_id = item["Author"]["S"]
+            score = Scoring.question_score(num_correct=int(item["NumCorrect"]["N"]),
+                                           num_answers=int(item["NumAnswers"]["N"]))
+
+            try:
+                with_retries(
+                    self.client.update_item,
+                    TableName=Config.MAIN_TABLE,
+                    Key={
+                        "PKEY": {"S": f"Scores#{self.quiz_id}"},
+                        "SKEY": {"S": f"Player#{author_id}"}
+                    },
+                    # TTL is a reserved word. The first score creates the item, so also sets it.
+                    UpdateExpression="SET QuestionScore = :score, ScoredQuestionId = :question_id,"
+                                     " #ttl = :ttl",
+                    ConditionExpression="attribute_not_exists(ScoredQuestionId)"
+                                        " OR ScoredQuestionId <= :question_id",
+                    ExpressionAttributeNames={"#ttl": "TTL"},
+                    ExpressionAttributeValues={
+                        ":score": {"N": str(score)},
+                        ":question_id": {"N": str(question_id)},
+                        ":ttl": self._ttl["TTL"]
+                    }
+                )
+            except self.client.exceptions.ConditionalCheckFailedException:
+                # The author's score is that of their later question
+                pass
+
+            if question_id == self.question_id and question_id % Config.SNAPSHOT_INTERVAL == 0:
+                self.write_snapshot()
+
+            return score
+        except Exception as e:
+            logger.warn(f"Failed to score question {question_id} for Quiz {self.quiz_id}: {e}")
+
+    def get_question_stats(self, question_id) -> Optional[QuestionStats]:
         try:
-            self.client.update_item(
+            response = self.client.get_item(
                 TableName=Config.MAIN_TABLE,
                 Key={
-                    "PKEY": {"S": f"Quiz#{self.quiz_id}"},
+                    "PKEY": {"S": f"Scores#{self.quiz_id}"},
+                    "SKEY": {"S": f"Question#{question_id}"}
+                }
+            )
+
+            if (item := response.get("Item")):
+                return QuestionStats(
+                    num_answers=int(item["NumAnswers"]["N"]),
+                    num_correct=int(item["NumCorrect"]["N"]),
+                    choice_counts=[
+                        int(item.get(f"Choice{choice}", {"N": "0"})["N"])
+                        for choice in range(1, int(item["NumChoices"]["N"]) + 1)
+                    ]
+                )
+        except Exception as e:
+            logger.warn(f"Failed to get stats of question {question_id} for Quiz {self.quiz_id}: {e}")
+
+    def get_scores(self) -> dict[str, PlayerScore]:
+        try:
+            # The scores in the snapshot are only valid until the next question is opened, and
+            # only when no answers were stored after it was taken
+            compact = self._compact_snapshot()
+            if (compact is not None and compact.question_id == self.question_id
+                    and self._has_all_answers(compact)):
+                return dict(compact.scores)
+
+            return {
+                item["SKEY"]["S"][7:]: PlayerScore(
+                    answer_score=int(item.get("AnswerScore", {"N": "0"})["N"]),
+                    question_score=int(item.get("QuestionScore", {"N": "0"})["N"])
+                )
+                for item in query_items(self.client, f"Scores#{self.quiz_id}", prefix="Player#")
+            }
+        except Exception as e:
+            logger.warn(f"Failed to get scores for Quiz {self.quiz_id}: {e}")
+
+    def _compact_snapshot(self) -> Optional[CompactSnapshot]:
+        """
+        Returns the latest compact snapshot of the quiz, if any. It is retrieved only when the
+        cached one is older than the snapshot that the Instance item refers to, e.g. because
+        another process wrote a newer one.
+        """
+        if self.snapshot_seq == 0:
+            # No snapshot has been written yet
+            return None
+        compact = self.cache.get_compact(self.quiz_id)
+        if compact is not None and compact.seq >= self.snapshot_seq:
+            return compact
+
+        try:
+            response = self.client.get_item(
+                TableName=Config.MAIN_TABLE,
+                Key={
+                    "PKEY": {"S": f"Snapshot#{self.quiz_id}"},
                     "SKEY": {"S": "Instance"}
+                }
+            )
+
+            if (item := response.get("Item")) is not None:
+                compact = CompactSnapshot.decode(item["Data"]["B"])
+                self.cache.put_compact(self.quiz_id, compact)
+                return compact
+        except Exception as e:
+            logger.warn(f"Failed to get snapshot of Quiz {self.quiz_id}: {e}")
+
+    def _has_all_answers(self, compact: CompactSnapshot) -> bool:
+        """
+        Checks if the snapshot holds all answers to its last question. An answer that raced the
+        closing of the question may have been stored after the snapshot was taken. It is then
+        counted in the tally of the question, which is written together with the answer.
+        """
+        if (stats := self.get_question_stats(compact.question_id)) is None:
+            return False
+        return stats.num_answers == len(compact.answers.get(compact.question_id, {}))
+
+    def write_snapshot(self) -> Optional[CompactSnapshot]:
+        """
+        Writes a compact snapshot of the quiz. It should only be invoked once the current question
+        has been closed and scored, as the snapshot must only contain final answers.
+
+        It builds on the previous snapshot, so only the questions and answers since then are
+        retrieved. The roster is freshly loaded, so that it matches its version.
+        """
+        try:
+            response = self.client.get_item(
+                TableName=Config.MAIN_TABLE,
+                Key=self._instance_key,
+                ConsistentRead=True
+            )
+            self.__instance_item = response["Item"]
+            if self.is_question_open:
+                logger.warn(f"Cannot snapshot Quiz {self.quiz_id} while question is open")
+                return None
+
+            self._load_partition()
+            collections = self.__snapshot.collections
+            compact = CompactSnapshot(
+                version=self.roster_version,
+                question_id=self.question_id,
+                event_seq=self.event_seq,
+                clients=clients_from_items(collections["Conn#"]),
+                players=players_from_items(collections["Player#"]),
+                questions={int(id): question for id, question in self.get_questions().items()},
+                answers={int(id): answers for id, answers in self.get_answers().items()},
+                scores=self.get_scores(),
+            )
+
+            # Number the snapshot. The Instance item then refers to it, so that cached copies of
+            # older snapshots are no longer used. Version is not changed, as it does not affect the
+            # roster.
+            response = with_retries(
+                self.client.update_item,
+                TableName=Config.MAIN_TABLE,
+                Key=self._instance_key,
+                UpdateExpression="ADD SnapshotSeq :one",
+                ExpressionAttributeValues={":one": {"N": "1"}},
+                ReturnValues="UPDATED_NEW"
+            )
+            compact.seq = int(response["Attributes"]["SnapshotSeq"]["N"])
+
+            # Never replace a newer snapshot, which a concurrent invocation may have written
+            self.client.put_item(
+                TableName=Config.MAIN_TABLE,
+                Item={
+                    "PKEY": {"S": f"Snapshot#{self.quiz_id}"},
+                    "SKEY": {"S": "Instance"},
+                    "Seq": {"N": str(compact.seq)},
+                    "Version": {"N": str(compact.version)},
+                    "QuestionId": {"N": str(compact.question_id)},
+                    "EventSeq": {"N": str(compact.event_seq)},
+                    "Data": {"B": compact.encode()},
+                    **self._ttl
+                },
+                ConditionExpression="attribute_not_exists(PKEY) OR (QuestionId <= :question_id"
+                                    " AND (attribute_not_exists(Seq) OR Seq < :seq))",
+                ExpressionAttributeValues={
+                    ":question_id": {"N": str(compact.question_id)},
+                    ":seq": {"N": str(compact.seq)}
+                }
+            )
+            self.cache.put_compact(self.quiz_id, compact)
+            logger.info(f"Wrote snapshot of Quiz {self.quiz_id} at question {compact.question_id}")
+
+            return compact
+        except Exception as e:
+            logger.warn(f"Failed to write snapshot of Quiz {self.quiz_id}: {e}")
+
+    def append_event(self, messages: dict[ClientRole, dict]) -> Optional[int]:
+        """
+        Appends an event to the quiz's event log. The event consists of the message that clients of
+        each role received. Returns the sequence number of the event.
+        """
+        try:
+            # The sequence counter is not part of the cached snapshot, so Version is not changed
+            response = with_retries(
+                self.client.update_item,
+                TableName=Config.MAIN_TABLE,
+                Key=self._instance_key,
+                UpdateExpression="ADD EventSeq :one",
+                ExpressionAttributeValues={":one": {"N": "1"}},
+                ReturnValues="UPDATED_NEW"
+            )
+            self.__instance_item["EventSeq"] = response["Attributes"]["EventSeq"]
+            seq = self.event_seq
+
+            self.client.put_item(
+                TableName=Config.MAIN_TABLE,
+                Item={
+                    "PKEY": {"S": f"Events#{self.quiz_id}"},
+                    "SKEY": {"S": f"{seq:010d}"},
+                    **{role.name: {"S": json.dumps(message)} for role, message in messages.items()},
+                    **self._ttl
+                }
+            )
+
+            return seq
+        except Exception as e:
+            logger.warn(f"Failed to append event to Quiz {self.quiz_id}: {e}")
+
+    def get_events(self, since: int, role: ClientRole) -> Optional[list[dict]]:
+        """
+        Returns the messages for the given role of the events after the given sequence number. The
+        sequence number of each event is added to its message.
+        """
+        try:
+            events = []
+            for item in query_items(self.client, f"Events#{self.quiz_id}",
+                                    projection=["SKEY", role.name], after=f"{since:010d}"):
+                if (message := item.get(role.name)) is not None:
+                    events.append({**json.loads(message["S"]), "seq": int(item["SKEY"]["S"])})
+
+            return events
+        except Exception as e:
+            logger.warn(f"Failed to get events for Quiz {self.quiz_id}: {e}")
+
+    def close_question(self):
+        try:
+            with_retries(
+                self.client.update_item,
+                TableName=Config.MAIN_TABLE,
+                Key=self._instance_key,
+                UpdateExpression="SET IsQuestionOpen = :closed ADD Version :one",
+                ExpressionAttributeValues={
+                    ":closed": {"BOOL": False},
+                    ":one": {"N": "1"}
                 },
-                UpdateExpression="SET IsQuestionOpen = :closed",
-                ExpressionAttributeValues={":closed": {"BOOL": False}},
             )
 
             return True
         except Exception as e:
             logger.warn(f"Failed to get update state for Quiz {self.quiz_id}: {e}")
+
+    def archive(self, archive: CompactSnapshot):
+        """
+        Stores the archive of the quiz in a single item, and then deletes the items of the quiz.
+        The Instance item is deleted first, so that the quiz is gone even when deleting the other
+        items fails midway. Their TTL then still ensures that these are deleted eventually.
+        """
+        try:
+            self.client.put_item(
+                TableName=Config.MAIN_TABLE,
+                Item={
+                    **archive_key(self.quiz_id),
+                    "Data": {"B": archive.encode()},
+                    "TTL": {"N": str(expiry_time(Config.ARCHIVE_RETENTION))},
+                }
+            )
+
+            connections = list(self.clients)
+            self.client.delete_item(TableName=Config.MAIN_TABLE, Key=self._instance_key)
+            self.cache.remove(self.quiz_id)
+
+            for prefix in QUIZ_PARTITIONS:
+                self._delete_items([
+                    {"PKEY": item["PKEY"], "SKEY": item["SKEY"]}
+                    for item in query_items(self.client, f"{prefix}{self.quiz_id}",
+                                            projection=["PKEY", "SKEY"])
+                ])
+            if self.link_connections:
+                self._unlink_connections(connections)
+            logger.info(f"Archived Quiz {self.quiz_id} at question {archive.question_id}")
+
+            return True
+        except Exception as e:
+            logger.warn(f"Failed to archive Quiz {self.quiz_id}: {e}")
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from typing import Optional
+from Common import Config, Payload
+
+logger = logging.getLogger('backend.events')
+
+
+class EventBatcher:
+    """
+    Coalesces the notifications for hosts of a quiz. Events are collected during a short window,
+    and then sent as a single "events" message to each recipient connection.
+
+    Connections must opt in (when they connect), as the message format differs from that of
+    individual notifications. It is only suitable for a long-running process that handles all
+    connections of a quiz, i.e. the LocalGateway.
+
+    Messages that are sent to a connection directly must not overtake the events that are pending
+    for it. Senders therefore invoke flush_before first.
+    """
+
+    def __init__(self, comms, window=Config.EVENT_BATCH_WINDOW):
+        self.comms = comms
+        self.window = window
+
+        # Connections that opted in
+        self.connections: set[str] = set()
+        # Quiz ID => (Events, Recipient connections)
+        self.__pending: dict[str, tuple[list[dict], set[str]]] = {}
+        # Quiz ID => Task that sends the last batch that was flushed. This also keeps a reference
+        # to the task, as the event loop only keeps weak ones.
+        self.__flushing: dict[str, asyncio.Task] = {}
+
+    def enable(self, connection):
+        self.connections.add(connection)
+
+    def disable(self, connection):
+        self.connections.discard(connection)
+
+    def is_enabled(self, connection) -> bool:
+        return connection in self.connections
+
+    def add(self, quiz_id, event: dict, connections: list[str]):
+        if (pending := self.__pending.get(quiz_id)) is None:
+            pending = self.__pending[quiz_id] = ([], set())
+            asyncio.get_running_loop().call_later(self.window, self._flush, quiz_id)
+
+        events, recipients = pending
+        events.append(event)
+        recipients.update(connections)
+
+    async def flush_before(self, quiz_id, connections: list[str]):
+        """
+        Invoke before sending a message directly to the connections. When events are pending for
+        any of these, the batch is flushed right away. Returns once the events were sent.
+        """
+        _, recipients = self.__pending.get(quiz_id, ((), set()))
+        if not recipients.isdisjoint(connections):
+            self._flush(quiz_id)
+        if (task := self.__flushing.get(quiz_id)) is not None:
+            await task
+
+    def _flush(self, quiz_id):
+        if (pending := self.__pending.pop(quiz_id, None)) is None:
+            # Flushed early already
+            return
+
+        # Batches of the quiz are sent in order
+        task = asyncio.create_task(self._send(*pending, self.__flushing.get(quiz_id)))
+        self.__flushing[quiz_id] = task
+
+        def done(_):
+            if self.__flushing.get(quiz_id) is task:
+                del self.__flushing[quiz_id]
+        task.add_done_callback(done)
+
+    async def _send(self, events: list[dict], recipients: set[str],
+                    previous: Optional[asyncio.Task]):
+        if previous is not None:
+            await previous
+
+        message = Payload.from_message({
+            "type": "events",
+            "events": events,
+        })
+
+        recipients = list(recipients)
+        results = await asyncio.gather(*(self.comms.send(ws, message) for ws in recipients),
+                                       return_exceptions=True)
+        for ws, result in zip(recipients, results):
+            # Gone connections are cleaned up when the gateway handles their disconnect
+            if result is not None:
+                logger.warn(f"Failed to send {len(events)} events to {ws}: {result}")
@@ -0,0 +1,412 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+import logging
+import os
+from typing import Optional
+import Scoring
+from Common import (Answer, ClientRole, Config, Player, PlayerScore, Question, QuestionStats,
+                    QuizCounts)
+from CompactSnapshot import CompactSnapshot
+
+logger = logging.getLogger('backend.memory')
+
+
+@dataclass
+class QuestionTally:
+    author_id: str
+    choice_counts: list[int]
+    num_correct: int = 0
+    score: Optional[int] = None
+
+    @property
+    def num_answers(self) -> int:
+        return sum(self.choice_counts)
+
+
+@dataclass
+class QuizData:
+    host_id: str
+    name: str
+    question_id: int = 0
+    is_question_open: bool = False
+    num_choices: int = 0
+    solution: Optional[int] = None
+    version: int = 0
+
+    # Connection => Client ID
+    clients: dict[str, str] = field(default_factory=dict)
+    # Client ID => Player
+    players: dict[str, Player] = field(default_factory=dict)
+    # Author ID => Question
+    pool: dict[str, Question] = field(default_factory=dict)
+    # Question ID => Question
+    questions: dict[int, Question] = field(default_factory=dict)
+    # Question ID => Client ID => Answer
+    answers: defaultdict[int, dict[str, int]] = field(default_factory=lambda: defaultdict(dict))
+    # Question ID => QuestionTally
+    tallies: dict[int, QuestionTally] = field(default_factory=dict)
+    # Client ID => PlayerScore
+    scores: defaultdict[str, PlayerScore] = field(default_factory=lambda: defaultdict(PlayerScore))
+    # Event log. The sequence number of an event is its position in the list, starting at one
+    events: list[dict[ClientRole, dict]] = field(default_factory=list)
+
+
+class InMemoryStorage:
+    """
+    Keeps all state in process memory. It offers the same interface as DynamoDbStorage.
+
+    It is intended for self-hosted events, where a single LocalService process handles all
+    messages. State is lost when the process terminates. Only quizzes that were archived are
+    kept, as these are written to files.
+    """
+
+    def __init__(self, archive_path=Config.ARCHIVE_PATH, link_connections=True):
+        self.quizzes: dict[str, QuizData] = {}
+        # Connection => Quiz ID. Only maintained with link_connections, see DynamoDbStorage
+        self.connections: dict[str, str] = {}
+        self.link_connections = link_connections
+        self.globals = InMemoryGlobals()
+        self.archive_path = archive_path
+
+    def globals_access(self):
+        return self.globals
+
+    def quiz_access(self, quiz_id):
+        return InMemoryQuiz(quiz_id, self)
+
+    def create_quiz(self, quiz_id, host_id, name):
+        """
+        Tries to create a room with the given ID. On success, returns the room access wrapper.
+        Returns None if creation failed.
+        """
+        if quiz_id in self.quizzes:
+            return logger.warn(f"Failed to create Quiz {quiz_id}: Quiz already exists")
+
+        self.quizzes[quiz_id] = QuizData(host_id=host_id, name=name)
+        return InMemoryQuiz(quiz_id, self)
+
+    def quiz_for_connection(self, connection):
+        return self.connections.get(connection)
+
+    def archive_file(self, quiz_id) -> str:
+        if not quiz_id.isalnum():
+            # Guards against paths outside the archive directory
+            raise ValueError(f"Invalid quiz ID {quiz_id}")
+        return os.path.join(self.archive_path, f"{quiz_id}.quiz")
+
+    def load_archive(self, quiz_id) -> Optional[CompactSnapshot]:
+        try:
+            return CompactSnapshot.read_file(self.archive_file(quiz_id))
+        except Exception as e:
+            logger.warn(f"Failed to load archive of Quiz {quiz_id}: {e}")
+
+
+class InMemoryGlobals:
+
+    def __init__(self):
+        self.__globals: dict[str, str] = {}
+
+    def _set_global_str(self, name: str, value: str):
+        if (old_value := self.__globals.get(name)) is not None:
+            logger.info(f"Changed global {name} from {old_value} to {value}")
+        else:
+            logger.info(f"Set global {name} to {value}")
+        self.__globals[name] = value
+        return True
+
+    @property
+    def root_user(self):
+        return self.__globals.get("RootUser")
+
+    def set_root_user(self, value):
+        return self._set_global_str("RootUser", value)
+
+    @property
+    def default_quiz_id(self):
+        return self.__globals.get("DefaultQuizId")
+
+    def set_default_quiz_id(self, value):
+        return self._set_global_str("DefaultQuizId", value)
+
+
+class InMemoryQuiz:
+    """
+    Access wrapper for a quiz. In contrast to DynamoDbQuiz, it does not operate on a snapshot of
+    the quiz, but on the live data that is shared with other requests.
+    """
+
+    def __init__(self, quiz_id, storage: InMemoryStorage):
+        self.quiz_id = quiz_id
+        self.storage = storage
+
+        self.__data: Optional[QuizData] = None
+        self.__loaded_version = None
+
+    def _changed(self):
+        self.__data.version += 1
+
+    @property
+    def host_id(self) -> str:
+        return self.__data.host_id
+
+    @property
+    def name(self) -> str:
+        return self.__data.name
+
+    @property
+    def question_id(self) -> int:
+        return self.__data.question_id
+
+    @property
+    def is_question_open(self) -> bool:
+        return self.__data.is_question_open
+
+    @property
+    def num_choices(self) -> int:
+        """
+        Number of choices for current question
+        """
+        return self.__data.num_choices
+
+    @property
+    def solution(self) -> Optional[int]:
+        """
+        Answer to current question
+        """
+        return self.__data.solution
+
+    @property
+    def version(self) -> int:
+        """
+        Incremented on every change to the quiz
+        """
+        return self.__data.version
+
+    @property
+    def event_seq(self) -> int:
+        """
+        Sequence number of the last event appended to the event log
+        """
+        return len(self.__data.events)
+
+    def exists(self, roster=True):
+        """
+        Checks if the quiz exists. This should be invoked first. This access wrapper can only be
+        used when it returns True
+
+        The roster argument is accepted for compatibility with the other storage backends. All data
+        is in memory already, so there is nothing to defer.
+        """
+        if (data := self.storage.quizzes.get(self.quiz_id)) is None:
+            return False
+
+        self.__data = data
+        self.__loaded_version = data.version
+        return True
+
+    def has_changed(self) -> bool:
+        """
+        Checks if the quiz changed since it was loaded.
+        """
+        return self.__data.version != self.__loaded_version
+
+    @property
+    def clients(self) -> dict[str, str]:
+        return self.__data.clients
+
+    @property
+    def players(self) -> dict[str, Player]:
+        return self.__data.players
+
+    def add_client(self, connection, client_id):
+        if connection in self.clients:
+            # A client should disconnect first before re-joining using an existing connection
+            return logger.warn(f"Failed to add Client {client_id} to Quiz {self.quiz_id}: "
+                               f"Connection {connection} already added")
+
+        self.clients[connection] = client_id
+        if self.storage.link_connections:
+            self.storage.connections[connection] = self.quiz_id
+        self._changed()
+
+        return self.clients
+
+    def remove_client(self, connection):
+        if self.clients.pop(connection, None) is None:
+            return logger.warn(f"Failed to remove Connection {connection} from Quiz {self.quiz_id}: "
+                               "Connection not found")
+
+        self.storage.connections.pop(connection, None)
+        self._changed()
+
+        return self.clients
+
+    def remove_clients(self, connections):
+        for connection in connections:
+            self.clients.pop(connection, None)
+            self.storage.connections.pop(connection, None)
+        self._changed()
+
+        return self.clients
+
+    def get_client_id(self, connection) -> Optional[str]:
+        return self.clients.get(connection)
+
+    def add_or_update_player(self, client_id: str, name: str, avatar: Optional[str] = None) -> dict[str, Player]:
+        self.players[client_id] = Player(name, avatar)
+        self._changed()
+
+        return self.players
+
+    def set_pool_question(self, question: Question):
+        self.__data.pool[question.author_id] = question
+        return True
+
+    def get_pool_questions(self) -> list[Question]:
+        return list(self.__data.pool.values())
+
+    def get_counts(self) -> QuizCounts:
+        num_host_connections = sum(1 for client_id in self.clients.values() if client_id == self.host_id)
+        return QuizCounts(len(self.players), len(self.__data.pool),
+                          num_host_connections, len(self.clients) - num_host_connections)
+
+    def get_pool_question(self, client_id) -> Optional[Question]:
+        return self.__data.pool.get(client_id)
+
+    def set_question(self, question: Question, question_id: int):
+        self.__data.questions[question_id] = question
+        return True
+
+    def get_question(self, question_id) -> Optional[Question]:
+        return self.__data.questions.get(question_id)
+
+    def get_questions(self) -> dict[str, Question]:
+        return {
+            str(question_id): question
+            for question_id, question in self.__data.questions.items()
+        }
+
+    def get_solutions(self) -> dict[str, int]:
+        return {
+            str(question_id): question.answer
+            for question_id, question in self.__data.questions.items()
+        }
+
+    def open_question(self, question: Question) -> int:
+        new_id = self.question_id + 1
+
+        self.set_question(question, new_id)
+        self.__data.tallies[new_id] = QuestionTally(
+            author_id=question.author_id,
+            choice_counts=[0] * len(question.choices)
+        )
+
+        self.__data.question_id = new_id
+        self.__data.is_question_open = True
+        self.__data.num_choices = len(question.choices)
+        self.__data.solution = question.answer
+        self._changed()
+
+        return new_id
+
+    def store_answer(self, question_id, client_id, answer: int, is_correct: bool):
+        """
+        Stores the answer, and updates the question tally and the player's score. Returns False
+        when the player already answered the question.
+        """
+        answers = self.__data.answers[question_id]
+        if client_id in answers:
+            logger.warn(f"Failed to store answer for client {client_id} for question {question_id}: "
+                        "Already answered")
+            return False
+
+        answers[client_id] = int(answer)
+
+        tally = self.__data.tallies[question_id]
+        tally.choice_counts[int(answer) - 1] += 1
+        if is_correct:
+            tally.num_correct += 1
+            self.__data.scores[client_id].answer_score += 1
+
+        return True
+
+    def store_answers(self, question_id, answers: list[Answer]) -> list[Answer]:
+        """
+        Stores a batch of answers, and returns the answers that were stored. Answers of players
+        that already answered the question are ignored.
+        """
+        return [
+            answer for answer in answers
+            if self.store_answer(question_id, answer.client_id, answer.answer, answer.is_correct)
+        ]
+
+    def get_answers(self) -> dict[str, dict[str, int]]:
+        return {
+            str(question_id): dict(answers)
+            for question_id, answers in self.__data.answers.items()
+        }
+
+    def score_question(self, question_id) -> Optional[int]:
+        """
+        (Re-)calculates the score for the question. It becomes the question score of its author,
+        unless a later question of the author was scored already.
+        """
+        if (tally := self.__data.tallies.get(question_id)) is None:
+            return None
+
+        score = Scoring.question_score(num_correct=tally.num_correct,
+                                       num_answers=tally.num_answers)
+        tally.score = score
+        if not any(other_id > question_id and other.author_id == tally.author_id
+                   and other.score is not None
+                   for other_id, other in self.__data.tallies.items()):
+            self.__data.scores[tally.author_id].question_score = score
+
+        return score
+
+    def get_question_stats(self, question_id) -> Optional[QuestionStats]:
+        if (tally := self.__data.tallies.get(question_id)) is None:
+            return None
+
+        return QuestionStats(
+            num_answers=tally.num_answers,
+            num_correct=tally.num_correct,
+            choice_counts=list(tally.choice_counts)
+        )
+
+    def get_scores(self) -> dict[str, PlayerScore]:
+        return dict(self.__data.scores)
+
+    def append_event(self, messages: dict[ClientRole, dict]) -> Optional[int]:
+        self.__data.events.append({role: dict(message) for role, message in messages.items()})
+        return self.event_seq
+
+    def get_events(self, since: int, role: ClientRole) -> Optional[list[dict]]:
+        return [
+            {**event[role], "seq": seq}
+            for seq, event in enumerate(self.__data.events[since:], start=since + 1)
+            if role in event
+        ]
+
+    def close_question(self):
+        self.__data.is_question_open = False
+        self._changed()
+
+        return True
+
+    def archive(self, archive: CompactSnapshot):
+        """
+        Writes the archive of the quiz to a file, and then removes the quiz from memory.
+        """
+        try:
+            archive.write_file(self.storage.archive_file(self.quiz_id))
+        except Exception as e:
+            return logger.warn(f"Failed to archive Quiz {self.quiz_id}: {e}")
+
+        del self.storage.quizzes[self.quiz_id]
+        for connection in self.clients:
+            self.storage.connections.pop(connection, None)
+        # Wrappers that retained the quiz see that it changed, and then find it gone
+        self._changed()
+
+        return True
@@ -0,0 +1,176 @@
+from collections import defaultdict
+from contextlib import contextmanager
+import contextvars
+from dataclasses import asdict, dataclass, field
+import json
+import logging
+import time
+from typing import Optional
+
+logger = logging.getLogger('backend.metrics')
+
+# Operations that accept the ReturnConsumedCapacity parameter
+CAPACITY_OPERATIONS = {
+    "get_item", "put_item", "update_item", "delete_item", "query", "scan",
+    "batch_get_item", "batch_write_item", "transact_get_items", "transact_write_items"
+}
+
+
+@dataclass
+class OperationStats:
+    calls: int = 0
+    errors: int = 0
+    capacity: float = 0
+    bytes: int = 0
+    latency: float = 0  # seconds
+
+    def add(self, other: "OperationStats"):
+        self.calls += other.calls
+        self.errors += other.errors
+        self.capacity += other.capacity
+        self.bytes += other.bytes
+        self.latency += other.latency
+
+    def asdict(self):
+        return {
+            **asdict(self),
+            "capacity": round(self.capacity, 2),
+            "latency": round(self.latency * 1000, 2),  # ms
+        }
+
+
+@dataclass
+class RequestStats:
+    action: Optional[str] = None
+    operations: defaultdict[str, OperationStats] = field(
+        default_factory=lambda: defaultdict(OperationStats))
+
+    def total(self) -> OperationStats:
+        total = OperationStats()
+        for stats in self.operations.values():
+            total.add(stats)
+        return total
+
+
+class Metrics:
+    """
+    Aggregates the storage operations per action (i.e. command), across requests.
+    """
+
+    def __init__(self):
+        self.requests = defaultdict(int)
+        self.operations = defaultdict(lambda: defaultdict(OperationStats))
+
+    def add_request(self, request: RequestStats):
+        action = request.action or "unknown"
+        self.requests[action] += 1
+        for operation, stats in request.operations.items():
+            self.operations[action][operation].add(stats)
+
+    def dump(self) -> dict:
+        def summarize(action, operations):
+            total = OperationStats()
+            for stats in operations.values():
+                total.add(stats)
+            num_requests = self.requests[action]
+            return {
+                "requests": num_requests,
+                "calls_per_request": round(total.calls / num_requests, 2),
+                "capacity_per_request": round(total.capacity / num_requests, 2),
+                "total": total.asdict(),
+                "operations": {op: stats.asdict() for op, stats in operations.items()},
+            }
+
+        return {
+            action: summarize(action, operations)
+            for action, operations in sorted(self.operations.items(),
+                                             key=lambda x: -sum(s.capacity for s in x[1].values()))
+        }
+
+    def reset(self):
+        self.requests.clear()
+        self.operations.clear()
+
+
+metrics = Metrics()
+
+
+_current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request", default=None)
+
+
+@contextmanager
+def request_scope():
+    """
+    Collects the storage operations executed while handling a request. On exit, these are logged
+    as a single structured log line, and added to the aggregated metrics.
+    """
+    request = RequestStats()
+    token = _current_request.set(request)
+    try:
+        yield request
+    finally:
+        _current_request.reset(token)
+        if request.operations:
+            metrics.add_request(request)
+            logger.info(json.dumps({
+                "action": request.action,
+                **request.total().asdict(),
+                "operations": {op: stats.asdict() for op, stats in request.operations.items()},
+            }))
+
+
+def set_action(action: str):
+    if (request := _current_request.get()) is not None:
+        request.action = action
+
+
+def _consumed_capacity(response) -> float:
+    consumed = response.get("ConsumedCapacity")
+    if consumed is None:
+        return 0
+    if isinstance(consumed, list):  # Batch and transaction operations
+        return sum(entry.get("CapacityUnits", 0) for entry in consumed)
+    return consumed.get("CapacityUnits", 0)
+
+
+class InstrumentedClient:
+    """
+    Wraps a boto3 DynamoDB client. For each operation it records the number of calls, consumed
+    capacity, response size and latency. These are attributed to the request being handled.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        operation = getattr(self.client, name)
+        if name not in CAPACITY_OPERATIONS:
+            return operation
+
+        def instrumented_operation(**kwargs):
+            kwargs.setdefault("ReturnConsumedCapacity", "TOTAL")
+
+            stats = OperationStats(calls=1)
+            start = time.perf_counter()
+            try:
+                response = operation(**kwargs)
+            except Exception:
+                stats.errors = 1
+                raise
+            else:
+                stats.capacity = _consumed_capacity(response)
+                headers = response.get("ResponseMetadata", {}).get("HTTPHeaders", {})
+                stats.bytes = int(headers.get("content-length", 0))
+                return response
+            finally:
+                stats.latency = time.perf_counter() - start
+                if (request := _current_request.get()) is None:
+                    # Operation outside of any request, e.g. on disconnect
+                    request = RequestStats(action="background")
+                    request.operations[name].add(stats)
+                    metrics.add_request(request)
+                else:
+                    request.operations[name].add(stats)
+
+        return instrumented_operation
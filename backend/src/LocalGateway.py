@@ -1,43 +1,239 @@
-import boto3
-import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
 import logging
-from Common import create_id
+from typing import Optional
+import websockets
+from AnswerBuffer import AnswerBuffer
+from AsyncStorage import AsyncStorage
+from BroadcastBus import BroadcastBus
+from Codecs import CODECS, JSON
+from ConnectionRegistry import ConnectionRegistry
+from Commands import COMMANDS, QuizState
+from Common import Config, ConnectionGone, Payload, create_id
 from DisconnectionHandler import DisconnectionHandler
+from EventBatcher import EventBatcher
+import Instrumentation
 from QuizMessageHandler import QuizMessageHandler
-from DynamoDbStorage import DynamoDbStorage
 
 logger = logging.getLogger('backend.gateway')
 
+STORAGE_TYPES = ["dynamodb", "memory", "sqlite"]
 
-class LocalGateway:
-    def __init__(self):
-        self.db = DynamoDbStorage(
-            client=boto3.client('dynamodb', endpoint_url="http://dynamodb:8000")
+
+def create_storage(storage_type="dynamodb", sqlite_path=Config.SQLITE_PATH, link_connections=True):
+    if storage_type == "dynamodb":
+        # Import lazily, so that boto3 is only required when it is used
+        import boto3
+        from botocore.config import Config as BotoConfig
+        from DynamoDbStorage import DynamoDbStorage
+
+        return DynamoDbStorage(
+            client=boto3.client('dynamodb', endpoint_url="http://dynamodb:8000",
+                                config=BotoConfig(max_pool_connections=Config.MAX_STORAGE_CONCURRENCY)),
+            link_connections=link_connections
         )
+    if storage_type == "memory":
+        from InMemoryStorage import InMemoryStorage
+
+        return InMemoryStorage(link_connections=link_connections)
+    if storage_type == "sqlite":
+        from SqliteStorage import SqliteStorage
+
+        return SqliteStorage(sqlite_path, link_connections=link_connections)
+
+    raise ValueError(f"Unknown storage type {storage_type}")
+
+
+def create_async_storage(storage_type="dynamodb", sqlite_path=Config.SQLITE_PATH, shared=False):
+    """
+    Creates the storage of the gateway, wrapped for asynchronous access. The gateway knows the
+    quiz of each of its connections, so these are not linked in storage.
+
+    DynamoDB calls run in a thread pool, so that a slow call does not stall all other connections.
+    The local backends are fast, so their calls run inline.
+
+    When the storage is shared by multiple worker processes, a SQLite transaction may wait for the
+    lock that another worker holds on the database. Its calls then run in a separate thread. One
+    suffices, as the storage serializes access to its connection.
+    """
+    storage = create_storage(storage_type, sqlite_path, link_connections=False)
+    if storage_type == "dynamodb":
+        return AsyncStorage(storage, ThreadPoolExecutor(max_workers=Config.MAX_STORAGE_CONCURRENCY,
+                                                        thread_name_prefix="storage"))
+    if storage_type == "sqlite" and shared:
+        return AsyncStorage(storage, ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite"))
+
+    return AsyncStorage(storage)
+
+
+class QuizActor:
+    """
+    Serializes the handling of requests for one quiz, so that these no longer interleave at every
+    await. Requests for different quizzes are still handled concurrently.
+
+    It retains the quiz that the last request loaded. The next request reuses it, unless the quiz
+    changed since, e.g. by a write of that request or of another process. The actor is dropped
+    once none of the sockets of the gateway is connected to the quiz.
+    """
+
+    def __init__(self, quiz_id):
+        self.quiz_id = quiz_id
+        self.quiz = None
+        self.lock = asyncio.Lock()
+        # Number of requests that are being handled or waiting
+        self.pending = 0
+
+
+class LocalGateway:
+    def __init__(self, storage_type="dynamodb", sqlite_path=Config.SQLITE_PATH, buffer_answers=False,
+                 bus: Optional[BroadcastBus] = None):
+        """
+        When a broadcast bus is provided, the gateway is one of multiple worker processes. Messages
+        for connections of other workers are then published on the bus.
+        """
+        if bus is not None and (storage_type == "memory" or buffer_answers):
+            # These require that a single process handles all connections of a quiz
+            raise ValueError("Memory storage and buffered answers only support a single worker")
+
+        self.db = create_async_storage(storage_type, sqlite_path, shared=bus is not None)
         self.comms = self
         self.logger = logger
+        self.logger.info(f"Using {storage_type} storage")
 
+        self.bus = bus
+        self.answer_buffer = AnswerBuffer(self.flush_answers) if buffer_answers else None
+        # A worker does not know which connections of other workers opted in to batching
+        self.event_batcher = EventBatcher(self.comms) if bus is None else None
         self.sockets = {}
+        # Socket ID => Codec, for sockets that do not use JSON
+        self.codecs = {}
+        # All messages of a socket are handled by this gateway
+        self.registry = ConnectionRegistry(complete=True)
+
+        self.actors: dict[str, QuizActor] = {}
+
+    @contextlib.asynccontextmanager
+    async def serialized(self, quiz_id: Optional[str]):
+        """
+        Runs the block in the actor of the quiz, once the requests that are queued for it have been
+        handled. Without a quiz, the block runs right away.
+        """
+        if quiz_id is None:
+            yield None
+            return
+
+        if (actor := self.actors.get(quiz_id)) is None:
+            actor = self.actors[quiz_id] = QuizActor(quiz_id)
+
+        actor.pending += 1
+        try:
+            async with actor.lock:
+                yield actor
+        finally:
+            actor.pending -= 1
+            # Forget quizzes without connections, e.g. when the last socket of the quiz left, or
+            # the quiz ID in a request was invalid
+            if actor.pending == 0 and not self.registry.is_connected(quiz_id):
+                del self.actors[quiz_id]
+
+    async def quiz_for_message(self, socket_id, msg) -> Optional[str]:
+        """
+        The quiz whose actor handles the message. It is resolved like the handler does, which also
+        validates the quiz ID.
+        """
+        command = COMMANDS.get(msg.get("action"))
+        if command is None or command.state == QuizState.NoQuiz:
+            return None
+
+        if isinstance(quiz_id := msg.get("quiz_id"), str):
+            return quiz_id
+        if command.default_quiz:
+            return await self.db.globals_access().default_quiz_id
+
+        return self.registry.get(socket_id)
+
+    async def flush_answers(self, quiz_id):
+        with Instrumentation.request_scope():
+            Instrumentation.set_action("$flush-answers")
+
+            async with self.serialized(quiz_id) as actor:
+                handler = QuizMessageHandler(self.db, self.comms, None,
+                                             answer_buffer=self.answer_buffer,
+                                             event_batcher=self.event_batcher, actor=actor,
+                                             registry=self.registry)
+                await handler.fetch_quiz(quiz_id, QuizState.Instance)
+                await handler.flush_answers()
+
+    async def start(self):
+        if self.bus is not None:
+            await self.bus.connect(self.deliver)
 
     async def send(self, socket_id, message):
+        if socket_id not in self.sockets and self.bus is not None:
+            # The connection may be handled by another worker
+            return await self.bus.publish(socket_id, message)
+
+        await self.send_local(socket_id, message)
+
+    async def deliver(self, socket_id, message):
+        """
+        Delivers a message that another worker published for a connection of this worker.
+        """
+        try:
+            await self.send_local(socket_id, message)
+        except ConnectionGone:
+            # Its disconnect is handled by this worker
+            self.logger.info(f"Dropped message for closed connection {socket_id}")
+
+    def use_codec(self, socket_id, codec_name) -> str:
+        """
+        Encodes further messages to the socket using the codec, if available. Returns the name of
+        the codec that is used.
+        """
+        if (codec := CODECS.get(codec_name, JSON)) is not JSON:
+            self.codecs[socket_id] = codec
+        return codec.name
+
+    async def send_local(self, socket_id, message):
         socket = self.sockets.get(socket_id, None)
-        if socket:
+        if socket is None:
+            raise ConnectionGone(socket_id)
+
+        if (codec := self.codecs.get(socket_id)) is not None:
+            message = (message if isinstance(message, Payload) else Payload(message)).encoded(codec)
+
+        try:
             await socket.send(message)
+        except websockets.ConnectionClosed as e:
+            raise ConnectionGone(socket_id) from e
 
     async def main(self, websocket, path):
-        socket_id = create_id()
+        socket_id = create_id() if self.bus is None else self.bus.create_connection_id()
         self.sockets[socket_id] = websocket
 
         try:
             async for message in websocket:
                 self.logger.info(f"Message received: {message}")
-                cmd_message = json.loads(message)
-                handler = QuizMessageHandler(self.db, self.comms, socket_id)
+                cmd_message = self.codecs.get(socket_id, JSON).decode(message)
 
-                await handler.handle_message(cmd_message)
+                quiz_id = await self.quiz_for_message(socket_id, cmd_message)
+                async with self.serialized(quiz_id) as actor:
+                    handler = QuizMessageHandler(self.db, self.comms, socket_id,
+                                                 answer_buffer=self.answer_buffer,
+                                                 event_batcher=self.event_batcher, actor=actor,
+                                                 registry=self.registry)
+                    await handler.handle_message(cmd_message)
         except Exception as e:
             self.logger.info(e)
             raise e
         finally:
             del self.sockets[socket_id]
-            await DisconnectionHandler(self.db, self.comms, socket_id).handle_disconnect()
+            self.codecs.pop(socket_id, None)
+            if self.event_batcher is not None:
+                self.event_batcher.disable(socket_id)
+
+            async with self.serialized(self.registry.get(socket_id)) as actor:
+                await DisconnectionHandler(self.db, self.comms, socket_id,
+                                           event_batcher=self.event_batcher, actor=actor,
+                                           registry=self.registry).handle_disconnect()
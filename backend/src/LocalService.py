@@ -1,14 +1,61 @@
+import argparse
 import asyncio
 import logging
+import multiprocessing
 import websockets
-from LocalGateway import LocalGateway
+from BroadcastBus import BroadcastBroker, BroadcastBus
+from Common import Config
+from LocalGateway import LocalGateway, STORAGE_TYPES
+
+parser = argparse.ArgumentParser(description="Runs the quiz backend as a local websocket service")
+parser.add_argument("--storage", choices=STORAGE_TYPES, default="dynamodb",
+                    help="Where to store quiz state. The memory storage needs no database, "
+                         "but state is lost on exit")
+parser.add_argument("--sqlite-path", default=Config.SQLITE_PATH,
+                    help="Database file used by the sqlite storage")
+parser.add_argument("--buffer-answers", action="store_true",
+                    help="Acknowledge answers right away, and store them in batches")
+parser.add_argument("--workers", type=int, default=1,
+                    help="Number of worker processes. These share the port, and relay messages "
+                         "for each other's connections via a broker")
+parser.add_argument("--no-compression", action="store_true",
+                    help="Disable permessage-deflate, which reduces bandwidth at the cost of CPU")
+args = parser.parse_args()
+
+if args.workers > 1 and args.storage == "memory":
+    parser.error("The memory storage only supports a single worker")
+if args.workers > 1 and args.buffer_answers:
+    parser.error("Buffered answers are only supported with a single worker")
 
 logging.setLogRecordFactory(logging.LogRecord)
 logging.getLogger('backend').setLevel(logging.INFO)
 logging.getLogger('backend').addHandler(logging.StreamHandler())
 
-gateway = LocalGateway()
-start_server = websockets.serve(gateway.main, "", 8765)
 
-asyncio.get_event_loop().run_until_complete(start_server)
-asyncio.get_event_loop().run_forever()
+async def serve(worker_id=None):
+    bus = BroadcastBus(worker_id) if worker_id is not None else None
+    gateway = LocalGateway(storage_type=args.storage, sqlite_path=args.sqlite_path,
+                           buffer_answers=args.buffer_answers, bus=bus)
+    await gateway.start()
+
+    # With multiple workers, the kernel distributes new connections over them
+    async with websockets.serve(gateway.main, "", 8765, reuse_port=bus is not None,
+                                compression=None if args.no_compression else "deflate"):
+        await asyncio.Future()
+
+
+def run_worker(worker_id):
+    asyncio.run(serve(worker_id))
+
+
+if args.workers == 1:
+    asyncio.run(serve())
+else:
+    broker_socket = BroadcastBroker.listen()
+
+    # Fork, so that the workers need not re-execute this script
+    context = multiprocessing.get_context("fork")
+    for worker_id in range(args.workers):
+        context.Process(target=run_worker, args=(worker_id, ), daemon=True).start()
+
+    asyncio.run(BroadcastBroker().serve(broker_socket))
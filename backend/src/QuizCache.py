@@ -0,0 +1,108 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import logging
+import threading
+from typing import Optional
+from Common import Config, Question
+from CompactSnapshot import CompactSnapshot
+
+logger = logging.getLogger('backend.cache')
+
+
+@dataclass
+class QuizSnapshot:
+    """
+    Contents of a quiz partition at a given roster version of its Instance item.
+
+    The items are grouped in collections by SKEY prefix (e.g. "Conn#"). Collections are added
+    when first loaded, so a snapshot may only contain some of them.
+
+    Questions are cached as well. These are never modified once the quiz has advanced to them, so
+    they remain valid when the snapshot itself becomes outdated. The same holds for the compact
+    snapshot, which is only used for the state that is final.
+    """
+    version: Optional[int]
+    collections: dict[str, list[dict]] = field(default_factory=dict)
+    questions: dict[int, Question] = field(default_factory=dict)
+    compact: Optional[CompactSnapshot] = None
+
+
+class QuizCache:
+    """
+    In-process cache of quiz snapshots. It outlives individual requests, e.g. it is retained
+    across invocations of a warm Lambda container.
+
+    Every change to the roster of a quiz increments the RosterVersion attribute of its Instance
+    item. A snapshot is only returned when its version matches the version that the caller just
+    read, so stale snapshots are never used. Changes to the question state do not affect it.
+    """
+
+    def __init__(self, max_size=Config.MAX_CACHED_QUIZZES):
+        self.max_size = max_size
+        self.__snapshots: OrderedDict[str, QuizSnapshot] = OrderedDict()
+        # Storage calls may run concurrently in a thread pool
+        self.__lock = threading.Lock()
+
+    def get(self, quiz_id, version) -> Optional[QuizSnapshot]:
+        with self.__lock:
+            if (snapshot := self.__snapshots.get(quiz_id)) is None:
+                return None
+
+            self.__snapshots.move_to_end(quiz_id)
+
+        if snapshot.version != version:
+            logger.info(f"Snapshot of Quiz {quiz_id} is outdated ({snapshot.version} != {version})")
+            return None
+
+        return snapshot
+
+    def put(self, quiz_id, version, collections=None) -> QuizSnapshot:
+        snapshot = QuizSnapshot(version, collections or {})
+        with self.__lock:
+            if (old_snapshot := self.__snapshots.get(quiz_id)) is not None:
+                snapshot.questions = old_snapshot.questions
+                snapshot.compact = old_snapshot.compact
+
+            self.__snapshots[quiz_id] = snapshot
+            self.__snapshots.move_to_end(quiz_id)
+            while len(self.__snapshots) > self.max_size:
+                self.__snapshots.popitem(last=False)
+
+        return snapshot
+
+    def __contains__(self, quiz_id) -> bool:
+        return quiz_id in self.__snapshots
+
+    def invalidate(self, quiz_id):
+        if (snapshot := self.__snapshots.get(quiz_id)) is not None:
+            snapshot.version = None
+
+    def remove(self, quiz_id):
+        """
+        Drops all cached data of the quiz, including its questions and compact snapshot. Used when
+        the quiz is archived.
+        """
+        with self.__lock:
+            self.__snapshots.pop(quiz_id, None)
+
+    def get_question(self, quiz_id, question_id) -> Optional[Question]:
+        if (snapshot := self.__snapshots.get(quiz_id)) is not None:
+            return snapshot.questions.get(question_id)
+
+    def put_question(self, quiz_id, question_id, question: Question):
+        if (snapshot := self.__snapshots.get(quiz_id)) is not None:
+            snapshot.questions[question_id] = question
+
+    def get_compact(self, quiz_id) -> Optional[CompactSnapshot]:
+        if (snapshot := self.__snapshots.get(quiz_id)) is not None:
+            return snapshot.compact
+
+    def put_compact(self, quiz_id, compact: CompactSnapshot):
+        if (snapshot := self.__snapshots.get(quiz_id)) is not None:
+            # Never replace a snapshot by an older one
+            with self.__lock:
+                if snapshot.compact is None or ((snapshot.compact.question_id, snapshot.compact.seq)
+                                                <= (compact.question_id, compact.seq)):
+                    snapshot.compact = compact
+            # Its questions are final, so can be cached as well
+            snapshot.questions.update(compact.questions)
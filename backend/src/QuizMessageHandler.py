@@ -1,72 +1,32 @@
 import asyncio
 import collections
-import json
 import random
 from typing import Optional
 from BaseMessageHandler import (BaseMessageHandler, ErrorCode, HandlerException,
                                 error_message, ok_message)
-from Common import Config, ClientRole, Question, create_id
-
-
-def check_int_value(name: str, value: int | str, value_range: tuple[int, int]):
-    try:
-        value = int(value)
-    except ValueError:
-        raise HandlerException(
-            f"{name} is not an integer)", ErrorCode.InvalidValue)
-
-    if value < value_range[0]:
-        raise HandlerException(
-            f"{name} is too small ({value} < {value_range[0]})",
-            ErrorCode.InvalidValue)
-    if value > value_range[1]:
-        raise HandlerException(
-            f"{name} is too big ({value} > {value_range[1]})",
-            ErrorCode.InvalidValue)
-
-
-def check_string_value(name: str, value: str, len_range: tuple[int, int]):
-    if value != value.strip():
-        raise HandlerException(
-            f"{name} contains leading or trailing whitespace",
-            ErrorCode.InvalidValue
-        )
-
-    if len(value) < len_range[0]:
-        raise HandlerException(
-            f"{name} is too short ({len(value)} < {len_range[0]})",
-            ErrorCode.InvalidValue
-        )
-    if len(value) > len_range[1]:
-        raise HandlerException(
-            f"{name} is too long ({len(value)} > {len_range[1]})",
-            ErrorCode.InvalidValue
-        )
-
-
-class MessageWrapper:
-    """
-    Wrapper to generate exception when a required field is missing
-    """
+from Codecs import JSON
+from Commands import COMMANDS, QUIZ_ID_FIELD, QuizState, check_int_value
+from CompactSnapshot import CompactSnapshot
+import Instrumentation
+from Common import (Answer, Config, ClientRole, ConnectionGone, DeliveryStatus, Payload, Question,
+                    create_id)
+import Scoring
 
-    def __init__(self, msg):
-        self.msg = msg
 
-    def __getitem__(self, key):
-        if (value := self.msg.get(key)) is None:
-            raise HandlerException(f"Field '{key}' is missing", ErrorCode.MissingField)
-        return value
-
-    def get(self, key):
-        return self.msg.get(key)
+def delivery_status(result: Optional[Exception]) -> DeliveryStatus:
+    if result is None:
+        return DeliveryStatus.Delivered
+    if isinstance(result, ConnectionGone):
+        return DeliveryStatus.Gone
+    if isinstance(result, asyncio.TimeoutError):
+        return DeliveryStatus.TimedOut
+    return DeliveryStatus.Failed
 
 
 def create_question(author_id, question, choices, answer):
-    check_string_value("question", question, Config.RANGE_QUESTION_LENGTH)
-    check_int_value("number of choices", len(choices),
-                    Config.RANGE_CHOICES_PER_QUESTION)
-    for i, choice in enumerate(choices):
-        check_string_value(f"answer {i + 1}", choice, Config.RANGE_CHOICE_LENGTH)
+    """
+    Creates the question from fields that passed the schema checks of the command.
+    """
     check_int_value("answer", answer, (1, len(choices)))
 
     return Question(author_id, question, choices, answer)
@@ -74,116 +34,253 @@ def create_question(author_id, question, choices, answer):
 
 class QuizMessageHandler(BaseMessageHandler):
 
-    def is_root(self, client_id):
-        return (root_user := self.globals.root_user) is None or client_id == root_user
-
-    def check_is_root(self, client_id):
-        if not self.is_root(client_id):
+    def __init__(self, db, comms, connection, answer_buffer=None, event_batcher=None, actor=None,
+                 registry=None):
+        """
+        When an answer buffer is provided, answers are stored in batches by flush_answers. When an
+        event batcher is provided, host notifications to connections that opted in are coalesced.
+        When a quiz actor is provided, the handler runs while the actor holds its lock, and reuses
+        the quiz that the actor retained when it is still up to date. The connection registry
+        remembers the quiz that connections are connected to.
+        """
+        super().__init__(db, comms, connection, registry)
+        self.answer_buffer = answer_buffer
+        self.event_batcher = event_batcher
+        self.actor = actor
+        self.quiz = None
+
+    async def send_message(self, message, connection=None):
+        if self.event_batcher is not None and self.quiz is not None:
+            await self.event_batcher.flush_before(self.quiz.quiz_id,
+                                                  [connection or self.connection])
+        return await super().send_message(message, connection)
+
+    async def is_root(self, client_id):
+        return (root_user := await self.globals.root_user) is None or client_id == root_user
+
+    async def check_is_root(self, client_id):
+        if not await self.is_root(client_id):
             raise HandlerException("Root access required", ErrorCode.NotAllowed)
 
-    async def set_root_user(self, user, old_user=None):
-        self.check_is_root(old_user)
+    async def set_root_user(self, value, old_value=None):
+        await self.check_is_root(old_value)
 
-        if not self.globals.set_root_user(user):
+        if not await self.globals.set_root_user(value):
             raise HandlerException(
                 "Failed to update root user", ErrorCode.InternalServerError)
 
         return await self.send_message(ok_message())
 
     async def set_default_quiz(self, quiz_id, client_id):
-        self.check_is_root(client_id)
+        await self.check_is_root(client_id)
 
-        if not self.globals.set_default_quiz_id(quiz_id):
+        if not await self.globals.set_default_quiz_id(quiz_id):
             raise HandlerException(
                 "Failed to update default quiz", ErrorCode.InternalServerError)
 
         return await self.send_message(ok_message())
 
-    def fetch_quiz(self, quiz_id):
-        self.quiz = self.db.quiz_access(quiz_id)
+    async def fetch_quiz(self, quiz_id, state=QuizState.Full):
+        self._recipients = None
+
+        if self.actor is not None and self.actor.quiz_id == quiz_id:
+            if (quiz := self.actor.quiz) is not None and not await quiz.has_changed():
+                self.quiz = quiz
+                return
 
-        if not self.quiz.exists():
+        self.quiz = self.db.quiz_access(quiz_id)
+        if not await self.quiz.exists(roster=state == QuizState.Full):
             raise HandlerException(
                 f"Quiz {quiz_id} not found", ErrorCode.QuizNotFound)
 
+        if self.actor is not None and self.actor.quiz_id == quiz_id:
+            self.actor.quiz = self.quiz
+
     @property
     def globals(self):
         if not self._globals:
             self._globals = self.db.globals_access()
         return self._globals
 
-    def get_role(self, client_id) -> Optional[ClientRole]:
+    async def get_role(self, client_id) -> Optional[ClientRole]:
         if self.quiz.host_id == client_id:
             return ClientRole.Host
-        if client_id in self.quiz.players:
+        if client_id in await self.quiz.players:
             return ClientRole.Player
         return None
 
-    def check_role(self, required_role: ClientRole):
-        client_id = self.quiz.get_client_id(self.connection)
+    def get_connected_role(self, client_id) -> ClientRole:
+        """
+        Role of a client with a connection to the quiz. Only hosts and players can connect, and
+        players cannot be removed, so this does not require loading the players.
+        """
+        return ClientRole.Host if self.quiz.host_id == client_id else ClientRole.Player
+
+    async def check_role(self, required_role: ClientRole):
+        client_id = await self.quiz.get_client_id(self.connection)
         if client_id is None:
             raise HandlerException(
                 "Must join quiz first", ErrorCode.NotAllowed)
 
-        if self.get_role(client_id) != required_role:
+        if self.get_connected_role(client_id) != required_role:
             raise HandlerException(f"{client_id} does not have required role",
                                    ErrorCode.NotAllowed)
 
         return client_id
 
-    async def broadcast(self, message, skip_roles=[]):
-        tasks = [asyncio.create_task(self.comms.send(ws, message))
-                 for ws, client_id in self.quiz.clients.items()
-                 if self.get_role(client_id) not in skip_roles]
-        if tasks:
-            self.logger.info(
-                "broadcasting %s to %d clients", message, len(tasks))
-            await asyncio.wait(tasks)
+    async def recipients(self, role: ClientRole) -> list[str]:
+        """
+        Connections of clients with the given role. These are determined once per request, in a
+        single pass over the quiz's connections.
+        """
+        if self._recipients is None:
+            hosts, players = [], []
+            host_id = self.quiz.host_id
+            for ws, client_id in (await self.quiz.clients).items():
+                (hosts if client_id == host_id else players).append(ws)
+            self._recipients = {ClientRole.Host: hosts, ClientRole.Player: players}
+
+        return self._recipients[role]
+
+    async def log_event(self, messages: dict[ClientRole, dict]):
+        """
+        Appends the messages, which clients of each role receive for an event, to the quiz's
+        event log. Adds the sequence number of the event to the messages, so that clients can
+        later resync from there.
+        """
+        if (seq := await self.quiz.append_event(messages)) is None:
+            # Not fatal. Clients that resync will miss the event, but can still do a full reload
+            return self.logger.error(f"Failed to log event {messages}")
+
+        for message in messages.values():
+            message["seq"] = seq
+
+    async def broadcast(self, message: dict, skip_roles=[],
+                        skip_connections=[]) -> dict[str, DeliveryStatus]:
+        """
+        Logs the message as an event, and sends it concurrently to all connected clients, except
+        those with a skipped role and the skipped connections.
+        """
+        await self.log_event({role: message for role in ClientRole if role not in skip_roles})
+        payload = Payload.from_message(message)
+        return await self.multicast(
+            {role: payload for role in ClientRole if role not in skip_roles}, skip_connections)
+
+    async def multicast(self, payloads: dict[ClientRole, Payload],
+                        skip_connections=[]) -> dict[str, DeliveryStatus]:
+        """
+        Sends each payload concurrently to the connections of clients with the corresponding role.
+
+        Returns the delivery status for each recipient connection. Connections that turn out to
+        be gone are removed from the quiz once all sends completed.
+        """
+        connections, sends = [], []
+        for role, payload in payloads.items():
+            recipients = await self.recipients(role)
+            if skip_connections:
+                recipients = [ws for ws in recipients if ws not in skip_connections]
+            connections.extend(recipients)
+            sends.extend(self.comms.send(ws, payload) for ws in recipients)
+        if not connections:
+            return {}
+        if self.event_batcher is not None:
+            await self.event_batcher.flush_before(self.quiz.quiz_id, connections)
+
+        self.logger.info("broadcasting %s to %d clients", list(payloads.values()), len(connections))
+        results = await asyncio.gather(*sends, return_exceptions=True)
+
+        statuses = dict.fromkeys(connections, DeliveryStatus.Delivered)
+        for ws, result in zip(connections, results):
+            if result is not None:
+                status = delivery_status(result)
+                self.logger.warn("Failed to send to %s (%s): %s", ws, status.name, result)
+                statuses[ws] = status
+
+        if (gone := [ws for ws, status in statuses.items() if status == DeliveryStatus.Gone]):
+            await self.reap_connections(gone)
+
+        return statuses
+
+    async def reap_connections(self, connections):
+        """
+        Removes connections that disappeared without a (successfully handled) disconnect.
+        """
+        clients = await self.quiz.clients
+        client_ids = {ws: clients.get(ws) for ws in connections}
+
+        if await self.quiz.remove_clients(connections) is None:
+            return self.logger.error(
+                f"Failed to remove stale connections {connections} from Quiz {self.quiz.quiz_id}")
+        for connection in connections:
+            self.registry.remove(connection)
+        for recipients in self._recipients.values():
+            recipients[:] = [ws for ws in recipients if ws not in client_ids]
+
+        self.logger.info(f"Removed stale connections {connections} from Quiz {self.quiz.quiz_id}")
+        for ws, client_id in client_ids.items():
+            await self.notify_host("client-disconnected", {
+                "client_id": client_id,
+                "connection": ws,
+            })
 
     async def send_status_message(self, client_id=None):
         if client_id is None:
-            client_id = self.quiz.get_client_id(self.connection)
+            client_id = await self.quiz.get_client_id(self.connection)
         if client_id is None:
             raise HandlerException("Client ID missing", ErrorCode.MissingField)
 
-        if self.get_role(client_id) != ClientRole.Host:
-            self.check_is_root(client_id)
+        if client_id != self.quiz.host_id:
+            await self.check_is_root(client_id)
 
-        await self.send_message(json.dumps({
+        if (counts := await self.quiz.get_counts()) is None:
+            raise HandlerException("Failed to get status", ErrorCode.InternalServerError)
+
+        await self.send_message(Payload.from_message({
             "type": "status",
             "quiz_id": self.quiz.quiz_id,
             "host_id": self.quiz.host_id,
-            "num_host_connections": sum(1 for client_id in self.quiz.clients.values()
-                                        if client_id == self.quiz.host_id),
-            "num_players": len(self.quiz.players),
-            "num_players_present": sum(1 for client_id in self.quiz.clients.values()
-                                       if client_id in self.quiz.players),
-            "num_pool_questions": len(self.quiz.get_pool_questions()),
+            "num_host_connections": counts.num_host_connections,
+            "num_players": counts.num_players,
+            "num_players_present": counts.num_player_connections,
+            "num_pool_questions": counts.num_pool_questions,
             "question_id": self.quiz.question_id,
             "is_question_open": self.quiz.is_question_open,
         }))
 
     async def notify_host(self, message_type, fields):
-        # Use broadcast as host may have multiple connection open
-        await self.broadcast(json.dumps({
+        message = {
             "type": message_type,
             **fields
-        }), skip_roles=[ClientRole.Player])
+        }
+        await self.log_event({ClientRole.Host: message})
+        await self.send_to_hosts(message)
 
     async def notify_hosts(self, message):
-        await self.broadcast(json.dumps(message), skip_roles=[ClientRole.Player])
+        """
+        Relays a message from a client (e.g. a view change) to the hosts. Relayed messages are not
+        logged as events, as clients that resync do not need to replay these.
+        """
+        await self.send_to_hosts(message)
 
-    async def create_quiz(self, quiz_name, host_id=None, try_make_default=False):
-        check_string_value("name", quiz_name, Config.RANGE_NAME_LENGTH)
+    async def send_to_hosts(self, message):
+        batched = []
+        if self.event_batcher is not None:
+            batched = [ws for ws in await self.recipients(ClientRole.Host)
+                       if self.event_batcher.is_enabled(ws)]
+            if batched:
+                self.event_batcher.add(self.quiz.quiz_id, message, batched)
 
+        # Use multicast as host may have multiple connection open
+        await self.multicast({ClientRole.Host: Payload.from_message(message)},
+                             skip_connections=batched)
+
+    async def create_quiz(self, quiz_name, host_id=None, try_make_default=False):
         if host_id is None:
             host_id = create_id()
-        else:
-            check_string_value("host_id", host_id, Config.RANGE_ID_LENGTH)
 
         for _ in range(Config.MAX_ATTEMPTS):  # Multiple attempts to handle ID clash
             quiz_id = create_id()
-            if self.db.create_quiz(quiz_id, host_id, quiz_name):
+            if await self.db.create_quiz(quiz_id, host_id, quiz_name):
                 break
         else:
             raise HandlerException(
@@ -192,8 +289,8 @@ class QuizMessageHandler(BaseMessageHandler):
         self.logger.info(f"Created Quiz {quiz_id} with Host {host_id}")
 
         is_default = (try_make_default
-                      and self.is_root(host_id)
-                      and self.globals.set_default_quiz_id(quiz_id))
+                      and await self.is_root(host_id)
+                      and await self.globals.set_default_quiz_id(quiz_id))
 
         return await self.send_message(ok_message({
             "quiz_id": quiz_id,
@@ -201,30 +298,41 @@ class QuizMessageHandler(BaseMessageHandler):
             "is_default": is_default,
         }))
 
-    async def connect(self, client_id):
+    async def connect(self, client_id, batch_events=False, codec=None):
         """
         Connect to quiz (as host, player or observer)
+
+        With batch_events, the client receives its notifications in "events" messages, if the
+        gateway supports this. With codec, the client requests the encoding of the messages it
+        receives, starting with the response. The response tells which codec is used. It is JSON
+        when the gateway does not support the requested codec.
         """
-        if self.get_role(client_id) is None:
+        if await self.get_role(client_id) is None:
             raise HandlerException(
                 "Only host and players can connect to quiz",
                 ErrorCode.NotAllowed
             )
 
-        if not self.db.set_quiz_for_connection(self.connection, self.quiz.quiz_id):
-            raise HandlerException(
-                f"Failed to link connection to Quiz {self.quiz.quiz_id}",
-                ErrorCode.InternalServerError
-            )
-
-        if not self.quiz.add_client(self.connection, client_id):
+        # This also links the connection to the quiz
+        if not await self.quiz.add_client(self.connection, client_id):
             raise HandlerException(
                 f"Failed to add client {client_id} to Quiz {self.quiz.quiz_id}",
                 ErrorCode.InternalServerError
             )
+        self.registry.set(self.connection, self.quiz.quiz_id)
+
+        batch_events = batch_events and self.event_batcher is not None
+        if batch_events:
+            self.event_batcher.enable(self.connection)
+
+        codec = JSON.name if codec is None else self.comms.use_codec(self.connection, codec)
 
         await self.send_message(ok_message({
-            "quiz_name": self.quiz.name
+            "quiz_name": self.quiz.name,
+            "batch_events": batch_events,
+            "codec": codec,
+            # The client can use this to resync after a reconnect
+            "seq": self.quiz.event_seq,
         }))
 
         await self.notify_host("client-connected", {
@@ -237,7 +345,7 @@ class QuizMessageHandler(BaseMessageHandler):
         # case, CAS ensures that (at least) one update succeeded so removal should eventually
         # succeed. Note, in contrast to join_game, cannot make client responsible for retrying, as
         # it will typically have disconnected.
-        client_id = self.quiz.clients[self.connection]
+        client_id = (await self.quiz.clients)[self.connection]
         if client_id is None:
             raise HandlerException(
                 f"Client {client_id} not connected to Quiz {self.quiz.quiz_id}",
@@ -245,43 +353,34 @@ class QuizMessageHandler(BaseMessageHandler):
             )
 
         for attempt in range(1, 1 + Config.MAX_ATTEMPTS):
-            if self.quiz.remove_client(self.connection) is not None:
+            if await self.quiz.remove_client(self.connection) is not None:
                 break
             await asyncio.sleep(random.random() * attempt)
         else:
             return self.logger.error(
                 f"Failed to remove {client_id} from Quiz {self.quiz.quiz_id}")
 
-        self.db.clear_quiz_for_connection(self.connection)
+        self.registry.remove(self.connection)
 
         await self.notify_host("client-disconnected", {
             "client_id": client_id,
             "connection": self.connection,
         })
 
-    async def register(self, player_name, client_id=None, avatar=None, quiz_id=None):
+    async def register(self, player_name, client_id=None, avatar=None):
         """ Register for a quiz (as a player) """
-        check_string_value("name", player_name, Config.RANGE_NAME_LENGTH)
-
-        if quiz_id is None and (quiz_id := self.globals.default_quiz_id) is None:
-            raise HandlerException(
-                "Failed to get default quiz",
-                ErrorCode.InternalServerError)
-
-        self.fetch_quiz(quiz_id)
+        quiz_id = self.quiz.quiz_id
         if client_id is None:
             client_id = create_id()
-        else:
-            check_string_value("client_id", client_id, Config.RANGE_ID_LENGTH)
 
-        if client_id in self.quiz.players:
+        if client_id in await self.quiz.players:
             self.logger.info(f"Update registration of client {client_id} for Quiz {quiz_id}")
-        elif len(self.quiz.players) >= Config.MAX_PLAYERS_PER_QUIZ:
+        elif len(await self.quiz.players) >= Config.MAX_PLAYERS_PER_QUIZ:
             raise HandlerException(
                 f"Player limit reached for Quiz {quiz_id}",
                 ErrorCode.PlayerLimitReached)
 
-        if not self.quiz.add_or_update_player(client_id, player_name, avatar):
+        if not await self.quiz.add_or_update_player(client_id, player_name, avatar):
             raise HandlerException(
                 f"Failed to add player {player_name} as {client_id}",
                 ErrorCode.InternalServerError)
@@ -299,20 +398,19 @@ class QuizMessageHandler(BaseMessageHandler):
         })
 
     async def get_clients(self):
-        self.check_role(ClientRole.Host)
-
         client_connections = collections.defaultdict(list)
-        for conn, client_id in self.quiz.clients.items():
+        for conn, client_id in (await self.quiz.clients).items():
             client_connections[client_id].append(conn)
+        players = await self.quiz.players
 
-        return await self.send_message(json.dumps({
+        return await self.send_message(Payload.from_message({
             "type": "clients",
             "players": {
                 id: {
                     **player.asdict(),
                     "connections": client_connections[id]
                 }
-                for id, player in self.quiz.players.items()
+                for id, player in players.items()
             },
             "host_connections": client_connections[self.quiz.host_id],
         }))
@@ -328,10 +426,9 @@ class QuizMessageHandler(BaseMessageHandler):
         in which to ask the questions, may filter out duplicates, and may ask questions from
         another source. Players may modify questions while the quiz is ongoing.
         """
-        client_id = self.check_role(ClientRole.Player)
-        question_obj = create_question(client_id, question, choices, answer)
+        question_obj = create_question(self.client_id, question, choices, answer)
 
-        if not self.quiz.set_pool_question(question_obj):
+        if not await self.quiz.set_pool_question(question_obj):
             raise HandlerException(
                 "Failed to set question", ErrorCode.InternalServerError)
 
@@ -342,9 +439,7 @@ class QuizMessageHandler(BaseMessageHandler):
         })
 
     async def get_pool_question(self):
-        client_id = self.check_role(ClientRole.Player)
-
-        if (question := self.quiz.get_pool_question(client_id)) is None:
+        if (question := await self.quiz.get_pool_question(self.client_id)) is None:
             raise HandlerException("No question found", ErrorCode.EmptyResult)
 
         await self.send_message(ok_message({
@@ -352,12 +447,10 @@ class QuizMessageHandler(BaseMessageHandler):
         }))
 
     async def get_pool_questions(self):
-        self.check_role(ClientRole.Host)
-
-        return await self.send_message(json.dumps({
+        return await self.send_message(Payload.from_message({
             "type": "pool-questions",
             "questions": {
-                q.author_id: q.asdict(strip_answer=False) for q in self.quiz.get_pool_questions()
+                q.author_id: q.asdict(strip_answer=False) for q in await self.quiz.get_pool_questions()
             }
         }))
 
@@ -365,31 +458,29 @@ class QuizMessageHandler(BaseMessageHandler):
         """
         Sets a new (active) questions and accepts answers for it.
         """
-        self.check_role(ClientRole.Host)
-
         question = create_question(author_id, question, choices, answer)
-        if not (question_id := self.quiz.open_question(question)):
+        if not (question_id := await self.quiz.open_question(question)):
             raise HandlerException(
                 "Failed to open question", ErrorCode.InternalServerError)
 
-        def make_message(strip_answer):
-            return json.dumps({
+        messages = {
+            role: {
                 "type": "question-opened",
                 "question_id": question_id,
-                "question": question.asdict(strip_answer=strip_answer),
-            })
+                "question": question.asdict(strip_answer=role == ClientRole.Player),
+            }
+            for role in ClientRole
+        }
+        await self.log_event(messages)
 
-        await self.broadcast(make_message(strip_answer=False),
-                             skip_roles=[ClientRole.Player])
-        await self.broadcast(make_message(strip_answer=True),
-                             skip_roles=[ClientRole.Host])
+        await self.multicast({
+            role: Payload.from_message(message) for role, message in messages.items()
+        })
 
     async def answer(self, question_id, answer):
         """
         Give an answer to the currently open question
         """
-        client_id = self.check_role(ClientRole.Player)
-
         if question_id != self.quiz.question_id:
             raise HandlerException(
                 f"Answer does not match current question: {question_id} != {self.quiz.question_id}",
@@ -399,154 +490,264 @@ class QuizMessageHandler(BaseMessageHandler):
                 "Cannot answer question anymore", ErrorCode.NotAllowed)
 
         check_int_value("answer", answer, (1, self.quiz.num_choices))
+        is_correct = answer == self.quiz.solution
+
+        if self.answer_buffer is not None:
+            if not self.answer_buffer.add(self.quiz.quiz_id, question_id,
+                                          Answer(self.client_id, answer, is_correct)):
+                raise HandlerException(
+                    "Can only answer question once", ErrorCode.AlreadyAnswered)
 
-        if not self.quiz.store_answer(question_id, client_id, answer):
+            # The host is notified when the answer is flushed
+            return await self.send_message(ok_message())
+
+        if (stored := await self.quiz.store_answer(question_id, self.client_id, answer,
+                                                   is_correct)) is None:
+            raise HandlerException("Failed to store answer", ErrorCode.InternalServerError)
+        if not stored:
             raise HandlerException(
                 "Can only answer question once", ErrorCode.AlreadyAnswered)
 
         # Notify host that (another) answer has been received.
-        # Note: not including total number of answers received for current question, as this is
-        # relatively expensive to obtain (and host can keep local count).
-        await self.broadcast(json.dumps({
-            "type": "answer-received",
+        # Note: not including total number of answers received for current question. Hosts can
+        # keep a local count, or request it using get-question-stats.
+        await self.notify_host("answer-received", {
             "question_id": question_id,
-            "player_id": client_id,
+            "player_id": self.client_id,
             "answer": answer,
-        }), skip_roles=[ClientRole.Player])
+        })
 
         await self.send_message(ok_message())
 
+    async def flush_answers(self):
+        """
+        Stores the answers buffered for the quiz, and notifies the host with a single message per
+        question.
+        """
+        if self.answer_buffer is None:
+            return
+
+        for question_id, answers in self.answer_buffer.take(self.quiz.quiz_id).items():
+            # Storage may store only part of the batch when it fails midway
+            stored = await self.quiz.store_answers(question_id, answers) or []
+            if len(stored) < len(answers):
+                # The answers were acknowledged already, so there is no client to report this to
+                self.logger.error(
+                    f"Lost {len(answers) - len(stored)} answers for question {question_id}")
+            if not stored:
+                continue
+
+            await self.notify_host("answers-received", {
+                "question_id": question_id,
+                "answers": {answer.client_id: answer.answer for answer in stored},
+            })
+
     async def close_question(self):
         """
         Marks the active question closed so that no answers are accepted anymore.
         """
-        self.check_role(ClientRole.Host)
-
-        if not self.quiz.close_question():
+        if not await self.quiz.close_question():
             raise HandlerException(
                 "Failed to open question", ErrorCode.InternalServerError)
 
-        await self.broadcast(json.dumps({
+        # Flush after closing, so that no answers can be added to the buffer anymore
+        await self.flush_answers()
+
+        # Not fatal. The question is scored again when it is closed again.
+        if await self.quiz.score_question(self.quiz.question_id) is None:
+            self.logger.warn(f"Failed to score question {self.quiz.question_id}")
+
+        await self.broadcast({
             "type": "question-closed",
             "question_id": self.quiz.question_id
-        }))
+        })
 
     async def get_question(self):
-        self.check_role(ClientRole.Player)
-
         if self.quiz.is_question_open:
             # Enable client that (re-)joined an in-progress quiz answer current
             # question.
             #
             # Note: not checking if player already answered. That will be done
             # if/when player answers.
-            if (question := self.quiz.get_question(self.quiz.question_id)) is None:
+            if (question := await self.quiz.get_question(self.quiz.question_id)) is None:
                 raise HandlerException("Question not found", ErrorCode.InternalServerError)
 
-            await self.send_message(json.dumps({
+            await self.send_message(Payload.from_message({
                 "type": "question-opened",
                 "question_id": self.quiz.question_id,
                 "question": question.asdict(strip_answer=True),
             }))
         else:
-            await self.send_message(json.dumps({
+            await self.send_message(Payload.from_message({
                 "type": "question-closed",
                 "question_id": self.quiz.question_id
             }))
 
+    async def sync_since(self, seq):
+        """
+        Sends the events after the given sequence number, as received by the client's role. This
+        enables a client that reconnects to catch up without reloading the entire quiz.
+        """
+        if (client_id := await self.quiz.get_client_id(self.connection)) is None:
+            raise HandlerException(
+                "Must join quiz first", ErrorCode.NotAllowed)
+
+        if (events := await self.quiz.get_events(seq, self.get_connected_role(client_id))) is None:
+            raise HandlerException("Failed to get events", ErrorCode.InternalServerError)
+
+        await self.send_message(Payload.from_message({
+            "type": "sync",
+            # Also covers the events that are not visible to the client
+            "seq": max(seq, self.quiz.event_seq, *(event["seq"] for event in events)),
+            "events": events,
+        }))
+
     async def get_questions(self):
-        self.check_role(ClientRole.Host)
+        questions = await self.quiz.get_questions()
 
-        return await self.send_message(json.dumps({
+        return await self.send_message(Payload.from_message({
             "type": "questions",
-            "questions": {id: q.asdict(strip_answer=False) for id, q in self.quiz.get_questions().items()},
+            "questions": {id: q.asdict(strip_answer=False) for id, q in questions.items()},
             "question_id": self.quiz.question_id,
             "is_question_open": self.quiz.is_question_open,
         }))
 
     async def get_answers(self):
-        self.check_role(ClientRole.Host)
+        await self.flush_answers()
 
-        return await self.send_message(json.dumps({
+        return await self.send_message(Payload.from_message({
             "type": "answers",
-            "answers": self.quiz.get_answers(),
+            "answers": await self.quiz.get_answers(),
+        }))
+
+    async def get_question_stats(self, question_id=None):
+        await self.flush_answers()
+
+        if question_id is None:
+            question_id = self.quiz.question_id
+        else:
+            check_int_value("question_id", question_id, (1, self.quiz.question_id))
+
+        if (stats := await self.quiz.get_question_stats(question_id)) is None:
+            raise HandlerException("No stats found", ErrorCode.EmptyResult)
+
+        return await self.send_message(Payload.from_message({
+            "type": "question-stats",
+            "question_id": question_id,
+            **stats.asdict(),
+        }))
+
+    async def get_leaderboard(self, limit=None):
+        await self.flush_answers()
+
+        if (scores := await self.quiz.get_scores()) is None:
+            raise HandlerException("Failed to get scores", ErrorCode.InternalServerError)
+
+        return await self.send_message(Payload.from_message({
+            "type": "leaderboard",
+            "scores": Scoring.leaderboard(await self.quiz.players, scores, limit),
+        }))
+
+    async def archive_quiz(self):
+        """
+        Compacts the finished quiz into an archive, and removes its live data. Its results can
+        then still be retrieved (read-only) using get-results, until the archive expires.
+
+        The other connections are told that the quiz was archived, as they can no longer use it.
+        """
+        if self.quiz.is_question_open:
+            raise HandlerException(
+                "Cannot archive quiz while a question is open", ErrorCode.NotAllowed)
+
+        await self.flush_answers()
+
+        questions = await self.quiz.get_questions()
+        answers = await self.quiz.get_answers()
+        scores = await self.quiz.get_scores()
+        if questions is None or answers is None or scores is None:
+            raise HandlerException("Failed to get results", ErrorCode.InternalServerError)
+
+        connections = list(await self.quiz.clients)
+        archive = CompactSnapshot(
+            version=self.quiz.version,
+            question_id=self.quiz.question_id,
+            event_seq=self.quiz.event_seq,
+            players=dict(await self.quiz.players),
+            questions={int(id): question for id, question in questions.items()},
+            answers={int(id): dict(answers) for id, answers in answers.items()},
+            scores=dict(scores),
+            name=self.quiz.name,
+            host_id=self.quiz.host_id,
+        )
+
+        if not await self.quiz.archive(archive):
+            raise HandlerException("Failed to archive quiz", ErrorCode.InternalServerError)
+        for connection in connections:
+            self.registry.remove(connection)
+
+        await self.send_message(ok_message())
+
+        # Not via multicast, as the connections are no longer part of a quiz, so cannot be reaped
+        payload = Payload.from_message({
+            "type": "quiz-archived",
+            "quiz_id": self.quiz.quiz_id,
+        })
+        await asyncio.gather(*(
+            self.comms.send(ws, payload) for ws in connections if ws != self.connection
+        ), return_exceptions=True)
+
+    async def get_results(self, quiz_id, client_id):
+        """
+        Returns the results of an archived quiz. Only its host and the root user can get these.
+        """
+        if (archive := await self.db.load_archive(quiz_id)) is None:
+            raise HandlerException(
+                f"No archive found for Quiz {quiz_id}", ErrorCode.QuizNotFound)
+
+        if client_id != archive.host_id:
+            await self.check_is_root(client_id)
+
+        return await self.send_message(Payload.from_message({
+            "type": "results",
+            "quiz_id": quiz_id,
+            "quiz_name": archive.name,
+            "questions": {id: q.asdict(strip_answer=False) for id, q in archive.questions.items()},
+            "answers": archive.answers,
+            "scores": Scoring.leaderboard(archive.players, archive.scores),
         }))
 
     async def _handle_message(self, msg):
         self._globals = None  # Cache only for duration of request
-
-        msg = MessageWrapper(msg)
-
-        cmd = msg["action"]
-
-        # Admin commands
-        if cmd == "set-root-user":
-            return await self.set_root_user(
-                msg["value"],
-                msg.get("old_value"))
-        if cmd == "set-default-quiz":
-            return await self.set_default_quiz(
-                msg["quiz_id"],
-                msg["client_id"])
-
-        # Quiz creation and registration
-        if cmd == "create-quiz":
-            return await self.create_quiz(
-                msg["quiz_name"],
-                host_id=msg.get("host_id"),
-                try_make_default=msg.get("try_make_default"))
-        if cmd == "register":
-            return await self.register(
-                player_name=msg["player_name"],
-                avatar=msg.get("avatar"),
-                quiz_id=msg.get("quiz_id"),
-                client_id=msg.get("client_id"))
-
-        if (quiz_id := msg.get("quiz_id")) is None:
+        self.client_id = None  # Set when the command requires a role
+
+        if (cmd := msg.get("action")) is None:
+            raise HandlerException("Field 'action' is missing", ErrorCode.MissingField)
+        Instrumentation.set_action(cmd)
+
+        if (command := COMMANDS.get(cmd)) is None:
+            self.logger.warn("Unrecognized command %s", cmd)
+            return await self.send_message(error_message(ErrorCode.UnknownCommand))
+
+        # Validate all fields before touching storage
+        args = command.parse(msg)
+
+        if command.state != QuizState.NoQuiz:
+            if (quiz_id := msg.get("quiz_id")) is not None:
+                QUIZ_ID_FIELD.check(quiz_id)
+            elif command.default_quiz:
+                if (quiz_id := await self.globals.default_quiz_id) is None:
+                    raise HandlerException(
+                        "Failed to get default quiz",
+                        ErrorCode.InternalServerError)
             # To avoid extra look-up, best if client provides quiz_id in
             # request. However, for manual testing (using wscat) it is
             # convenient to be able to omit quiz_id.
-            if (quiz_id := self.db.quiz_for_connection(self.connection)) is None:
+            elif (quiz_id := await self.quiz_for_connection()) is None:
                 raise HandlerException("Not connected to quiz yet",
                                        ErrorCode.NotConnected)
-        self.fetch_quiz(quiz_id)
-
-        if cmd == "notify-hosts":
-            return await self.notify_hosts(msg['message'])
-
-        if cmd == "get-clients":
-            return await self.get_clients()
-
-        if cmd == "connect":
-            return await self.connect(msg["client_id"])
-        if cmd == "disconnect":
-            return await self.disconnect()
-
-        if cmd == "get-status":
-            return await self.send_status_message(msg.get("client_id"))
-
-        if cmd == "set-pool-question":
-            return await self.set_pool_question(msg["question"], msg["choices"], msg["answer"])
-        if cmd == "get-pool-question":
-            return await self.get_pool_question()
-        if cmd == "get-pool-questions":
-            return await self.get_pool_questions()
-
-        if cmd == "open-question":
-            return await self.open_question(msg["author_id"], msg["question"], msg["choices"],
-                                            msg["answer"])
-        if cmd == "get-question":
-            return await self.get_question()
-        if cmd == "answer":
-            return await self.answer(msg["question_id"], msg["answer"])
-
-        if cmd == "close-question":
-            return await self.close_question()
-
-        if cmd == "get-questions":
-            return await self.get_questions()
-        if cmd == "get-answers":
-            return await self.get_answers()
-
-        self.logger.warn("Unrecognized command %s", cmd)
-        return await self.send_message(error_message(ErrorCode.UnknownCommand))
+            await self.fetch_quiz(quiz_id, command.state)
+
+        if command.role is not None:
+            self.client_id = await self.check_role(command.role)
+
+        return await getattr(self, command.handler)(**args)
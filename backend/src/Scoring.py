@@ -0,0 +1,60 @@
+import heapq
+import math
+from typing import Optional
+from Common import Config, Player, PlayerScore
+
+
+def question_score(num_correct: int, num_answers: int) -> int:
+    """
+    Score for the author of a question. It is highest when five out of eight players answer the
+    question correctly, i.e. when the question is neither too easy nor too hard.
+
+    Must match the formula used by the frontend. As there, an author only gets the score of their
+    most recent question.
+    """
+    if num_answers < Config.QSCORE_MIN_ANSWERS:
+        # Score based on expected score when there are not enough answers. This is more fair
+        # when the number of submitted answers fluctuates around the lower-limit.
+        return round_half_up(Config.QSCORE_MAX * 3 / 8)
+
+    target_ratio = 5 / 8
+    max_delta = 3 / 8
+    correct_ratio = num_correct / num_answers
+
+    badness = abs(correct_ratio - target_ratio) / max_delta
+    return round_half_up(max(0, (1 - badness) * Config.QSCORE_MAX))
+
+
+def round_half_up(value: float) -> int:
+    # Python's round() rounds half to even, whereas Javascript's Math.round() rounds half up
+    return math.floor(value + 0.5)
+
+
+def leaderboard(players: dict[str, Player], scores: dict[str, PlayerScore],
+                limit: Optional[int] = None) -> list[dict]:
+    """
+    Ranks the players by total score. Only returns the top players when limit is set.
+    """
+    no_score = PlayerScore()
+    entries = (
+        (scores.get(client_id, no_score), client_id, player)
+        for client_id, player in players.items()
+    )
+
+    def sort_key(entry):
+        score, client_id, _ = entry
+        return (score.total_score, score.answer_score, client_id)
+
+    if limit is None:
+        ranked = sorted(entries, key=sort_key, reverse=True)
+    else:
+        ranked = heapq.nlargest(limit, entries, key=sort_key)
+
+    return [
+        {
+            "client_id": client_id,
+            **player.asdict(),
+            **score.asdict(),
+        }
+        for score, client_id, player in ranked
+    ]
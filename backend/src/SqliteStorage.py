@@ -0,0 +1,745 @@
+from contextlib import contextmanager
+import json
+import logging
+import sqlite3
+import threading
+from typing import Optional
+import Scoring
+from Common import Answer, ClientRole, Config, Player, PlayerScore, Question, QuestionStats, QuizCounts
+from CompactSnapshot import CompactSnapshot
+
+logger = logging.getLogger('backend.sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS globals (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS quizzes (
+    quiz_id TEXT PRIMARY KEY,
+    host_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    question_id INTEGER NOT NULL DEFAULT 0,
+    is_question_open INTEGER NOT NULL DEFAULT 0,
+    num_choices INTEGER NOT NULL DEFAULT 0,
+    solution INTEGER,
+    version INTEGER NOT NULL DEFAULT 0,
+    -- Sequence number of the last event appended to the event log
+    event_seq INTEGER NOT NULL DEFAULT 0
+);
+
+-- The quiz that a connection is linked to, independent of the quiz
+CREATE TABLE IF NOT EXISTS connection_quizzes (
+    connection TEXT PRIMARY KEY,
+    quiz_id TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS connections (
+    quiz_id TEXT NOT NULL,
+    connection TEXT NOT NULL,
+    client_id TEXT NOT NULL,
+    PRIMARY KEY (quiz_id, connection)
+);
+
+CREATE TABLE IF NOT EXISTS players (
+    quiz_id TEXT NOT NULL,
+    client_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    avatar TEXT,
+    PRIMARY KEY (quiz_id, client_id)
+);
+
+CREATE TABLE IF NOT EXISTS pool_questions (
+    quiz_id TEXT NOT NULL,
+    author_id TEXT NOT NULL,
+    question TEXT NOT NULL,
+    choices TEXT NOT NULL,
+    answer INTEGER NOT NULL,
+    PRIMARY KEY (quiz_id, author_id)
+);
+
+CREATE TABLE IF NOT EXISTS questions (
+    quiz_id TEXT NOT NULL,
+    question_id INTEGER NOT NULL,
+    author_id TEXT NOT NULL,
+    question TEXT NOT NULL,
+    choices TEXT NOT NULL,
+    answer INTEGER NOT NULL,
+    score INTEGER,
+    PRIMARY KEY (quiz_id, question_id)
+);
+
+CREATE TABLE IF NOT EXISTS answers (
+    quiz_id TEXT NOT NULL,
+    question_id INTEGER NOT NULL,
+    client_id TEXT NOT NULL,
+    answer INTEGER NOT NULL,
+    PRIMARY KEY (quiz_id, question_id, client_id)
+);
+
+CREATE TABLE IF NOT EXISTS scores (
+    quiz_id TEXT NOT NULL,
+    client_id TEXT NOT NULL,
+    answer_score INTEGER NOT NULL DEFAULT 0,
+    question_score INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (quiz_id, client_id)
+);
+
+-- The message that clients of each role received for the event, if any
+CREATE TABLE IF NOT EXISTS events (
+    quiz_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    host_message TEXT,
+    player_message TEXT,
+    PRIMARY KEY (quiz_id, seq)
+);
+
+-- Archived quizzes. The data is an encoded CompactSnapshot
+CREATE TABLE IF NOT EXISTS archives (
+    quiz_id TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+"""
+
+# Tables that hold the data of a quiz, which is deleted when it is archived
+QUIZ_TABLES = ["quizzes", "connection_quizzes", "connections", "players", "pool_questions",
+               "questions", "answers", "scores", "events"]
+
+EVENT_COLUMNS = {
+    ClientRole.Host: "host_message",
+    ClientRole.Player: "player_message",
+}
+
+
+def question_from_row(row) -> Question:
+    return Question(
+        author_id=row["author_id"],
+        question=row["question"],
+        choices=json.loads(row["choices"]),
+        answer=row["answer"]
+    )
+
+
+class SqliteStorage:
+    """
+    Stores all state in a SQLite database. It offers the same interface as DynamoDbStorage.
+
+    It is intended for self-hosted events, where the LocalService handles all messages and state
+    should survive restarts. Its worker processes can share the database file. All statements are
+    parameterized so that the compiled statements are re-used from the connection's statement
+    cache.
+    """
+
+    def __init__(self, path=Config.SQLITE_PATH, link_connections=True):
+        # Connections are only linked to their quiz with link_connections, see DynamoDbStorage
+        self.link_connections = link_connections
+        # Explicit transaction control, and the connection may be used by multiple threads. Access
+        # is serialized using the lock.
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.connection
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            else:
+                self.connection.execute("COMMIT")
+
+    def fetchone(self, sql, params=()) -> Optional[sqlite3.Row]:
+        with self.lock:
+            return self.connection.execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()) -> list[sqlite3.Row]:
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def globals_access(self):
+        return SqliteGlobals(self)
+
+    def quiz_access(self, quiz_id):
+        return SqliteQuiz(quiz_id, self)
+
+    def create_quiz(self, quiz_id, host_id, name):
+        """
+        Tries to create a room with the given ID. On success, returns the room access wrapper.
+        Returns None if creation failed.
+        """
+        try:
+            with self.transaction() as db:
+                db.execute("INSERT INTO quizzes (quiz_id, host_id, name) VALUES (?, ?, ?)",
+                           (quiz_id, host_id, name))
+            return SqliteQuiz(quiz_id, self)
+        except Exception as e:
+            logger.warn(f"Failed to create Quiz {quiz_id}: {e}")
+
+    def quiz_for_connection(self, connection):
+        try:
+            row = self.fetchone("SELECT quiz_id FROM connection_quizzes WHERE connection = ?",
+                                (connection, ))
+            if row is not None:
+                return row["quiz_id"]
+        except Exception as e:
+            logger.warn(f"Failed to get quiz for connection {connection}: {e}")
+
+    def load_archive(self, quiz_id) -> Optional[CompactSnapshot]:
+        try:
+            row = self.fetchone("SELECT data FROM archives WHERE quiz_id = ?", (quiz_id, ))
+            if row is not None:
+                return CompactSnapshot.decode(row["data"])
+        except Exception as e:
+            logger.warn(f"Failed to load archive of Quiz {quiz_id}: {e}")
+
+
+class SqliteGlobals:
+
+    def __init__(self, storage: SqliteStorage):
+        self.storage = storage
+
+    def _get_global_str(self, name: str) -> Optional[str]:
+        row = self.storage.fetchone("SELECT value FROM globals WHERE name = ?", (name, ))
+        value = row["value"] if row else None
+        logger.info(f"Retrieved global {name} = {value}")
+        return value
+
+    def _set_global_str(self, name: str, value: str):
+        try:
+            with self.storage.transaction() as db:
+                db.execute("INSERT OR REPLACE INTO globals (name, value) VALUES (?, ?)",
+                           (name, value))
+            logger.info(f"Set global {name} to {value}")
+
+            return True
+        except Exception as e:
+            logger.warn(f"Failed to update globals: {e}")
+
+    @property
+    def root_user(self):
+        return self._get_global_str("RootUser")
+
+    def set_root_user(self, value):
+        return self._set_global_str("RootUser", value)
+
+    @property
+    def default_quiz_id(self):
+        return self._get_global_str("DefaultQuizId")
+
+    def set_default_quiz_id(self, value):
+        return self._set_global_str("DefaultQuizId", value)
+
+
+class SqliteQuiz:
+
+    def __init__(self, quiz_id, storage: SqliteStorage):
+        self.quiz_id = quiz_id
+        self.storage = storage
+
+        self.__row = None
+        self.__clients = None
+        self.__players = None
+
+    def _bump_version(self, db):
+        db.execute("UPDATE quizzes SET version = version + 1 WHERE quiz_id = ?", (self.quiz_id, ))
+
+    @property
+    def host_id(self) -> str:
+        return self.__row["host_id"]
+
+    @property
+    def name(self) -> str:
+        return self.__row["name"]
+
+    @property
+    def question_id(self) -> int:
+        return self.__row["question_id"]
+
+    @property
+    def is_question_open(self) -> bool:
+        return bool(self.__row["is_question_open"])
+
+    @property
+    def num_choices(self) -> int:
+        """
+        Number of choices for current question
+        """
+        return self.__row["num_choices"]
+
+    @property
+    def solution(self) -> Optional[int]:
+        """
+        Answer to current question
+        """
+        return self.__row["solution"]
+
+    @property
+    def version(self) -> int:
+        """
+        Incremented on every change to the quiz, its connections and its players
+        """
+        return self.__row["version"]
+
+    @property
+    def event_seq(self) -> int:
+        """
+        Sequence number of the last event appended to the event log
+        """
+        return self.__row["event_seq"]
+
+    def exists(self, roster=True):
+        """
+        Checks if the quiz exists. This should be invoked first. This access wrapper can only be
+        used when it returns True
+
+        When roster is False, the connections and players are only loaded when first accessed.
+        """
+        try:
+            with self.storage.lock:
+                self.__row = self.storage.fetchone("SELECT * FROM quizzes WHERE quiz_id = ?",
+                                                   (self.quiz_id, ))
+                if self.__row is None:
+                    return False
+
+                if roster:
+                    self._load_clients()
+                    self._load_players()
+
+            return True
+        except Exception as e:
+            logger.warn(f"Failed to check existence of Quiz {self.quiz_id}: {e}")
+
+    def _load_clients(self):
+        self.__clients = {
+            row["connection"]: row["client_id"]
+            for row in self.storage.fetchall(
+                "SELECT connection, client_id FROM connections WHERE quiz_id = ?",
+                (self.quiz_id, ))
+        }
+
+    def _load_players(self):
+        self.__players = {
+            row["client_id"]: Player(name=row["name"], avatar=row["avatar"])
+            for row in self.storage.fetchall(
+                "SELECT client_id, name, avatar FROM players WHERE quiz_id = ?",
+                (self.quiz_id, ))
+        }
+
+    def has_changed(self) -> bool:
+        """
+        Checks if the quiz changed since it was loaded.
+        """
+        row = self.storage.fetchone("SELECT version FROM quizzes WHERE quiz_id = ?",
+                                    (self.quiz_id, ))
+        return row is None or row["version"] != self.version
+
+    @property
+    def clients(self) -> dict[str, str]:
+        if self.__clients is None:
+            self._load_clients()
+        return self.__clients
+
+    @property
+    def players(self) -> dict[str, Player]:
+        if self.__players is None:
+            self._load_players()
+        return self.__players
+
+    def add_client(self, connection, client_id):
+        try:
+            with self.storage.transaction() as db:
+                # Fails when the connection was already added. A client should disconnect first
+                # before re-joining using an existing connection
+                db.execute("INSERT INTO connections (quiz_id, connection, client_id) VALUES (?, ?, ?)",
+                           (self.quiz_id, connection, client_id))
+                if self.storage.link_connections:
+                    db.execute("INSERT OR REPLACE INTO connection_quizzes (connection, quiz_id) "
+                               "VALUES (?, ?)", (connection, self.quiz_id))
+                self._bump_version(db)
+
+            self.clients[connection] = client_id
+
+            return self.clients
+        except Exception as e:
+            logger.warn(f"Failed to add Client {client_id} to Quiz {self.quiz_id}: {e}")
+
+    def remove_client(self, connection):
+        try:
+            with self.storage.transaction() as db:
+                db.execute("DELETE FROM connections WHERE quiz_id = ? AND connection = ?",
+                           (self.quiz_id, connection))
+                if self.storage.link_connections:
+                    db.execute("DELETE FROM connection_quizzes WHERE connection = ?", (connection, ))
+                self._bump_version(db)
+
+            self.clients.pop(connection, None)
+
+            return self.clients
+        except Exception as e:
+            logger.warn(f"Failed to remove Connection {connection} from Quiz {self.quiz_id}: {e}")
+
+    def remove_clients(self, connections):
+        try:
+            with self.storage.transaction() as db:
+                db.executemany("DELETE FROM connections WHERE quiz_id = ? AND connection = ?",
+                               [(self.quiz_id, connection) for connection in connections])
+                if self.storage.link_connections:
+                    db.executemany("DELETE FROM connection_quizzes WHERE connection = ?",
+                                   [(connection, ) for connection in connections])
+                self._bump_version(db)
+
+            for connection in connections:
+                self.clients.pop(connection, None)
+
+            return self.clients
+        except Exception as e:
+            logger.warn(f"Failed to remove Connections {connections} from Quiz {self.quiz_id}: {e}")
+
+    def get_client_id(self, connection) -> Optional[str]:
+        if self.__clients is not None:
+            return self.__clients.get(connection)
+
+        row = self.storage.fetchone(
+            "SELECT client_id FROM connections WHERE quiz_id = ? AND connection = ?",
+            (self.quiz_id, connection))
+        return row["client_id"] if row is not None else None
+
+    def add_or_update_player(self, client_id: str, name: str, avatar: Optional[str] = None) -> dict[str, Player]:
+        try:
+            with self.storage.transaction() as db:
+                db.execute("INSERT OR REPLACE INTO players (quiz_id, client_id, name, avatar)"
+                           " VALUES (?, ?, ?, ?)",
+                           (self.quiz_id, client_id, name, avatar))
+                self._bump_version(db)
+
+            self.players[client_id] = Player(name, avatar)
+
+            return self.players
+        except Exception as e:
+            logger.warn(
+                f"Failed to add player {client_id} named {name}: {e}")
+
+    def set_pool_question(self, question: Question):
+        try:
+            with self.storage.transaction() as db:
+                db.execute("INSERT OR REPLACE INTO pool_questions"
+                           " (quiz_id, author_id, question, choices, answer) VALUES (?, ?, ?, ?, ?)",
+                           (self.quiz_id, question.author_id, question.question,
+                            json.dumps(question.choices), question.answer))
+
+            return True
+        except Exception as e:
+            logger.warn(
+                f"Failed to set question for Client {question.author_id} and Quiz {self.quiz_id}: {e}")
+
+    def get_pool_questions(self) -> list[Question]:
+        try:
+            return [
+                question_from_row(row)
+                for row in self.storage.fetchall(
+                    "SELECT author_id, question, choices, answer FROM pool_questions WHERE quiz_id = ?",
+                    (self.quiz_id, ))
+            ]
+        except Exception as e:
+            logger.warn(f"Failed to get pool questions for Quiz {self.quiz_id}: {e}")
+
+    def get_counts(self) -> Optional[QuizCounts]:
+        try:
+            row = self.storage.fetchone(
+                "SELECT"
+                " (SELECT COUNT(*) FROM players WHERE quiz_id = :quiz_id) AS num_players,"
+                " (SELECT COUNT(*) FROM pool_questions WHERE quiz_id = :quiz_id) AS num_pool_questions,"
+                " (SELECT COUNT(*) FROM connections WHERE quiz_id = :quiz_id AND client_id = :host_id)"
+                " AS num_host_connections,"
+                " (SELECT COUNT(*) FROM connections WHERE quiz_id = :quiz_id AND client_id != :host_id)"
+                " AS num_player_connections",
+                {"quiz_id": self.quiz_id, "host_id": self.host_id})
+            return QuizCounts(row["num_players"], row["num_pool_questions"],
+                              row["num_host_connections"], row["num_player_connections"])
+        except Exception as e:
+            logger.warn(f"Failed to count players and pool questions for Quiz {self.quiz_id}: {e}")
+
+    def get_pool_question(self, client_id) -> Optional[Question]:
+        try:
+            row = self.storage.fetchone(
+                "SELECT author_id, question, choices, answer FROM pool_questions"
+                " WHERE quiz_id = ? AND author_id = ?",
+                (self.quiz_id, client_id))
+            if row is not None:
+                return question_from_row(row)
+        except Exception as e:
+            logger.warn(f"Failed to get pool question of {client_id} for Quiz {self.quiz_id}: {e}")
+
+    def set_question(self, question: Question, question_id: int):
+        try:
+            # Note: Allow overwriting an existing question. See DynamoDbQuiz.set_question
+            with self.storage.transaction() as db:
+                db.execute("INSERT OR REPLACE INTO questions"
+                           " (quiz_id, question_id, author_id, question, choices, answer)"
+                           " VALUES (?, ?, ?, ?, ?, ?)",
+                           (self.quiz_id, question_id, question.author_id, question.question,
+                            json.dumps(question.choices), question.answer))
+
+            return True
+        except Exception as e:
+            logger.warn(
+                f"Failed to set question {question_id} for Quiz {self.quiz_id}: {e}")
+
+    def get_question(self, question_id) -> Optional[Question]:
+        try:
+            row = self.storage.fetchone(
+                "SELECT author_id, question, choices, answer FROM questions"
+                " WHERE quiz_id = ? AND question_id = ?",
+                (self.quiz_id, question_id))
+            if row is not None:
+                return question_from_row(row)
+        except Exception as e:
+            logger.warn(f"Failed to get question {question_id} for Quiz {self.quiz_id}: {e}")
+
+    def get_questions(self) -> dict[str, Question]:
+        try:
+            return {
+                str(row["question_id"]): question_from_row(row)
+                for row in self.storage.fetchall(
+                    "SELECT question_id, author_id, question, choices, answer FROM questions"
+                    " WHERE quiz_id = ?",
+                    (self.quiz_id, ))
+            }
+        except Exception as e:
+            logger.warn(f"Failed to get questions for Quiz {self.quiz_id}: {e}")
+
+    def get_solutions(self) -> dict[str, int]:
+        try:
+            return {
+                str(row["question_id"]): row["answer"]
+                for row in self.storage.fetchall(
+                    "SELECT question_id, answer FROM questions WHERE quiz_id = ?",
+                    (self.quiz_id, ))
+            }
+        except Exception as e:
+            logger.warn(f"Failed to get solutions for Quiz {self.quiz_id}: {e}")
+
+    def open_question(self, question: Question) -> int:
+        try:
+            old_id = self.question_id
+            new_id = old_id + 1
+
+            with self.storage.transaction() as db:
+                db.execute("INSERT OR REPLACE INTO questions"
+                           " (quiz_id, question_id, author_id, question, choices, answer)"
+                           " VALUES (?, ?, ?, ?, ?, ?)",
+                           (self.quiz_id, new_id, question.author_id, question.question,
+                            json.dumps(question.choices), question.answer))
+                cursor = db.execute(
+                    "UPDATE quizzes SET question_id = ?, is_question_open = 1, num_choices = ?,"
+                    " solution = ?, version = version + 1"
+                    " WHERE quiz_id = ? AND question_id = ?",
+                    (new_id, len(question.choices), question.answer, self.quiz_id, old_id))
+                if cursor.rowcount != 1:
+                    raise RuntimeError(f"Question {old_id} is not the current question anymore")
+
+            self.__row = self.storage.fetchone("SELECT * FROM quizzes WHERE quiz_id = ?",
+                                               (self.quiz_id, ))
+
+            return self.question_id
+        except Exception as e:
+            logger.warn(f"Failed to open new question: {e}")
+
+    def store_answer(self, question_id, client_id, answer: int, is_correct: bool):
+        """
+        Stores the answer, and atomically updates the player's score. Returns False when the
+        player already answered the question.
+        """
+        try:
+            with self.storage.transaction() as db:
+                # Fails when the player already answered the question
+                db.execute("INSERT INTO answers (quiz_id, question_id, client_id, answer)"
+                           " VALUES (?, ?, ?, ?)",
+                           (self.quiz_id, question_id, client_id, answer))
+                if is_correct:
+                    db.execute("INSERT INTO scores (quiz_id, client_id, answer_score) VALUES (?, ?, 1)"
+                               " ON CONFLICT (quiz_id, client_id) DO UPDATE SET answer_score = answer_score + 1",
+                               (self.quiz_id, client_id))
+
+            return True
+        except sqlite3.IntegrityError:
+            return False
+        except Exception as e:
+            logger.warn(
+                f"Failed to store answer for client {client_id} for question {question_id}: {e}")
+
+    def store_answers(self, question_id, answers: list[Answer]) -> Optional[list[Answer]]:
+        """
+        Stores a batch of answers, and atomically updates the players' scores. Returns the answers
+        that were stored. Answers of players that already answered the question are ignored.
+        """
+        try:
+            stored = []
+            with self.storage.transaction() as db:
+                for answer in answers:
+                    cursor = db.execute("INSERT OR IGNORE INTO answers"
+                                        " (quiz_id, question_id, client_id, answer) VALUES (?, ?, ?, ?)",
+                                        (self.quiz_id, question_id, answer.client_id, answer.answer))
+                    if cursor.rowcount == 0:
+                        logger.warn(f"Ignored answer for client {answer.client_id} for question "
+                                    f"{question_id}: Already answered")
+                        continue
+
+                    stored.append(answer)
+                    if answer.is_correct:
+                        db.execute("INSERT INTO scores (quiz_id, client_id, answer_score) VALUES (?, ?, 1)"
+                                   " ON CONFLICT (quiz_id, client_id) DO UPDATE SET answer_score = answer_score + 1",
+                                   (self.quiz_id, answer.client_id))
+
+            return stored
+        except Exception as e:
+            logger.warn(
+                f"Failed to store {len(answers)} answers for question {question_id}: {e}")
+
+    def get_answers(self) -> dict[str, dict[str, int]]:
+        try:
+            answers = {}
+            for row in self.storage.fetchall(
+                    "SELECT question_id, client_id, answer FROM answers WHERE quiz_id = ?",
+                    (self.quiz_id, )):
+                answers.setdefault(str(row["question_id"]), {})[row["client_id"]] = row["answer"]
+
+            return answers
+        except Exception as e:
+            logger.warn(
+                f"Failed to retrieve answers for quiz {self.quiz_id}: {e}")
+
+    def _question_stats(self, db, question_id) -> Optional[QuestionStats]:
+        question_row = db.execute(
+            "SELECT choices, answer FROM questions WHERE quiz_id = ? AND question_id = ?",
+            (self.quiz_id, question_id)).fetchone()
+        if question_row is None:
+            return None
+
+        choice_counts = [0] * len(json.loads(question_row["choices"]))
+        for row in db.execute(
+                "SELECT answer, COUNT(*) AS n FROM answers"
+                " WHERE quiz_id = ? AND question_id = ? GROUP BY answer",
+                (self.quiz_id, question_id)):
+            choice_counts[row["answer"] - 1] = row["n"]
+
+        return QuestionStats(
+            num_answers=sum(choice_counts),
+            num_correct=choice_counts[question_row["answer"] - 1],
+            choice_counts=choice_counts
+        )
+
+    def score_question(self, question_id) -> Optional[int]:
+        """
+        (Re-)calculates the score for the question. It becomes the question score of its author,
+        unless a later question of the author was scored already.
+        """
+        try:
+            with self.storage.transaction() as db:
+                if (stats := self._question_stats(db, question_id)) is None:
+                    return None
+
+                row = db.execute(
+                    "SELECT author_id FROM questions WHERE quiz_id = ? AND question_id = ?",
+                    (self.quiz_id, question_id)).fetchone()
+                score = Scoring.question_score(num_correct=stats.num_correct,
+                                               num_answers=stats.num_answers)
+
+                db.execute("UPDATE questions SET score = ? WHERE quiz_id = ? AND question_id = ?",
+                           (score, self.quiz_id, question_id))
+                later = db.execute(
+                    "SELECT 1 FROM questions WHERE quiz_id = ? AND author_id = ?"
+                    " AND question_id > ? AND score IS NOT NULL",
+                    (self.quiz_id, row["author_id"], question_id)).fetchone()
+                if later is None:
+                    db.execute("INSERT INTO scores (quiz_id, client_id, question_score)"
+                               " VALUES (?, ?, ?) ON CONFLICT (quiz_id, client_id)"
+                               " DO UPDATE SET question_score = ?",
+                               (self.quiz_id, row["author_id"], score, score))
+
+            return score
+        except Exception as e:
+            logger.warn(f"Failed to score question {question_id} for Quiz {self.quiz_id}: {e}")
+
+    def get_question_stats(self, question_id) -> Optional[QuestionStats]:
+        try:
+            with self.storage.lock:
+                return self._question_stats(self.storage.connection, question_id)
+        except Exception as e:
+            logger.warn(f"Failed to get stats of question {question_id} for Quiz {self.quiz_id}: {e}")
+
+    def get_scores(self) -> dict[str, PlayerScore]:
+        try:
+            return {
+                row["client_id"]: PlayerScore(answer_score=row["answer_score"],
+                                              question_score=row["question_score"])
+                for row in self.storage.fetchall(
+                    "SELECT client_id, answer_score, question_score FROM scores WHERE quiz_id = ?",
+                    (self.quiz_id, ))
+            }
+        except Exception as e:
+            logger.warn(f"Failed to get scores for Quiz {self.quiz_id}: {e}")
+
+    def append_event(self, messages: dict[ClientRole, dict]) -> Optional[int]:
+        try:
+            with self.storage.transaction() as db:
+                db.execute("UPDATE quizzes SET event_seq = event_seq + 1 WHERE quiz_id = ?",
+                           (self.quiz_id, ))
+                seq = db.execute("SELECT event_seq FROM quizzes WHERE quiz_id = ?",
+                                 (self.quiz_id, )).fetchone()[0]
+                db.execute("INSERT INTO events (quiz_id, seq, host_message, player_message)"
+                           " VALUES (?, ?, ?, ?)",
+                           (self.quiz_id, seq,
+                            *(json.dumps(messages[role]) if role in messages else None
+                              for role in EVENT_COLUMNS)))
+
+            return seq
+        except Exception as e:
+            logger.warn(f"Failed to append event to Quiz {self.quiz_id}: {e}")
+
+    def get_events(self, since: int, role: ClientRole) -> Optional[list[dict]]:
+        try:
+            column = EVENT_COLUMNS[role]
+            return [
+                {**json.loads(row[column]), "seq": row["seq"]}
+                for row in self.storage.fetchall(
+                    f"SELECT seq, {column} FROM events"
+                    f" WHERE quiz_id = ? AND seq > ? AND {column} IS NOT NULL ORDER BY seq",
+                    (self.quiz_id, since))
+            ]
+        except Exception as e:
+            logger.warn(f"Failed to get events for Quiz {self.quiz_id}: {e}")
+
+    def close_question(self):
+        try:
+            with self.storage.transaction() as db:
+                db.execute("UPDATE quizzes SET is_question_open = 0, version = version + 1"
+                           " WHERE quiz_id = ?",
+                           (self.quiz_id, ))
+
+            return True
+        except Exception as e:
+            logger.warn(f"Failed to get update state for Quiz {self.quiz_id}: {e}")
+
+    def archive(self, archive: CompactSnapshot):
+        """
+        Stores the archive of the quiz, and deletes the quiz, in a single transaction.
+        """
+        try:
+            with self.storage.transaction() as db:
+                db.execute("INSERT OR REPLACE INTO archives (quiz_id, data) VALUES (?, ?)",
+                           (self.quiz_id, archive.encode()))
+                for table in QUIZ_TABLES:
+                    db.execute(f"DELETE FROM {table} WHERE quiz_id = ?", (self.quiz_id, ))
+
+            return True
+        except Exception as e:
+            logger.warn(f"Failed to archive Quiz {self.quiz_id}: {e}")
@@ -0,0 +1,54 @@
+from contextlib import contextmanager
+import json
+import logging
+import time
+
+logger = logging.getLogger('backend.metrics')
+
+
+class StartupProfile:
+    """
+    Records where the time goes during a cold start: importing modules, creating clients, and
+    handling the first request. The phases are logged together once the first request has been
+    handled. It does nothing unless enabled.
+
+    Phases may be nested, e.g. a client that is created lazily while handling the first request.
+    The time of a nested phase is only counted once, so the phases add up to the total.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        # Time spent in nested phases, for each phase that is in progress
+        self.__nested: list[float] = []
+        self.reported = False
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled or self.reported:
+            yield
+            return
+
+        start = time.perf_counter()
+        self.__nested.append(0)
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            nested = self.__nested.pop()
+            self.phases[name] = self.phases.get(name, 0) + duration - nested
+            if self.__nested:
+                self.__nested[-1] += duration
+
+    def report(self):
+        if not self.enabled or self.reported:
+            return
+
+        self.reported = True
+        logger.info(json.dumps({
+            "startup": {
+                "total": round((time.perf_counter() - self.start) * 1000, 2),  # ms
+                **{name: round(duration * 1000, 2) for name, duration in self.phases.items()},
+            }
+        }))
@@ -1,32 +1,93 @@
 import asyncio
-import boto3
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import json
 import logging
-from DisconnectionHandler import DisconnectionHandler
-from DynamoDbStorage import DynamoDbStorage
-from QuizMessageHandler import QuizMessageHandler
+from Codecs import JSON
+from Common import Config, ConnectionGone, Payload
+from StartupProfile import StartupProfile
+
+startup_profile = StartupProfile(Config.STARTUP_PROFILE)
+
+with startup_profile.phase("imports"):
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from AsyncStorage import AsyncStorage
+    from DisconnectionHandler import DisconnectionHandler
+    from DynamoDbStorage import DynamoDbStorage
+    from QuizMessageHandler import QuizMessageHandler
 
-db = DynamoDbStorage()
 logging.getLogger('backend').setLevel(logging.INFO)
 
 REQUEST_HANDLED = {"statusCode": 200}
 
+# The boto3 client calls are blocking. They are executed by a bounded thread pool so that
+# messages to multiple recipients are sent concurrently.
+send_executor = ThreadPoolExecutor(max_workers=Config.MAX_SEND_CONCURRENCY,
+                                   thread_name_prefix="send")
+
+
+@functools.cache
+def storage() -> AsyncStorage:
+    """
+    Storage shared by all invocations of a warm container. Its client is only created when the
+    first request is handled, so it is not part of the initialization of the container.
+    """
+    with startup_profile.phase("storage"):
+        # A container handles one request at a time, so storage is invoked inline
+        return AsyncStorage(DynamoDbStorage())
+
+
+@functools.cache
+def gateway_client(endpoint_url):
+    """
+    Client for the management API of the given endpoint. Creating a client is costly, so it is
+    reused across invocations of a warm container. Clients are thread-safe.
+    """
+    with startup_profile.phase("gateway_client"):
+        return boto3.client(
+            'apigatewaymanagementapi',
+            endpoint_url=endpoint_url,
+            config=BotoConfig(
+                max_pool_connections=Config.MAX_SEND_CONCURRENCY,
+                connect_timeout=Config.SEND_TIMEOUT,
+                read_timeout=Config.SEND_TIMEOUT,
+                retries={"max_attempts": 1}
+            )
+        )
+
 
 class AwsWebsocketComms:
     def __init__(self, request_context):
         domain_name = request_context['domainName']
         stage = request_context['stage']
-        url = f'https://{domain_name}/{stage}'
-        self.gateway_client = boto3.client(
-            'apigatewaymanagementapi',
-            endpoint_url=url
-        )
+        self.endpoint_url = f'https://{domain_name}/{stage}'
+
+    @functools.cached_property
+    def gateway_client(self):
+        # Only needed once a message is sent
+        return gateway_client(self.endpoint_url)
+
+    def use_codec(self, connection_id, codec_name) -> str:
+        """
+        The codec of a connection would have to be stored, as each invocation is stateless. Clients
+        therefore always receive JSON.
+        """
+        return JSON.name
 
     async def send(self, connection_id, message):
-        self.gateway_client.post_to_connection(
-            ConnectionId=connection_id,
-            Data=message
-        )
+        post = functools.partial(self.gateway_client.post_to_connection,
+                                 ConnectionId=connection_id,
+                                 # Payloads are encoded only once for all recipients
+                                 Data=message.data if isinstance(message, Payload) else message)
+
+        try:
+            await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(send_executor, post),
+                timeout=Config.SEND_TIMEOUT
+            )
+        except self.gateway_client.exceptions.GoneException as e:
+            raise ConnectionGone(connection_id) from e
 
 
 def handle_message(event, context):
@@ -34,8 +95,12 @@ def handle_message(event, context):
     connection_id = request_context['connectionId']
     message = json.loads(event['body'])
 
-    handler = QuizMessageHandler(db, AwsWebsocketComms(request_context), connection_id)
-    asyncio.get_event_loop().run_until_complete(handler.handle_message(message))
+    with startup_profile.phase("first_request"):
+        # No connection registry is shared across invocations. Another container may have
+        # connected the connection to another quiz since, so only the link in storage is current.
+        handler = QuizMessageHandler(storage(), AwsWebsocketComms(request_context), connection_id)
+        asyncio.get_event_loop().run_until_complete(handler.handle_message(message))
+    startup_profile.report()
 
     return REQUEST_HANDLED
 
@@ -44,7 +109,10 @@ def handle_disconnect(event, context):
     request_context = event['requestContext']
     connection_id = request_context['connectionId']
 
-    handler = DisconnectionHandler(db, AwsWebsocketComms(request_context), connection_id)
-    asyncio.get_event_loop().run_until_complete(handler.handle_disconnect())
+    with startup_profile.phase("first_request"):
+        handler = DisconnectionHandler(storage(), AwsWebsocketComms(request_context),
+                                       connection_id)
+        asyncio.get_event_loop().run_until_complete(handler.handle_disconnect())
+    startup_profile.report()
 
     return REQUEST_HANDLED
@@ -0,0 +1,147 @@
+import asyncio
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+# Never let the DynamoDB tests reach AWS, even when credentials are configured
+os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+os.environ["AWS_DEFAULT_REGION"] = "eu-west-1"
+
+from Codecs import JSON  # noqa: E402
+from Common import Config, ConnectionGone, Payload  # noqa: E402
+from QuizMessageHandler import QuizMessageHandler  # noqa: E402
+
+STORAGE_TYPES = ["memory", "sqlite", "dynamodb"]
+
+
+class CountingClient:
+    """
+    Wraps a DynamoDB client, and counts the calls of each operation.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not callable(attr) or name == "exceptions":
+            return attr
+
+        def call(*args, **kwargs):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return attr(*args, **kwargs)
+        return call
+
+    def reset(self):
+        self.calls.clear()
+
+
+class RecordingComms:
+    """
+    Comms that record the (decoded) messages sent to each connection. Sends to the connections
+    in gone fail, as if the client disappeared.
+    """
+
+    def __init__(self):
+        self.messages: list[tuple[str, dict]] = []
+        self.gone: set[str] = set()
+
+    def use_codec(self, connection, codec_name) -> str:
+        return JSON.name
+
+    async def send(self, connection, message):
+        if connection in self.gone:
+            raise ConnectionGone(connection)
+        self.messages.append(
+            (connection, message.message if isinstance(message, Payload) else JSON.decode(message)))
+
+    def received(self, connection) -> list[dict]:
+        return [message for recipient, message in self.messages if recipient == connection]
+
+
+class QuizSession:
+    """
+    Drives the message handler the way the gateways do, one message at a time.
+    """
+
+    def __init__(self, db, **handler_args):
+        self.db = db
+        self.comms = RecordingComms()
+        self.handler_args = handler_args
+
+    def call(self, connection, action, **fields) -> list[dict]:
+        """
+        Handles the message, and returns the messages that were sent to the connection.
+        """
+        start = len(self.comms.messages)
+        handler = QuizMessageHandler(self.db, self.comms, connection, **self.handler_args)
+        asyncio.run(handler.handle_message({"action": action, **fields}))
+        return [message for recipient, message in self.comms.messages[start:]
+                if recipient == connection]
+
+    def send(self, connection, action, **fields) -> dict:
+        """
+        Handles the message, and returns the last message that was sent to the connection.
+        """
+        return self.call(connection, action, **fields)[-1]
+
+    def create_quiz(self, name="Test Quiz") -> tuple[str, str]:
+        response = self.send("host", "create-quiz", quiz_name=name)
+        quiz_id, host_id = response["quiz_id"], response["host_id"]
+        self.send("host", "connect", quiz_id=quiz_id, client_id=host_id)
+        return quiz_id, host_id
+
+    def add_player(self, quiz_id, connection, name=None) -> str:
+        response = self.send(connection, "register", quiz_id=quiz_id,
+                             player_name=name or f"Player {connection}")
+        client_id = response["client_id"]
+        self.send(connection, "connect", quiz_id=quiz_id, client_id=client_id)
+        return client_id
+
+    def ask(self, quiz_id, author_id, answer=1, question="What is the answer?") -> dict:
+        return self.send("host", "open-question", quiz_id=quiz_id, author_id=author_id,
+                         question=question, choices=["A", "B", "C", "D"], answer=answer)
+
+
+@pytest.fixture
+def dynamodb_client():
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    with moto.mock_aws():
+        client = boto3.client("dynamodb", region_name="eu-west-1")
+        client.create_table(
+            TableName=Config.MAIN_TABLE,
+            AttributeDefinitions=[{"AttributeName": "PKEY", "AttributeType": "S"},
+                                  {"AttributeName": "SKEY", "AttributeType": "S"}],
+            KeySchema=[{"AttributeName": "PKEY", "KeyType": "HASH"},
+                       {"AttributeName": "SKEY", "KeyType": "RANGE"}],
+            BillingMode="PAY_PER_REQUEST"
+        )
+        yield CountingClient(client)
+
+
+def create_storage(storage_type, tmp_path, request):
+    if storage_type == "memory":
+        from InMemoryStorage import InMemoryStorage
+        return InMemoryStorage(archive_path=str(tmp_path / "archives"))
+    if storage_type == "sqlite":
+        from SqliteStorage import SqliteStorage
+        return SqliteStorage(str(tmp_path / "quiz.db"))
+
+    from DynamoDbStorage import DynamoDbStorage
+    return DynamoDbStorage(client=request.getfixturevalue("dynamodb_client"))
+
+
+@pytest.fixture(params=STORAGE_TYPES)
+def storage(request, tmp_path):
+    return create_storage(request.param, tmp_path, request)
+
+
+@pytest.fixture
+def session(storage) -> QuizSession:
+    return QuizSession(storage)
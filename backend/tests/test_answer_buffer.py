@@ -0,0 +1,123 @@
+import asyncio
+from AnswerBuffer import AnswerBuffer
+from Commands import QuizState
+from Common import Answer, Config, Question
+import DynamoDbStorage
+from QuizMessageHandler import QuizMessageHandler
+from conftest import QuizSession
+
+
+def test_each_client_answers_once():
+    async def run():
+        buffer = AnswerBuffer(flush=None, flush_interval=60)
+        assert buffer.add("QUIZ", 1, Answer("PLAYER", 1, True))
+        assert not buffer.add("QUIZ", 1, Answer("PLAYER", 2, False))
+        assert buffer.add("QUIZ", 2, Answer("PLAYER", 2, False))
+        assert buffer.add("OTHER", 2, Answer("PLAYER", 2, False))
+
+        assert buffer.take("QUIZ") == {1: [Answer("PLAYER", 1, True)],
+                                       2: [Answer("PLAYER", 2, False)]}
+        assert buffer.take("QUIZ") == {}
+
+    asyncio.run(run())
+
+
+def test_answers_are_flushed_after_interval():
+    async def run():
+        flushed = []
+
+        async def flush(quiz_id):
+            flushed.append(buffer.take(quiz_id))
+
+        buffer = AnswerBuffer(flush, flush_interval=0.01)
+        buffer.add("QUIZ", 1, Answer("PLAYER1", 1, True))
+        buffer.add("QUIZ", 1, Answer("PLAYER2", 2, False))
+        assert flushed == []
+
+        await asyncio.sleep(0.05)
+        assert flushed == [{1: [Answer("PLAYER1", 1, True), Answer("PLAYER2", 2, False)]}]
+
+        # A later answer is flushed separately
+        buffer.add("QUIZ", 1, Answer("PLAYER3", 1, True))
+        await asyncio.sleep(0.05)
+        assert flushed[1] == {1: [Answer("PLAYER3", 1, True)]}
+
+    asyncio.run(run())
+
+
+def test_answers_are_dropped_after_failed_flushes():
+    async def run():
+        attempts = []
+
+        async def flush(quiz_id):
+            attempts.append(quiz_id)
+            raise RuntimeError("Quiz not found")
+
+        buffer = AnswerBuffer(flush, flush_interval=0.01)
+        buffer.add("QUIZ", 1, Answer("PLAYER", 1, True))
+        await asyncio.sleep(0.02 * (Config.MAX_ATTEMPTS + 2))
+
+        assert attempts == ["QUIZ"] * Config.MAX_ATTEMPTS
+        assert buffer.take("QUIZ") == {}
+
+    asyncio.run(run())
+
+
+def test_store_answers(storage):
+    storage.create_quiz("QUIZ01", "HOST01", "Test")
+    quiz = storage.quiz_access("QUIZ01")
+    assert quiz.exists()
+    question_id = quiz.open_question(Question("HOST01", "What is the answer?", ["A", "B"], 1))
+    assert quiz.store_answer(question_id, "PLAYER1", 1, True)
+
+    answers = [Answer("PLAYER1", 2, False), Answer("PLAYER2", 1, True), Answer("PLAYER3", 2, False)]
+    assert quiz.store_answers(question_id, answers) == answers[1:]
+
+    stats = quiz.get_question_stats(question_id)
+    assert (stats.num_answers, stats.num_correct, stats.choice_counts) == (3, 2, [2, 1])
+    assert quiz.get_answers()[str(question_id)] == {"PLAYER1": 1, "PLAYER2": 1, "PLAYER3": 2}
+
+
+def test_store_answers_in_chunks(dynamodb_client):
+    storage = DynamoDbStorage.DynamoDbStorage(client=dynamodb_client)
+    storage.create_quiz("QUIZ01", "HOST01", "Test")
+    quiz = storage.quiz_access("QUIZ01")
+    assert quiz.exists()
+    question_id = quiz.open_question(Question("HOST01", "What is the answer?", ["A", "B"], 1))
+
+    answers = [Answer(f"PLAYER{i}", 1, True)
+               for i in range(DynamoDbStorage.ANSWERS_PER_TRANSACTION + 1)]
+    dynamodb_client.reset()
+    assert quiz.store_answers(question_id, answers) == answers
+    assert dynamodb_client.calls == {"transact_write_items": 2}
+    assert quiz.get_question_stats(question_id).num_answers == len(answers)
+
+
+def test_buffered_answers_are_stored_on_close(storage):
+    async def flush(quiz_id):
+        handler = QuizMessageHandler(storage, session.comms, None, answer_buffer=buffer)
+        await handler.fetch_quiz(quiz_id, QuizState.Instance)
+        await handler.flush_answers()
+
+    buffer = AnswerBuffer(flush)
+    session = QuizSession(storage, answer_buffer=buffer)
+    quiz_id, host_id = session.create_quiz()
+    for i in range(3):
+        session.add_player(quiz_id, f"player-{i}")
+    question_id = session.ask(quiz_id, host_id)["question_id"]
+
+    for i in range(3):
+        response = session.send(f"player-{i}", "answer", quiz_id=quiz_id,
+                                question_id=question_id, answer=1 + i % 2)
+        assert response["result"] == "ok"
+    response = session.send("player-0", "answer", quiz_id=quiz_id, question_id=question_id,
+                            answer=2)
+    assert response["result"] == "error"
+
+    messages = session.call("host", "close-question", quiz_id=quiz_id)
+    received = [message for message in messages if message["type"] == "answers-received"]
+    assert len(received) == 1
+    assert len(received[0]["answers"]) == 3
+
+    stats = session.send("host", "get-question-stats", quiz_id=quiz_id)
+    assert (stats["num_answers"], stats["num_correct"]) == (3, 2)
@@ -0,0 +1,58 @@
+from BaseMessageHandler import ErrorCode
+from Common import Question
+from DynamoDbStorage import DynamoDbStorage
+
+QUESTION = Question("AUTHOR", "What is the answer?", ["A", "B", "C", "D"], 2)
+
+
+def open_quiz(storage):
+    storage.create_quiz("QUIZ01", "HOST01", "Test")
+    quiz = storage.quiz_access("QUIZ01")
+    assert quiz.exists()
+    question_id = quiz.open_question(QUESTION)
+    return quiz, question_id
+
+
+def test_answers_are_tallied(storage):
+    quiz, question_id = open_quiz(storage)
+
+    assert quiz.store_answer(question_id, "PLAYER1", 2, True)
+    assert quiz.store_answer(question_id, "PLAYER2", 3, False)
+    assert quiz.store_answer(question_id, "PLAYER3", 2, True)
+
+    stats = quiz.get_question_stats(question_id)
+    assert (stats.num_answers, stats.num_correct, stats.choice_counts) == (3, 2, [0, 2, 1, 0])
+
+
+def test_second_answer_is_rejected_and_not_tallied(storage):
+    quiz, question_id = open_quiz(storage)
+
+    assert quiz.store_answer(question_id, "PLAYER1", 2, True)
+    assert quiz.store_answer(question_id, "PLAYER1", 3, False) is False
+
+    stats = quiz.get_question_stats(question_id)
+    assert (stats.num_answers, stats.num_correct, stats.choice_counts) == (1, 1, [0, 1, 0, 0])
+    assert quiz.get_answers()[str(question_id)] == {"PLAYER1": 2}
+
+
+def test_answer_and_tally_are_one_transaction(dynamodb_client):
+    quiz, question_id = open_quiz(DynamoDbStorage(client=dynamodb_client))
+
+    dynamodb_client.reset()
+    assert quiz.store_answer(question_id, "PLAYER1", 2, True)
+    assert dynamodb_client.calls == {"transact_write_items": 1}
+
+
+def test_player_cannot_answer_twice(session):
+    quiz_id, host_id = session.create_quiz()
+    session.add_player(quiz_id, "player")
+    question_id = session.ask(quiz_id, host_id)["question_id"]
+
+    first = session.send("player", "answer", quiz_id=quiz_id, question_id=question_id, answer=1)
+    second = session.send("player", "answer", quiz_id=quiz_id, question_id=question_id, answer=2)
+    assert first["result"] == "ok"
+    assert second["error_code"] == ErrorCode.AlreadyAnswered
+
+    stats = session.send("host", "get-question-stats", quiz_id=quiz_id)
+    assert stats["num_answers"] == 1
+    assert stats["choice_counts"] == [1, 0, 0, 0]
@@ -0,0 +1,104 @@
+import time
+import pytest
+from BaseMessageHandler import ErrorCode
+from Common import Config
+from DynamoDbStorage import DynamoDbStorage
+from InMemoryStorage import InMemoryStorage
+from conftest import QuizSession
+
+
+def play_quiz(session) -> tuple[str, str, str]:
+    quiz_id, host_id = session.create_quiz("Archived")
+    player_id = session.add_player(quiz_id, "player")
+    question_id = session.ask(quiz_id, host_id, answer=1)["question_id"]
+    session.send("player", "answer", quiz_id=quiz_id, question_id=question_id, answer=1)
+    session.send("host", "close-question", quiz_id=quiz_id)
+    return quiz_id, host_id, player_id
+
+
+def test_results_of_archived_quiz(session):
+    quiz_id, host_id, player_id = play_quiz(session)
+
+    assert session.send("host", "archive-quiz", quiz_id=quiz_id)["result"] == "ok"
+    assert session.comms.received("player")[-1] == {"type": "quiz-archived", "quiz_id": quiz_id}
+    # The live data is gone
+    response = session.send("host", "get-status", quiz_id=quiz_id)
+    assert response["error_code"] == ErrorCode.QuizNotFound
+
+    results = session.send("other", "get-results", quiz_id=quiz_id, client_id=host_id)
+    assert results["type"] == "results"
+    assert results["quiz_name"] == "Archived"
+    assert [question["answer"] for question in results["questions"].values()] == [1]
+    assert list(results["answers"].values()) == [{player_id: 1}]
+    assert [entry["client_id"] for entry in results["scores"]] == [player_id]
+
+    # Without root user, any client is root
+    session.send("root", "set-root-user", value="ROOT01")
+    response = session.send("player", "get-results", quiz_id=quiz_id, client_id=player_id)
+    assert response["error_code"] == ErrorCode.NotAllowed
+    for client_id in ["ROOT01", host_id]:
+        response = session.send("other", "get-results", quiz_id=quiz_id, client_id=client_id)
+        assert response["type"] == "results"
+
+
+def test_results_require_archive(session):
+    quiz_id, host_id, player_id = play_quiz(session)
+
+    response = session.send("host", "get-results", quiz_id=quiz_id, client_id=host_id)
+    assert response["error_code"] == ErrorCode.QuizNotFound
+
+
+def test_cannot_archive_while_question_is_open(session):
+    quiz_id, host_id = session.create_quiz()
+    session.ask(quiz_id, host_id)
+
+    response = session.send("host", "archive-quiz", quiz_id=quiz_id)
+    assert response["error_code"] == ErrorCode.NotAllowed
+
+
+def test_archive_file_stays_in_archive_directory(tmp_path):
+    storage = InMemoryStorage(archive_path=str(tmp_path))
+    assert storage.archive_file("QUIZ01") == str(tmp_path / "QUIZ01.quiz")
+    with pytest.raises(ValueError):
+        storage.archive_file("../QUIZ01")
+    assert storage.load_archive("../QUIZ01") is None
+
+
+def scan(client) -> list[dict]:
+    return client.scan(TableName=Config.MAIN_TABLE)["Items"]
+
+
+def test_quiz_items_expire(dynamodb_client):
+    session = QuizSession(DynamoDbStorage(client=dynamodb_client))
+    play_quiz(session)
+    session.send("player", "set-pool-question", question="Pooled?", choices=["A", "B"], answer=0)
+
+    now = time.time()
+    items = scan(dynamodb_client)
+    assert {item["PKEY"]["S"].split("#")[0] for item in items} >= {"Quiz", "Conn", "Answers"}
+    for item in items:
+        if not item["PKEY"]["S"].startswith("Globals"):
+            assert now < int(item["TTL"]["N"]) <= now + Config.QUIZ_RETENTION, item["PKEY"]
+
+    quiz_id = next(item["PKEY"]["S"] for item in items if item["PKEY"]["S"].startswith("Quiz#"))
+    session.send("host", "archive-quiz", quiz_id=quiz_id.split("#")[1])
+    (archive,) = [item for item in scan(dynamodb_client)
+                  if not item["PKEY"]["S"].startswith("Globals")]
+    assert archive["PKEY"]["S"] == f"Archive#{quiz_id.split('#')[1]}"
+    assert int(archive["TTL"]["N"]) > now + Config.QUIZ_RETENTION
+
+
+def test_expired_quiz_is_missing(dynamodb_client):
+    storage = DynamoDbStorage(client=dynamodb_client)
+    storage.create_quiz("QUIZ01", "HOST01", "Test")
+    assert DynamoDbStorage(client=dynamodb_client).quiz_access("QUIZ01").exists()
+
+    # DynamoDB may not have deleted the item yet
+    dynamodb_client.update_item(
+        TableName=Config.MAIN_TABLE,
+        Key={"PKEY": {"S": "Quiz#QUIZ01"}, "SKEY": {"S": "Instance"}},
+        UpdateExpression="SET #ttl = :ttl",
+        ExpressionAttributeNames={"#ttl": "TTL"},
+        ExpressionAttributeValues={":ttl": {"N": str(int(time.time()) - 1)}}
+    )
+    assert not DynamoDbStorage(client=dynamodb_client).quiz_access("QUIZ01").exists()
@@ -0,0 +1,76 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import threading
+import time
+from AsyncStorage import AsyncAccess, AsyncStorage
+from InMemoryStorage import InMemoryStorage
+
+
+def test_storage_calls_are_awaitable():
+    async def run():
+        db = AsyncStorage(InMemoryStorage())
+        quiz = await db.create_quiz("QUIZ01", "HOST01", "Test")
+        assert isinstance(quiz, AsyncAccess)
+        assert await db.create_quiz("QUIZ01", "HOST01", "Test") is None
+
+        # Only creates the wrapper, so need not be awaited
+        quiz = db.quiz_access("QUIZ01")
+        assert await quiz.exists()
+        await quiz.add_client("conn", "HOST01")
+
+        # Plain properties are returned as is, lazy ones are awaited
+        assert quiz.host_id == "HOST01"
+        assert await quiz.clients == {"conn": "HOST01"}
+        assert await db.globals_access().root_user is None
+
+    asyncio.run(run())
+
+
+class SlowStorage:
+    def __init__(self):
+        self.threads = []
+
+    def slow_call(self, value):
+        self.threads.append(threading.current_thread().name)
+        time.sleep(0.05)
+        return value
+
+
+def test_executor_runs_calls_concurrently():
+    async def run():
+        storage = SlowStorage()
+        db = AsyncStorage(storage, ThreadPoolExecutor(max_workers=4, thread_name_prefix="test"))
+
+        start = time.perf_counter()
+        assert await asyncio.gather(*(db.slow_call(i) for i in range(4))) == [0, 1, 2, 3]
+        assert time.perf_counter() - start < 0.15
+        assert all(name.startswith("test") for name in storage.threads)
+
+    asyncio.run(run())
+
+
+def test_calls_run_inline_without_executor():
+    async def run():
+        storage = SlowStorage()
+        await AsyncStorage(storage).slow_call(1)
+        assert storage.threads == [threading.current_thread().name]
+
+    asyncio.run(run())
+
+
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class ContextStorage:
+    def request(self):
+        return current_request.get()
+
+
+def test_executor_calls_see_context():
+    async def run():
+        db = AsyncStorage(ContextStorage(), ThreadPoolExecutor(max_workers=1))
+        current_request.set("request")
+        assert await db.request() == "request"
+
+    asyncio.run(run())
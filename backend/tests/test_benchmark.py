@@ -0,0 +1,43 @@
+import argparse
+import asyncio
+import pytest
+from Benchmark import Benchmark, percentile
+
+
+def test_percentile():
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 50) == 51
+    assert percentile(values, 99) == 100
+    assert percentile([3.0], 95) == 3
+
+
+def benchmark_args(mode, tmp_path, **overrides) -> argparse.Namespace:
+    return argparse.Namespace(**{
+        "mode": mode,
+        "storage": "memory",
+        "sqlite_path": str(tmp_path / "quiz.db"),
+        "players": 6,
+        "hosts": 2,
+        "rounds": 3,
+        "buffer_answers": False,
+        "batch_events": False,
+        "send_latency": 0,
+        **overrides
+    })
+
+
+@pytest.mark.parametrize("mode", ["direct", "websocket"])
+def test_runs_scenario(mode, tmp_path, capsys):
+    benchmark = Benchmark(benchmark_args(mode, tmp_path))
+    asyncio.run(benchmark.run())
+
+    stats = benchmark.stats
+    assert len(stats.latencies["answer"]) == 6 * 3
+    assert len(stats.broadcast_times["open-question"]) == 3
+    # Each question reached both hosts and all players
+    assert all(count == 2 + 6 for count in benchmark.num_received.values())
+    assert stats.storage_calls["quiz_access"] > 0
+
+    report = capsys.readouterr().out
+    for cmd in ["create-quiz", "register", "connect", "open-question", "answer", "get-leaderboard"]:
+        assert cmd in report
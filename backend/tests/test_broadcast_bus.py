@@ -0,0 +1,83 @@
+import asyncio
+import os
+import stat
+import pytest
+from BroadcastBus import (KIND_SEND, BroadcastBroker, BroadcastBus, encode_frame, read_frame,
+                          worker_of)
+from Common import ConnectionGone, Payload
+
+
+@pytest.mark.parametrize("message", ["text", b"\x00binary", Payload.from_message({"a": 1})])
+def test_frame_round_trip(message):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(encode_frame(KIND_SEND, 3, "3-ABCDEF", message))
+        return await read_frame(reader)
+
+    kind, worker_id, connection, data = asyncio.run(run())
+    assert (kind, worker_id, connection) == (KIND_SEND, 3, "3-ABCDEF")
+    assert data == message
+    assert type(data) is (bytes if isinstance(message, bytes) else str)
+
+
+def test_worker_of():
+    assert worker_of("12-ABCDEF") == 12
+    assert worker_of("ABCDEF") is None
+    assert worker_of("x-ABCDEF") is None
+
+
+def test_socket_is_private(tmp_path):
+    path = str(tmp_path / "bus.sock")
+    BroadcastBroker.listen(path).close()
+    # A socket left behind by an earlier run is replaced
+    sock = BroadcastBroker.listen(path)
+    sock.close()
+
+    mode = os.stat(path).st_mode
+    assert stat.S_ISSOCK(mode)
+    assert stat.S_IMODE(mode) == 0o600
+
+
+def test_other_file_is_not_replaced(tmp_path):
+    path = tmp_path / "bus.sock"
+    path.write_text("not a socket")
+
+    with pytest.raises(PermissionError):
+        BroadcastBroker.listen(str(path))
+    assert path.read_text() == "not a socket"
+
+
+def test_messages_are_relayed_between_workers(tmp_path):
+    path = str(tmp_path / "bus.sock")
+
+    async def run():
+        broker = asyncio.create_task(BroadcastBroker().serve(BroadcastBroker.listen(path)))
+        delivered = {0: [], 1: []}
+        buses = {}
+        for worker_id in delivered:
+            async def deliver(connection, message, worker_id=worker_id):
+                delivered[worker_id].append((connection, message))
+            buses[worker_id] = BroadcastBus(worker_id, path)
+            await buses[worker_id].connect(deliver)
+        # Worker 0 learns about worker 1 from the next announcement
+        while buses[0].workers != {0, 1}:
+            await asyncio.sleep(0.01)
+
+        connection = buses[1].create_connection_id()
+        assert worker_of(connection) == 1
+        await buses[0].publish(connection, "text")
+        await buses[0].publish(connection, b"binary")
+        while len(delivered[1]) < 2:
+            await asyncio.sleep(0.01)
+
+        with pytest.raises(ConnectionGone):
+            await buses[0].publish("2-ABCDEF", "unknown worker")
+        with pytest.raises(ConnectionGone):
+            await buses[0].publish(buses[0].create_connection_id(), "own connection")
+
+        broker.cancel()
+        return delivered
+
+    delivered = asyncio.run(run())
+    assert delivered[1] == [(delivered[1][0][0], "text"), (delivered[1][0][0], b"binary")]
+    assert delivered[0] == []
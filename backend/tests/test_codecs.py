@@ -0,0 +1,85 @@
+import asyncio
+import json
+import pytest
+import websockets
+from Codecs import CODECS, JSON
+from Common import Payload
+from LocalGateway import LocalGateway
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# msgpack is an optional dependency
+needs_msgpack = pytest.mark.skipif(msgpack is None, reason="msgpack is not installed")
+
+MESSAGE = {"type": "status", "num_players": 2, "name": "Quiz é", "scores": [1, 2.5, None]}
+
+
+def test_available_codecs():
+    assert CODECS["json"] is JSON
+    assert ("msgpack" in CODECS) == (msgpack is not None)
+
+
+@pytest.mark.parametrize("name", ["json", pytest.param("msgpack", marks=needs_msgpack)])
+def test_round_trip(name):
+    codec = CODECS[name]
+    data = codec.encode(MESSAGE)
+    assert isinstance(data, str if codec is JSON else bytes)
+    assert codec.decode(data) == MESSAGE
+
+
+def test_decode_payload():
+    assert JSON.decode(Payload(json.dumps(MESSAGE))) == MESSAGE
+
+
+@needs_msgpack
+def test_msgpack_decodes_json_text():
+    assert CODECS["msgpack"].decode(json.dumps(MESSAGE)) == MESSAGE
+
+
+@needs_msgpack
+def test_payload_is_encoded_once_per_codec():
+    payload = Payload.from_message(MESSAGE)
+    codec = CODECS["msgpack"]
+
+    assert payload.encoded(JSON) is payload
+    data = payload.encoded(codec)
+    assert payload.encoded(codec) is data
+    assert msgpack.unpackb(data) == MESSAGE
+
+
+def test_unknown_codec_falls_back_to_json():
+    gateway = LocalGateway("memory")
+    assert gateway.use_codec("socket", "xml") == "json"
+    assert "socket" not in gateway.codecs
+
+
+@needs_msgpack
+def test_msgpack_over_websockets():
+    async def run():
+        gateway = LocalGateway("memory")
+        async with websockets.serve(gateway.main, "localhost", 0) as server:
+            url = f"ws://localhost:{server.sockets[0].getsockname()[1]}"
+            async with websockets.connect(url) as websocket:
+                await websocket.send(json.dumps({"action": "create-quiz", "quiz_name": "Test"}))
+                response = json.loads(await websocket.recv())
+                quiz_id, host_id = response["quiz_id"], response["host_id"]
+
+                await websocket.send(json.dumps({"action": "connect", "quiz_id": quiz_id,
+                                                 "client_id": host_id, "codec": "msgpack"}))
+                # The response is already encoded by the requested codec
+                while isinstance(data := await websocket.recv(), str):
+                    pass
+                response = msgpack.unpackb(data)
+                assert response["type"] == "response"
+                assert response["codec"] == "msgpack"
+
+                # Requests may be sent in either encoding
+                await websocket.send(msgpack.packb({"action": "get-status"}))
+                while msgpack.unpackb(data := await websocket.recv())["type"] != "status":
+                    pass
+                assert isinstance(data, bytes)
+
+    asyncio.run(run())
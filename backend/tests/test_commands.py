@@ -0,0 +1,85 @@
+import pytest
+from BaseMessageHandler import ErrorCode, HandlerException
+from Commands import (COMMANDS, BoolField, Command, IntField, ListField, StrField,
+                      question_fields)
+from QuizMessageHandler import QuizMessageHandler
+
+
+def check_fails(field, value, error_code=ErrorCode.InvalidValue):
+    with pytest.raises(HandlerException) as e:
+        field.check(value)
+    assert e.value.error_code == error_code
+
+
+def test_str_field():
+    field = StrField("name", (2, 5))
+    assert field.check("abc") == "abc"
+    for value in ["a", "abcdef", " abc", "abc ", 12]:
+        check_fails(field, value)
+
+
+def test_int_field():
+    field = IntField("answer", (1, 4))
+    assert field.check(2) == 2
+    assert field.check("3") == 3
+    for value in [0, 5, "x", None]:
+        check_fails(field, value)
+
+
+def test_bool_field():
+    assert BoolField("flag").check(False) is False
+    check_fails(BoolField("flag"), 1)
+
+
+def test_list_field_checks_length_and_items():
+    field = ListField("choices", StrField("choice", (1, 3)), (2, 3))
+    assert field.check(["a", "b"]) == ["a", "b"]
+    for value in [["a"], ["a", "b", "c", "d"], ["a", "long"], "ab"]:
+        check_fails(field, value)
+
+
+def test_parse_omits_missing_optional_fields():
+    command = Command("handler", [IntField("required", (0, 9)),
+                                  IntField("optional", (0, 9), required=False)])
+    assert command.parse({"required": 1, "other": 2}) == {"required": 1}
+
+    with pytest.raises(HandlerException) as e:
+        command.parse({"optional": 1})
+    assert e.value.error_code == ErrorCode.MissingField
+
+
+def test_question_fields():
+    command = Command("handler", question_fields())
+    msg = {"question": "What is the answer?", "choices": ["A", "B", "C", "D"], "answer": 4}
+    assert command.parse(msg) == msg
+
+    with pytest.raises(HandlerException) as e:
+        command.parse({**msg, "choices": ["A", "B"]})
+    assert e.value.error_code == ErrorCode.InvalidValue
+
+
+def test_commands_have_handlers():
+    for name, command in COMMANDS.items():
+        assert callable(getattr(QuizMessageHandler, command.handler, None)), name
+
+
+def test_message_without_action(session):
+    assert session.send("conn", None)["error_code"] == ErrorCode.MissingField
+
+
+def test_unknown_command(session):
+    assert session.send("conn", "no-such-command")["error_code"] == ErrorCode.UnknownCommand
+
+
+def test_invalid_field_is_rejected(session):
+    quiz_id, _ = session.create_quiz()
+    response = session.send("player", "register", quiz_id=quiz_id, player_name="x")
+    assert response["error_code"] == ErrorCode.InvalidValue
+
+
+def test_role_is_checked(session):
+    quiz_id, _ = session.create_quiz()
+    session.add_player(quiz_id, "player")
+
+    response = session.send("player", "get-answers", quiz_id=quiz_id)
+    assert response["error_code"] == ErrorCode.NotAllowed
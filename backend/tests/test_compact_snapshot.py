@@ -0,0 +1,137 @@
+import json
+import zlib
+import pytest
+from Common import Config, Player, PlayerScore, Question
+from CompactSnapshot import CompactSnapshot
+from DynamoDbStorage import DynamoDbStorage
+from QuizCache import QuizCache
+
+QUESTION = Question("PLAYER1", "What is the answer?", ["A", "B", "C", "D"], 1)
+
+
+def test_encode_and_decode():
+    compact = CompactSnapshot(
+        version=3, question_id=2, event_seq=12, seq=4,
+        clients={"conn": "PLAYER1"},
+        players={"PLAYER1": Player("Name", "avatar")},
+        questions={1: QUESTION, 2: QUESTION},
+        answers={1: {"PLAYER1": 1}, 2: {}},
+        scores={"PLAYER1": PlayerScore(answer_score=1, question_score=2)},
+    )
+    assert CompactSnapshot.decode(compact.encode()) == compact
+
+
+def test_decode_snapshot_without_sequence_number():
+    data = zlib.compress(json.dumps({
+        "version": 1, "question_id": 1, "event_seq": 1, "clients": {}, "players": {},
+        "questions": {}, "answers": {}, "scores": {},
+    }).encode())
+    assert CompactSnapshot.decode(data).seq == 0
+
+
+def test_cache_keeps_newest_snapshot():
+    cache = QuizCache()
+    cache.put("QUIZ", 1)
+    newer = CompactSnapshot(version=1, question_id=4, event_seq=0, seq=2)
+    cache.put_compact("QUIZ", newer)
+    cache.put_compact("QUIZ", CompactSnapshot(version=1, question_id=4, event_seq=0, seq=1))
+    cache.put_compact("QUIZ", CompactSnapshot(version=1, question_id=2, event_seq=0, seq=3))
+    assert cache.get_compact("QUIZ") is newer
+
+
+@pytest.fixture(autouse=True)
+def snapshot_interval(monkeypatch):
+    monkeypatch.setattr(Config, "SNAPSHOT_INTERVAL", 2)
+
+
+def load(storage):
+    quiz = storage.quiz_access("QUIZ01")
+    assert quiz.exists()
+    return quiz
+
+
+def play_question(storage, answers: dict[str, int]) -> int:
+    question_id = load(storage).open_question(QUESTION)
+    quiz = load(storage)
+    for client_id, answer in answers.items():
+        assert quiz.store_answer(question_id, client_id, answer, answer == QUESTION.answer)
+    assert load(storage).close_question()
+    assert load(storage).score_question(question_id) is not None
+    return question_id
+
+
+def create_quiz(storage):
+    storage.create_quiz("QUIZ01", "HOST01", "Test")
+    for client_id in ["PLAYER1", "PLAYER2"]:
+        load(storage).add_or_update_player(client_id, client_id)
+        load(storage).add_client(f"conn-{client_id}", client_id)
+
+
+def test_snapshot_is_written_periodically(dynamodb_client):
+    storage = DynamoDbStorage(client=dynamodb_client)
+    create_quiz(storage)
+    play_question(storage, {"PLAYER1": 1})
+    assert load(storage).snapshot_seq == 0
+
+    play_question(storage, {"PLAYER1": 1, "PLAYER2": 2})
+    quiz = load(storage)
+    assert quiz.snapshot_seq == 1
+    compact = storage.cache.get_compact("QUIZ01")
+    assert (compact.question_id, compact.seq) == (2, 1)
+    assert compact.answers == {1: {"PLAYER1": 1}, 2: {"PLAYER1": 1, "PLAYER2": 2}}
+    assert compact.scores["PLAYER1"].answer_score == 2
+
+
+def test_cold_reads_use_snapshot(dynamodb_client):
+    storage = DynamoDbStorage(client=dynamodb_client)
+    create_quiz(storage)
+    for _ in range(2):
+        play_question(storage, {"PLAYER1": 1, "PLAYER2": 2})
+    question_id = play_question(storage, {"PLAYER2": 1})
+
+    # Another process, with an empty cache
+    quiz = load(DynamoDbStorage(client=dynamodb_client))
+    assert quiz.get_answers() == {
+        "1": {"PLAYER1": 1, "PLAYER2": 2},
+        "2": {"PLAYER1": 1, "PLAYER2": 2},
+        str(question_id): {"PLAYER2": 1},
+    }
+    assert set(quiz.get_questions()) == {"1", "2", str(question_id)}
+    assert quiz.get_scores()["PLAYER2"].answer_score == 1
+
+
+def test_late_answer_is_not_lost(dynamodb_client):
+    storage = DynamoDbStorage(client=dynamodb_client)
+    create_quiz(storage)
+    play_question(storage, {"PLAYER1": 1})
+    question_id = play_question(storage, {"PLAYER1": 1})
+
+    # Stored after the question was closed and the snapshot was written
+    assert load(storage).store_answer(question_id, "PLAYER2", 1, True)
+
+    for reader in [storage, DynamoDbStorage(client=dynamodb_client)]:
+        quiz = load(reader)
+        assert quiz.get_answers()[str(question_id)] == {"PLAYER1": 1, "PLAYER2": 1}
+        assert quiz.get_scores()["PLAYER2"].answer_score == 1
+
+
+def test_cached_snapshot_is_replaced_by_newer(dynamodb_client):
+    storage = DynamoDbStorage(client=dynamodb_client)
+    other_storage = DynamoDbStorage(client=dynamodb_client)
+    create_quiz(storage)
+    play_question(storage, {"PLAYER1": 1})
+    play_question(storage, {"PLAYER1": 1})
+    assert load(storage).get_answers()["2"] == {"PLAYER1": 1}
+
+    # Another process answers late, and rewrites the snapshot
+    assert load(other_storage).store_answer(2, "PLAYER2", 1, True)
+    load(other_storage).write_snapshot()
+    assert load(other_storage).snapshot_seq == 2
+
+    dynamodb_client.reset()
+    quiz = load(storage)
+    assert quiz.get_answers()["2"] == {"PLAYER1": 1, "PLAYER2": 1}
+    assert quiz.get_scores()["PLAYER2"].answer_score == 1
+    assert storage.cache.get_compact("QUIZ01").seq == 2
+    # The new snapshot holds all answers, so none had to be queried
+    assert "query" not in dynamodb_client.calls
@@ -0,0 +1,99 @@
+import asyncio
+from BaseMessageHandler import ErrorCode
+from Common import Config
+from ConnectionRegistry import ConnectionRegistry
+from DisconnectionHandler import DisconnectionHandler
+from DynamoDbStorage import DynamoDbStorage
+from conftest import QuizSession
+
+
+def test_registry_counts_connections():
+    registry = ConnectionRegistry()
+    registry.set("c1", "QUIZ1")
+    registry.set("c2", "QUIZ1")
+    registry.set("c2", "QUIZ2")
+    assert registry.get("c2") == "QUIZ2"
+    assert registry.is_connected("QUIZ1") and registry.is_connected("QUIZ2")
+
+    registry.remove("c1")
+    registry.remove("c1")
+    assert registry.get("c1") is None
+    assert not registry.is_connected("QUIZ1")
+
+
+def test_incomplete_registry_forgets_least_recently_used():
+    registry = ConnectionRegistry(max_size=2)
+    registry.set("c1", "QUIZ1")
+    registry.set("c2", "QUIZ2")
+    registry.get("c1")
+    registry.set("c3", "QUIZ3")
+    assert registry.get("c2") is None
+    assert not registry.is_connected("QUIZ2")
+    assert registry.get("c1") == "QUIZ1"
+
+    complete = ConnectionRegistry(complete=True, max_size=2)
+    for connection in ["c1", "c2", "c3"]:
+        complete.set(connection, "QUIZ1")
+    assert complete.get("c1") == "QUIZ1"
+
+
+def connection_links(client) -> list[str]:
+    items = client.scan(TableName=Config.MAIN_TABLE)["Items"]
+    return [item["PKEY"]["S"] for item in items if item["PKEY"]["S"].startswith("Conn#")]
+
+
+def test_complete_registry_needs_no_links(dynamodb_client, monkeypatch):
+    storage = DynamoDbStorage(client=dynamodb_client, link_connections=False)
+    registry = ConnectionRegistry(complete=True)
+    session = QuizSession(storage, registry=registry)
+    quiz_id, host_id = session.create_quiz()
+    session.add_player(quiz_id, "player")
+    assert connection_links(dynamodb_client) == []
+
+    def lookup(connection):
+        raise AssertionError(f"Looked up the quiz of {connection}")
+    monkeypatch.setattr(storage, "quiz_for_connection", lookup)
+
+    # The quiz ID can be omitted, as the registry knows the quiz of the connection
+    assert session.send("host", "get-status")["num_players_present"] == 1
+    asyncio.run(DisconnectionHandler(storage, session.comms, "player",
+                                     registry=registry).handle_disconnect())
+    assert session.comms.received("host")[-1]["type"] == "client-disconnected"
+    assert registry.get("player") is None
+    # Unknown connections of a complete registry are not connected to any quiz
+    assert session.send("other", "get-status")["error_code"] == ErrorCode.NotConnected
+
+
+def test_unlink_keeps_newer_link(dynamodb_client):
+    storage = DynamoDbStorage(client=dynamodb_client)
+    quiz = storage.create_quiz("QUIZ01", "HOST", "Test")
+    quiz.exists(roster=True)
+    quiz.add_client("c1", "P1")
+    assert storage.quiz_for_connection("c1") == "QUIZ01"
+
+    # The connection joins another quiz before its removal from the first quiz
+    other = storage.create_quiz("QUIZ02", "HOST2", "Other")
+    other.exists(roster=True)
+    other.add_client("c1", "P1")
+    quiz.remove_client("c1")
+    assert storage.quiz_for_connection("c1") == "QUIZ02"
+
+    other.remove_client("c1")
+    assert storage.quiz_for_connection("c1") is None
+    assert connection_links(dynamodb_client) == []
+
+
+def test_remove_reaped_connection(dynamodb_client):
+    storage = DynamoDbStorage(client=dynamodb_client)
+    quiz = storage.create_quiz("QUIZ01", "HOST", "Test")
+    quiz.exists(roster=True)
+    quiz.add_client("c1", "P1")
+
+    # Another container, with its own cache, reaps the connection first
+    reaper = DynamoDbStorage(client=dynamodb_client).quiz_access("QUIZ01")
+    reaper.exists(roster=True)
+    reaper.remove_clients(["c1"])
+    assert storage.quiz_for_connection("c1") is None
+
+    assert quiz.remove_client("c1") == {}
+    assert connection_links(dynamodb_client) == []
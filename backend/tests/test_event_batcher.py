@@ -0,0 +1,95 @@
+import asyncio
+from EventBatcher import EventBatcher
+from InMemoryStorage import InMemoryStorage
+from QuizMessageHandler import QuizMessageHandler
+from conftest import RecordingComms
+
+
+class SlowComms(RecordingComms):
+    """
+    Comms whose sends take a while, in the order given by their delays
+    """
+
+    def __init__(self, delays=()):
+        super().__init__()
+        self.delays = list(delays)
+
+    async def send(self, connection, message):
+        await asyncio.sleep(self.delays.pop(0) if self.delays else 0)
+        await super().send(connection, message)
+
+
+def test_events_are_sent_as_one_message_after_window():
+    async def run():
+        comms = RecordingComms()
+        batcher = EventBatcher(comms, window=0.02)
+        batcher.add("QUIZ", {"type": "first"}, ["host-1"])
+        batcher.add("QUIZ", {"type": "second"}, ["host-1", "host-2"])
+        assert comms.messages == []
+
+        await asyncio.sleep(0.05)
+        return comms
+
+    comms = asyncio.run(run())
+    expected = {"type": "events", "events": [{"type": "first"}, {"type": "second"}]}
+    assert sorted(comms.messages) == [("host-1", expected), ("host-2", expected)]
+
+
+def test_direct_message_does_not_overtake_pending_events():
+    async def run():
+        comms = SlowComms(delays=[0.02])
+        batcher = EventBatcher(comms, window=60)
+        batcher.add("QUIZ", {"type": "event"}, ["host"])
+
+        await batcher.flush_before("QUIZ", ["host"])
+        await comms.send("host", '{"type": "direct"}')
+        return comms
+
+    comms = asyncio.run(run())
+    assert [message["type"] for message in comms.received("host")] == ["events", "direct"]
+
+
+def test_batches_are_sent_in_order():
+    async def run():
+        comms = SlowComms(delays=[0.03, 0])
+        batcher = EventBatcher(comms, window=0.01)
+        batcher.add("QUIZ", {"type": "first"}, ["host"])
+        await asyncio.sleep(0.015)
+        batcher.add("QUIZ", {"type": "second"}, ["host"])
+
+        await asyncio.sleep(0.1)
+        return comms
+
+    comms = asyncio.run(run())
+    assert [message["events"][0]["type"] for message in comms.received("host")] == [
+        "first", "second"]
+
+
+def test_host_notifications_are_coalesced():
+    async def run():
+        db = InMemoryStorage()
+        comms = RecordingComms()
+        batcher = EventBatcher(comms, window=0.05)
+
+        async def send(connection, **msg):
+            await QuizMessageHandler(db, comms, connection, event_batcher=batcher).handle_message(
+                msg)
+            return comms.received(connection)[-1]
+
+        response = await send("host", action="create-quiz", quiz_name="Test")
+        quiz_id, host_id = response["quiz_id"], response["host_id"]
+        await send("host", action="connect", quiz_id=quiz_id, client_id=host_id,
+                   batch_events=True)
+        for i in range(3):
+            client_id = (await send(f"player-{i}", action="register", quiz_id=quiz_id,
+                                    player_name=f"Player {i}"))["client_id"]
+            await send(f"player-{i}", action="connect", quiz_id=quiz_id, client_id=client_id)
+        await asyncio.sleep(0.1)
+        return comms
+
+    comms = asyncio.run(run())
+    host_messages = comms.received("host")
+    assert [message["type"] for message in host_messages] == ["response", "response", "events"]
+    # Including the connect of the host itself
+    assert [event["type"] for event in host_messages[-1]["events"]] == [
+        "client-connected", *["player-registered", "client-connected"] * 3]
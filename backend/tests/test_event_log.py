@@ -0,0 +1,59 @@
+from Common import ClientRole
+
+
+def test_events_get_sequence_numbers(storage):
+    storage.create_quiz("QUIZ01", "HOST01", "Test")
+    quiz = storage.quiz_access("QUIZ01")
+    assert quiz.exists()
+
+    assert quiz.append_event({ClientRole.Host: {"type": "host-only"}}) == 1
+    assert quiz.append_event({ClientRole.Host: {"type": "both"},
+                              ClientRole.Player: {"type": "both", "stripped": True}}) == 2
+
+    assert quiz.get_events(0, ClientRole.Host) == [{"type": "host-only", "seq": 1},
+                                                   {"type": "both", "seq": 2}]
+    assert quiz.get_events(0, ClientRole.Player) == [{"type": "both", "stripped": True, "seq": 2}]
+    assert quiz.get_events(1, ClientRole.Host) == [{"type": "both", "seq": 2}]
+    assert quiz.get_events(2, ClientRole.Host) == []
+
+
+def test_broadcasts_carry_sequence_number(session):
+    quiz_id, host_id = session.create_quiz()
+    session.add_player(quiz_id, "player")
+
+    opened = session.ask(quiz_id, host_id)
+    closed = session.send("player", "get-question", quiz_id=quiz_id)
+    assert opened["seq"] > 0
+    # Direct replies are not events
+    assert "seq" not in closed
+
+
+def test_reconnecting_client_catches_up(session):
+    quiz_id, host_id = session.create_quiz()
+    player_id = session.add_player(quiz_id, "player")
+    seq = session.send("player-again", "connect", quiz_id=quiz_id, client_id=player_id)["seq"]
+
+    question_id = session.ask(quiz_id, host_id, answer=2)["question_id"]
+    session.send("player", "answer", quiz_id=quiz_id, question_id=question_id, answer=1)
+    session.send("host", "close-question", quiz_id=quiz_id)
+
+    sync = session.send("player-again", "sync-since", quiz_id=quiz_id, seq=seq)
+    assert [event["type"] for event in sync["events"]] == ["question-opened", "question-closed"]
+    # Players do not learn the solution, nor the answers of others
+    assert "answer" not in sync["events"][0]["question"]
+
+    # Hosts were also notified of the connect itself
+    host_sync = session.send("host", "sync-since", quiz_id=quiz_id, seq=seq)
+    assert [event["type"] for event in host_sync["events"]] == [
+        "client-connected", "question-opened", "answer-received", "question-closed"]
+    assert host_sync["events"][1]["question"]["answer"] == 2
+
+    # Covers the events that only the host received
+    assert sync["seq"] == host_sync["seq"] == host_sync["events"][-1]["seq"]
+    assert session.send("player-again", "sync-since", quiz_id=quiz_id,
+                        seq=sync["seq"])["events"] == []
+
+
+def test_sync_requires_joining(session):
+    quiz_id, _ = session.create_quiz()
+    assert session.send("stranger", "sync-since", quiz_id=quiz_id, seq=0)["result"] == "error"
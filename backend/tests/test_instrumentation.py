@@ -0,0 +1,84 @@
+import pytest
+from conftest import QuizSession
+from DynamoDbStorage import DynamoDbStorage
+import Instrumentation
+from Instrumentation import InstrumentedClient
+
+
+class FakeClient:
+    def __init__(self):
+        self.kwargs = []
+
+    def get_item(self, **kwargs):
+        self.kwargs.append(kwargs)
+        return {"ConsumedCapacity": {"CapacityUnits": 0.5},
+                "ResponseMetadata": {"HTTPHeaders": {"content-length": "120"}}}
+
+    def transact_write_items(self, **kwargs):
+        return {"ConsumedCapacity": [{"CapacityUnits": 2}, {"CapacityUnits": 4}]}
+
+    def put_item(self, **kwargs):
+        raise RuntimeError("Failed")
+
+    def get_paginator(self, name):
+        return name
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    Instrumentation.metrics.reset()
+    yield
+    Instrumentation.metrics.reset()
+
+
+def test_operations_are_attributed_to_request():
+    fake = FakeClient()
+    client = InstrumentedClient(fake)
+
+    with Instrumentation.request_scope() as request:
+        Instrumentation.set_action("connect")
+        client.get_item(Key={})
+        client.get_item(Key={})
+        client.transact_write_items(TransactItems=[])
+
+    assert fake.kwargs[0]["ReturnConsumedCapacity"] == "TOTAL"
+    assert request.action == "connect"
+    get_item = request.operations["get_item"]
+    assert (get_item.calls, get_item.capacity, get_item.bytes) == (2, 1.0, 240)
+    assert request.operations["transact_write_items"].capacity == 6
+    assert request.total().calls == 3
+
+    summary = Instrumentation.metrics.dump()["connect"]
+    assert summary["requests"] == 1
+    assert summary["calls_per_request"] == 3
+    assert summary["capacity_per_request"] == 7
+
+
+def test_failed_operations_are_counted():
+    client = InstrumentedClient(FakeClient())
+
+    with Instrumentation.request_scope() as request:
+        with pytest.raises(RuntimeError):
+            client.put_item(Item={})
+
+    assert (request.operations["put_item"].calls, request.operations["put_item"].errors) == (1, 1)
+
+
+def test_operations_outside_requests_are_background():
+    InstrumentedClient(FakeClient()).get_item(Key={})
+
+    assert Instrumentation.metrics.dump()["background"]["requests"] == 1
+
+
+def test_other_methods_are_not_instrumented():
+    assert InstrumentedClient(FakeClient()).get_paginator("query") == "query"
+
+
+def test_storage_operations_per_command(dynamodb_client):
+    session = QuizSession(DynamoDbStorage(client=InstrumentedClient(dynamodb_client)))
+    quiz_id, _ = session.create_quiz()
+    session.send("host", "get-status", quiz_id=quiz_id)
+
+    metrics = Instrumentation.metrics.dump()
+    assert {"create-quiz", "connect", "get-status"} <= set(metrics)
+    assert metrics["get-status"]["operations"]["get_item"]["calls"] >= 1
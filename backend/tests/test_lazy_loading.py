@@ -0,0 +1,59 @@
+from conftest import QuizSession
+from DynamoDbStorage import DynamoDbStorage
+
+
+def create_quiz(storage):
+    storage.create_quiz("QUIZ01", "HOST01", "Test")
+    quiz = storage.quiz_access("QUIZ01")
+    assert quiz.exists()
+    quiz.add_client("conn-host", "HOST01")
+    quiz.add_or_update_player("PLAYER", "Name")
+
+
+def cold_quiz(dynamodb_client, roster):
+    # A new storage has an empty cache, like a new Lambda container
+    quiz = DynamoDbStorage(client=dynamodb_client).quiz_access("QUIZ01")
+    dynamodb_client.reset()
+    assert quiz.exists(roster=roster)
+    return quiz
+
+
+def test_roster_collections_load_when_accessed(dynamodb_client):
+    create_quiz(DynamoDbStorage(client=dynamodb_client))
+
+    quiz = cold_quiz(dynamodb_client, roster=False)
+    assert dynamodb_client.calls == {"get_item": 1}
+
+    assert list(quiz.players) == ["PLAYER"]
+    assert dynamodb_client.calls["query"] == 1
+    assert quiz.clients == {"conn-host": "HOST01"}
+    assert dynamodb_client.calls["query"] == 2
+
+
+def test_full_roster_loads_with_one_query(dynamodb_client):
+    create_quiz(DynamoDbStorage(client=dynamodb_client))
+
+    quiz = cold_quiz(dynamodb_client, roster=True)
+    assert list(quiz.players) == ["PLAYER"]
+    assert quiz.clients == {"conn-host": "HOST01"}
+    assert dynamodb_client.calls == {"get_item": 1, "query": 1}
+
+
+def test_instance_command_does_not_load_roster(dynamodb_client):
+    create_quiz(DynamoDbStorage(client=dynamodb_client))
+
+    session = QuizSession(DynamoDbStorage(client=dynamodb_client))
+    dynamodb_client.reset()
+    # The host may ask for the status without connecting
+    status = session.send("conn", "get-status", quiz_id="QUIZ01", client_id="HOST01")
+    assert status["num_players"] == 1
+    assert "query" not in dynamodb_client.calls
+
+
+def test_lazy_roster(storage):
+    create_quiz(storage)
+
+    quiz = storage.quiz_access("QUIZ01")
+    assert quiz.exists(roster=False)
+    assert quiz.clients == {"conn-host": "HOST01"}
+    assert list(quiz.players) == ["PLAYER"]
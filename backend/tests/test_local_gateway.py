@@ -0,0 +1,105 @@
+import asyncio
+import json
+import websockets
+from LocalGateway import LocalGateway
+
+
+def test_requests_for_a_quiz_are_serialized():
+    async def run():
+        gateway = LocalGateway("memory")
+        running = {"QUIZ1": 0, "QUIZ2": 0}
+        overlapping = []
+
+        async def request(quiz_id):
+            async with gateway.serialized(quiz_id):
+                running[quiz_id] += 1
+                overlapping.append(dict(running))
+                await asyncio.sleep(0.01)
+                running[quiz_id] -= 1
+
+        await asyncio.gather(*(request(quiz_id) for quiz_id in ["QUIZ1", "QUIZ2"] * 3))
+        return overlapping
+
+    overlapping = asyncio.run(run())
+    assert max(counts["QUIZ1"] for counts in overlapping) == 1
+    # Requests for different quizzes do interleave
+    assert {"QUIZ1": 1, "QUIZ2": 1} in overlapping
+
+
+def test_actor_is_kept_while_connected():
+    async def run():
+        gateway = LocalGateway("memory")
+        async with gateway.serialized("QUIZ1") as actor:
+            assert actor.quiz_id == "QUIZ1"
+        assert "QUIZ1" not in gateway.actors
+
+        gateway.registry.set("socket", "QUIZ1")
+        async with gateway.serialized("QUIZ1") as actor:
+            pass
+        assert gateway.actors["QUIZ1"] is actor
+
+        gateway.registry.remove("socket")
+        async with gateway.serialized("QUIZ1"):
+            pass
+        assert "QUIZ1" not in gateway.actors
+
+    asyncio.run(run())
+
+
+def test_quiz_for_message():
+    async def run():
+        gateway = LocalGateway("memory")
+        gateway.registry.set("socket", "QUIZ1")
+        resolve = gateway.quiz_for_message
+
+        assert await resolve("socket", {"action": "get-status", "quiz_id": "QUIZ2"}) == "QUIZ2"
+        assert await resolve("socket", {"action": "get-status"}) == "QUIZ1"
+        assert await resolve("other", {"action": "get-status"}) is None
+        assert await resolve("socket", {"action": "create-quiz"}) is None
+        assert await resolve("socket", {"action": "no-such-command"}) is None
+
+        # The default quiz is used when registering without quiz ID
+        await gateway.db.globals_access().set_default_quiz_id("QUIZ3")
+        assert await resolve("socket", {"action": "register"}) == "QUIZ3"
+
+    asyncio.run(run())
+
+
+async def receive(websocket, message_type) -> dict:
+    while (message := json.loads(await websocket.recv()))["type"] != message_type:
+        pass
+    return message
+
+
+async def request(websocket, reply_type="response", **msg) -> dict:
+    await websocket.send(json.dumps(msg))
+    return await receive(websocket, reply_type)
+
+
+def test_clients_over_websockets():
+    async def run():
+        gateway = LocalGateway("memory")
+        async with websockets.serve(gateway.main, "localhost", 0) as server:
+            url = f"ws://localhost:{server.sockets[0].getsockname()[1]}"
+            async with websockets.connect(url) as host, websockets.connect(url) as player:
+                response = await request(host, action="create-quiz", quiz_name="Test")
+                quiz_id, host_id = response["quiz_id"], response["host_id"]
+                await request(host, action="connect", quiz_id=quiz_id, client_id=host_id)
+
+                response = await request(player, action="register", quiz_id=quiz_id,
+                                         player_name="Player")
+                await request(player, action="connect", quiz_id=quiz_id,
+                              client_id=response["client_id"])
+                assert quiz_id in gateway.actors
+
+                # The quiz ID can be omitted once connected
+                status = await request(host, "status", action="get-status")
+                assert status["num_players_present"] == 1
+
+                await player.close()
+                event = await receive(host, "client-disconnected")
+                assert event["client_id"] == response["client_id"]
+
+        assert quiz_id not in gateway.actors
+
+    asyncio.run(run())
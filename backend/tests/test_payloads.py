@@ -0,0 +1,57 @@
+from Codecs import JSON
+from Common import Payload
+from conftest import QuizSession, RecordingComms
+
+
+class CountingCodec:
+    name = "counting"
+
+    def __init__(self):
+        self.num_encoded = 0
+
+    def encode(self, message):
+        self.num_encoded += 1
+        return JSON.encode(message).encode()
+
+
+def test_payload_is_serialized_once_per_codec():
+    payload = Payload.from_message({"type": "test", "value": 1})
+    assert JSON.decode(payload) == {"type": "test", "value": 1}
+    assert payload.encoded(JSON) is payload
+    assert payload.data == payload.encode()
+
+    codec = CountingCodec()
+    encoded = payload.encoded(codec)
+    assert payload.encoded(codec) is encoded
+    assert codec.num_encoded == 1
+
+
+def test_payload_from_string_decodes_message():
+    assert Payload('{"type": "test"}').message == {"type": "test"}
+
+
+class PayloadComms(RecordingComms):
+    def __init__(self):
+        super().__init__()
+        self.payloads = {}
+
+    async def send(self, connection, message):
+        self.payloads[connection] = message
+        await super().send(connection, message)
+
+
+def test_each_role_gets_one_payload(storage):
+    session = QuizSession(storage)
+    session.comms = PayloadComms()
+    quiz_id, host_id = session.create_quiz()
+    session.send("host-2", "connect", quiz_id=quiz_id, client_id=host_id)
+    for i in range(3):
+        session.add_player(quiz_id, f"player-{i}")
+
+    session.ask(quiz_id, host_id, answer=3)
+
+    payloads = session.comms.payloads
+    assert payloads["host"] is payloads["host-2"]
+    assert payloads["player-0"] is payloads["player-1"] is payloads["player-2"]
+    assert payloads["host"].message["question"]["answer"] == 3
+    assert "answer" not in payloads["player-0"].message["question"]
@@ -0,0 +1,46 @@
+from Common import Config
+from DynamoDbStorage import query_items
+
+
+def put_items(client, pkey, skeys):
+    for skey in skeys:
+        client.put_item(TableName=Config.MAIN_TABLE,
+                        Item={"PKEY": {"S": pkey}, "SKEY": {"S": skey}, "Value": {"N": "1"}})
+
+
+def skeys(items) -> list[str]:
+    return [item["SKEY"]["S"] for item in items]
+
+
+def test_follows_pages(dynamodb_client):
+    put_items(dynamodb_client, "Answers#QUIZ01", [f"1#PLAYER{i}" for i in range(5)])
+
+    dynamodb_client.reset()
+    items = list(query_items(dynamodb_client, "Answers#QUIZ01", Limit=2))
+    assert skeys(items) == [f"1#PLAYER{i}" for i in range(5)]
+    assert dynamodb_client.calls["query"] == 3
+
+
+def test_pages_are_retrieved_on_demand(dynamodb_client):
+    put_items(dynamodb_client, "Answers#QUIZ01", [f"1#PLAYER{i}" for i in range(5)])
+
+    dynamodb_client.reset()
+    items = query_items(dynamodb_client, "Answers#QUIZ01", Limit=2)
+    assert dynamodb_client.calls == {}
+    next(items)
+    next(items)
+    assert dynamodb_client.calls["query"] == 1
+
+
+def test_prefix_and_after(dynamodb_client):
+    put_items(dynamodb_client, "Answers#QUIZ01", ["1#A", "1#B", "2#A", "2#B"])
+
+    assert skeys(query_items(dynamodb_client, "Answers#QUIZ01", prefix="2#")) == ["2#A", "2#B"]
+    assert skeys(query_items(dynamodb_client, "Answers#QUIZ01", after="1#B")) == ["2#A", "2#B"]
+
+
+def test_projection(dynamodb_client):
+    put_items(dynamodb_client, "Answers#QUIZ01", ["1#A"])
+
+    items = list(query_items(dynamodb_client, "Answers#QUIZ01", projection=["SKEY", "Value"]))
+    assert items == [{"SKEY": {"S": "1#A"}, "Value": {"N": "1"}}]
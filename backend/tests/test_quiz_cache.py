@@ -0,0 +1,93 @@
+from Common import Question
+from DynamoDbStorage import DynamoDbStorage
+from QuizCache import QuizCache
+
+
+def test_snapshot_only_returned_for_its_version():
+    cache = QuizCache()
+    snapshot = cache.put("QUIZ", 3, {"Conn#": []})
+
+    assert cache.get("QUIZ", 3) is snapshot
+    assert cache.get("QUIZ", 4) is None
+    assert cache.get("OTHER", 3) is None
+
+
+def test_invalidated_snapshot_is_not_returned():
+    cache = QuizCache()
+    cache.put("QUIZ", 3)
+    cache.invalidate("QUIZ")
+
+    assert cache.get("QUIZ", 3) is None
+    assert "QUIZ" in cache
+
+
+def test_questions_survive_a_new_version():
+    cache = QuizCache()
+    cache.put("QUIZ", 1)
+    question = Question("AUTHOR", "What is the answer?", ["A", "B", "C", "D"], 1)
+    cache.put_question("QUIZ", 1, question)
+
+    cache.put("QUIZ", 2)
+    assert cache.get_question("QUIZ", 1) == question
+
+
+def test_least_recently_used_quiz_is_evicted():
+    cache = QuizCache(max_size=2)
+    cache.put("QUIZ1", 1)
+    cache.put("QUIZ2", 1)
+    cache.get("QUIZ1", 1)
+    cache.put("QUIZ3", 1)
+
+    assert "QUIZ1" in cache
+    assert "QUIZ2" not in cache
+    assert "QUIZ3" in cache
+
+
+def load_quiz(storage, quiz_id):
+    quiz = storage.quiz_access(quiz_id)
+    assert quiz.exists()
+    return quiz
+
+
+def test_cached_roster_avoids_partition_query(dynamodb_client):
+    storage = DynamoDbStorage(client=dynamodb_client)
+    storage.create_quiz("QUIZ01", "HOST01", "Test")
+    load_quiz(storage, "QUIZ01").add_client("conn-host", "HOST01")
+    load_quiz(storage, "QUIZ01")
+
+    dynamodb_client.reset()
+    quiz = load_quiz(storage, "QUIZ01")
+    assert quiz.clients == {"conn-host": "HOST01"}
+    assert "query" not in dynamodb_client.calls
+
+
+def test_roster_change_by_other_process_is_seen(dynamodb_client):
+    storage = DynamoDbStorage(client=dynamodb_client)
+    # Another Lambda container, with its own cache
+    other_storage = DynamoDbStorage(client=dynamodb_client)
+    storage.create_quiz("QUIZ01", "HOST01", "Test")
+    assert load_quiz(storage, "QUIZ01").clients == {}
+
+    load_quiz(other_storage, "QUIZ01").add_client("conn-player", "PLAYER")
+    load_quiz(other_storage, "QUIZ01").add_or_update_player("PLAYER", "Player")
+
+    quiz = load_quiz(storage, "QUIZ01")
+    assert quiz.clients == {"conn-player": "PLAYER"}
+    assert list(quiz.players) == ["PLAYER"]
+
+
+def test_question_state_keeps_cached_roster(dynamodb_client):
+    storage = DynamoDbStorage(client=dynamodb_client)
+    storage.create_quiz("QUIZ01", "HOST01", "Test")
+    load_quiz(storage, "QUIZ01").add_client("conn-host", "HOST01")
+    roster_version = load_quiz(storage, "QUIZ01").roster_version
+
+    question = Question("HOST01", "What is the answer?", ["A", "B", "C", "D"], 1)
+    load_quiz(storage, "QUIZ01").open_question(question)
+    load_quiz(storage, "QUIZ01").close_question()
+
+    dynamodb_client.reset()
+    quiz = load_quiz(storage, "QUIZ01")
+    assert quiz.roster_version == roster_version
+    assert quiz.clients == {"conn-host": "HOST01"}
+    assert "query" not in dynamodb_client.calls
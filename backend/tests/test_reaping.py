@@ -0,0 +1,35 @@
+def test_gone_connections_are_removed_on_broadcast(session):
+    quiz_id, host_id = session.create_quiz()
+    player_ids = [session.add_player(quiz_id, f"player-{i}") for i in range(3)]
+    session.comms.gone.update({"player-1", "player-2"})
+
+    messages = session.call("host", "open-question", quiz_id=quiz_id, author_id=host_id,
+                            question="What is the answer?", choices=["A", "B", "C", "D"],
+                            answer=1)
+
+    disconnected = {message["client_id"] for message in messages
+                    if message["type"] == "client-disconnected"}
+    assert disconnected == set(player_ids[1:])
+
+    status = session.send("host", "get-status", quiz_id=quiz_id)
+    assert status["num_players"] == 3
+    assert status["num_players_present"] == 1
+
+    players = session.send("host", "get-clients", quiz_id=quiz_id)["players"]
+    assert {client_id: player["connections"] for client_id, player in players.items()} == {
+        player_ids[0]: ["player-0"],
+        player_ids[1]: [],
+        player_ids[2]: [],
+    }
+
+
+def test_reaped_player_can_reconnect(session):
+    quiz_id, host_id = session.create_quiz()
+    player_id = session.add_player(quiz_id, "player")
+    session.comms.gone.add("player")
+    session.ask(quiz_id, host_id)
+    assert session.send("host", "get-status", quiz_id=quiz_id)["num_players_present"] == 0
+
+    response = session.send("player-again", "connect", quiz_id=quiz_id, client_id=player_id)
+    assert response["result"] == "ok"
+    assert session.send("host", "get-status", quiz_id=quiz_id)["num_players_present"] == 1
@@ -0,0 +1,113 @@
+from Common import Player, PlayerScore
+import Scoring
+
+
+def test_question_score_peaks_at_five_out_of_eight_correct():
+    assert Scoring.question_score(num_correct=5, num_answers=8) == 5
+    assert Scoring.question_score(num_correct=8, num_answers=8) == 0
+    assert Scoring.question_score(num_correct=2, num_answers=8) == 0
+    assert Scoring.question_score(num_correct=6, num_answers=8) == 3
+
+
+def test_question_score_with_too_few_answers_is_expected_score():
+    assert Scoring.question_score(num_correct=0, num_answers=4) == 2
+    assert Scoring.question_score(num_correct=4, num_answers=4) == 2
+
+
+def test_round_half_up_matches_javascript():
+    assert Scoring.round_half_up(2.5) == 3
+    assert Scoring.round_half_up(3.5) == 4
+    assert Scoring.round_half_up(2.49) == 2
+
+
+def test_leaderboard_ranks_by_total_then_answer_score():
+    players = {client_id: Player(f"Player {client_id}") for client_id in ["A", "B", "C", "D"]}
+    scores = {
+        "A": PlayerScore(answer_score=1, question_score=3),
+        "B": PlayerScore(answer_score=4, question_score=0),
+        "C": PlayerScore(answer_score=5, question_score=1),
+    }
+
+    ranking = Scoring.leaderboard(players, scores)
+    assert [entry["client_id"] for entry in ranking] == ["C", "B", "A", "D"]
+    assert ranking[0] == {
+        "client_id": "C",
+        "name": "Player C",
+        "avatar": None,
+        "answer_score": 5,
+        "question_score": 1,
+        "total_score": 6,
+    }
+    assert ranking[-1]["total_score"] == 0
+
+    assert Scoring.leaderboard(players, scores, limit=2) == ranking[:2]
+
+
+def play_question(session, quiz_id, author_id, answers: dict[str, int]):
+    """
+    Asks a question with solution 1, and has each connection give its answer.
+    """
+    question_id = session.ask(quiz_id, author_id, answer=1)["question_id"]
+    for connection, answer in answers.items():
+        response = session.send(connection, "answer", quiz_id=quiz_id, question_id=question_id,
+                                answer=answer)
+        assert response["result"] == "ok"
+    session.send("host", "close-question", quiz_id=quiz_id)
+    return question_id
+
+
+def test_leaderboard_of_quiz(session):
+    quiz_id, _ = session.create_quiz()
+    author_id = session.add_player(quiz_id, "author")
+    player_ids = {f"player-{i}": session.add_player(quiz_id, f"player-{i}") for i in range(5)}
+
+    # Three out of five correct
+    play_question(session, quiz_id, author_id,
+                  {"player-0": 1, "player-1": 1, "player-2": 1, "player-3": 2, "player-4": 3})
+
+    ranking = session.send("host", "get-leaderboard", quiz_id=quiz_id)["scores"]
+    totals = {entry["client_id"]: entry["total_score"] for entry in ranking}
+    assert ranking[0]["client_id"] == author_id
+    assert totals == {
+        author_id: Scoring.question_score(3, 5),
+        **{player_ids[f"player-{i}"]: 1 for i in range(3)},
+        **{player_ids[f"player-{i}"]: 0 for i in range(3, 5)},
+    }
+
+    top = session.send("host", "get-leaderboard", quiz_id=quiz_id, limit=2)["scores"]
+    assert top == ranking[:2]
+
+
+def test_author_gets_score_of_most_recent_question(session):
+    quiz_id, _ = session.create_quiz()
+    author_id = session.add_player(quiz_id, "author")
+    for i in range(5):
+        session.add_player(quiz_id, f"player-{i}")
+
+    play_question(session, quiz_id, author_id,
+                  {"player-0": 1, "player-1": 1, "player-2": 1, "player-3": 2, "player-4": 3})
+    # All correct, which scores nothing
+    play_question(session, quiz_id, author_id, {f"player-{i}": 1 for i in range(5)})
+
+    ranking = session.send("host", "get-leaderboard", quiz_id=quiz_id)["scores"]
+    author = next(entry for entry in ranking if entry["client_id"] == author_id)
+    assert author["question_score"] == 0
+
+
+def test_question_stats(session):
+    quiz_id, _ = session.create_quiz()
+    author_id = session.add_player(quiz_id, "author")
+    for i in range(4):
+        session.add_player(quiz_id, f"player-{i}")
+
+    question_id = play_question(session, quiz_id, author_id,
+                                {"player-0": 1, "player-1": 2, "player-2": 2, "player-3": 4})
+
+    stats = session.send("host", "get-question-stats", quiz_id=quiz_id, question_id=question_id)
+    assert stats == {
+        "type": "question-stats",
+        "question_id": question_id,
+        "num_answers": 4,
+        "num_correct": 1,
+        "choice_counts": [1, 2, 0, 1],
+    }
@@ -0,0 +1,60 @@
+from Common import ClientRole, Question
+from SqliteStorage import SqliteStorage
+
+
+def load(storage, quiz_id="QUIZ01"):
+    quiz = storage.quiz_access(quiz_id)
+    assert quiz.exists()
+    return quiz
+
+
+def test_state_survives_reopening(tmp_path):
+    path = str(tmp_path / "quiz.db")
+    storage = SqliteStorage(path)
+    storage.create_quiz("QUIZ01", "HOST01", "Test")
+    load(storage).add_or_update_player("PLAYER", "Name")
+    load(storage).open_question(Question("PLAYER", "What is the answer?", ["A", "B"], 1))
+    storage.connection.close()
+
+    quiz = load(SqliteStorage(path))
+    assert list(quiz.players) == ["PLAYER"]
+    assert (quiz.question_id, quiz.is_question_open) == (1, True)
+
+
+def test_uses_write_ahead_log(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "quiz.db"))
+    assert storage.fetchone("PRAGMA journal_mode")[0] == "wal"
+
+
+def test_workers_share_database(tmp_path):
+    path = str(tmp_path / "quiz.db")
+    worker1, worker2 = SqliteStorage(path), SqliteStorage(path)
+    worker1.create_quiz("QUIZ01", "HOST01", "Test")
+    load(worker1).add_client("conn-host", "HOST01")
+
+    assert load(worker2).clients == {"conn-host": "HOST01"}
+    assert worker2.create_quiz("QUIZ01", "HOST02", "Other") is None
+
+
+def test_event_seq_is_kept_on_quiz(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "quiz.db"))
+    storage.create_quiz("QUIZ01", "HOST01", "Test")
+    storage.create_quiz("QUIZ02", "HOST02", "Other")
+    assert load(storage).event_seq == 0
+
+    assert load(storage).append_event({ClientRole.Host: {"type": "first"}}) == 1
+    assert load(storage).append_event({ClientRole.Player: {"type": "second"}}) == 2
+    assert load(storage, "QUIZ02").append_event({ClientRole.Host: {"type": "other"}}) == 1
+
+    assert load(storage).event_seq == 2
+    row = storage.fetchone("SELECT event_seq FROM quizzes WHERE quiz_id = ?", ("QUIZ01", ))
+    assert row["event_seq"] == 2
+
+
+def test_connections_are_not_linked_when_disabled(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "quiz.db"), link_connections=False)
+    storage.create_quiz("QUIZ01", "HOST01", "Test")
+    load(storage).add_client("conn-host", "HOST01")
+
+    assert load(storage).clients == {"conn-host": "HOST01"}
+    assert storage.quiz_for_connection("conn-host") is None
@@ -0,0 +1,51 @@
+import json
+import logging
+import time
+from StartupProfile import StartupProfile
+
+
+def test_nested_phase_is_only_counted_once():
+    profile = StartupProfile(enabled=True)
+    with profile.phase("outer"):
+        time.sleep(0.02)
+        with profile.phase("inner"):
+            time.sleep(0.05)
+
+    assert 0.02 <= profile.phases["outer"] < 0.05
+    assert profile.phases["inner"] >= 0.05
+
+
+def test_phases_are_reported_once(caplog):
+    profile = StartupProfile(enabled=True)
+    with profile.phase("imports"):
+        pass
+
+    with caplog.at_level(logging.INFO, logger="backend.metrics"):
+        profile.report()
+        profile.report()
+
+    assert len(caplog.records) == 1
+    startup = json.loads(caplog.records[0].getMessage())["startup"]
+    assert set(startup) == {"total", "imports"}
+
+    # Later requests are not profiled
+    with profile.phase("first_request"):
+        pass
+    assert "first_request" not in profile.phases
+
+
+def test_disabled_profile_records_nothing(caplog):
+    profile = StartupProfile(enabled=False)
+    with profile.phase("imports"):
+        pass
+
+    with caplog.at_level(logging.INFO, logger="backend.metrics"):
+        profile.report()
+    assert profile.phases == {}
+    assert caplog.records == []
+
+
+def test_storage_is_created_on_first_use():
+    import WebSocketHandler
+
+    assert WebSocketHandler.storage.cache_info().currsize == 0
@@ -0,0 +1,45 @@
+from conftest import QuizSession
+from DynamoDbStorage import DynamoDbStorage
+
+
+def status(session, quiz_id) -> dict:
+    return session.send("host", "get-status", quiz_id=quiz_id)
+
+
+def test_counters_follow_roster_and_pool(session):
+    quiz_id, host_id = session.create_quiz()
+    session.send("host-2", "connect", quiz_id=quiz_id, client_id=host_id)
+    player_id = session.add_player(quiz_id, "player")
+    session.add_player(quiz_id, "other")
+    # Registering again only updates the player
+    session.send("player", "register", quiz_id=quiz_id, client_id=player_id, player_name="New")
+    for question in ["What is the answer?", "What is the question?"]:
+        session.send("player", "set-pool-question", quiz_id=quiz_id, question=question,
+                     choices=["A", "B", "C", "D"], answer=1)
+
+    assert {key: value for key, value in status(session, quiz_id).items()
+            if key.startswith("num_")} == {
+        "num_host_connections": 2,
+        "num_players": 2,
+        "num_players_present": 2,
+        "num_pool_questions": 1,
+    }
+
+    session.call("other", "disconnect", quiz_id=quiz_id)
+    session.call("host-2", "disconnect", quiz_id=quiz_id)
+    counts = status(session, quiz_id)
+    assert (counts["num_host_connections"], counts["num_players"],
+            counts["num_players_present"]) == (1, 2, 1)
+
+
+def test_status_is_single_item_read(dynamodb_client):
+    session = QuizSession(DynamoDbStorage(client=dynamodb_client))
+    quiz_id, host_id = session.create_quiz()
+    session.add_player(quiz_id, "player")
+
+    # Also when the quiz is not cached
+    session = QuizSession(DynamoDbStorage(client=dynamodb_client))
+    dynamodb_client.reset()
+    response = session.send("conn", "get-status", quiz_id=quiz_id, client_id=host_id)
+    assert response["num_players"] == 1
+    assert dynamodb_client.calls == {"get_item": 1}
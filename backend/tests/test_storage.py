@@ -0,0 +1,104 @@
+import pytest
+from Common import Player, Question, QuizCounts
+import DynamoDbStorage
+import InMemoryStorage
+import SqliteStorage
+
+# Only used within the DynamoDB storage, e.g. by its snapshots and caches
+DYNAMODB_ONLY = {"expires_at", "roster_version", "snapshot_seq", "write_snapshot"}
+
+
+def public_attributes(cls) -> set[str]:
+    return {name for name in dir(cls) if not name.startswith("_")}
+
+
+@pytest.mark.parametrize("reference, cls", [
+    (DynamoDbStorage.DynamoDbStorage, InMemoryStorage.InMemoryStorage),
+    (DynamoDbStorage.Globals, InMemoryStorage.InMemoryGlobals),
+    (DynamoDbStorage.DynamoDbQuiz, InMemoryStorage.InMemoryQuiz),
+    (DynamoDbStorage.DynamoDbStorage, SqliteStorage.SqliteStorage),
+    (DynamoDbStorage.Globals, SqliteStorage.SqliteGlobals),
+    (DynamoDbStorage.DynamoDbQuiz, SqliteStorage.SqliteQuiz),
+])
+def test_interface_matches_dynamodb(reference, cls):
+    assert public_attributes(reference) - DYNAMODB_ONLY <= public_attributes(cls)
+
+
+def load(storage, quiz_id="QUIZ01"):
+    quiz = storage.quiz_access(quiz_id)
+    assert quiz.exists()
+    return quiz
+
+
+def test_quiz_is_only_created_once(storage):
+    assert storage.create_quiz("QUIZ01", "HOST01", "Test") is not None
+    assert storage.create_quiz("QUIZ01", "HOST02", "Other") is None
+
+    quiz = load(storage)
+    assert (quiz.host_id, quiz.name) == ("HOST01", "Test")
+    assert (quiz.question_id, quiz.is_question_open) == (0, False)
+
+
+def test_missing_quiz_does_not_exist(storage):
+    assert not storage.quiz_access("QUIZ01").exists()
+
+
+def test_connections(storage):
+    storage.create_quiz("QUIZ01", "HOST01", "Test")
+    load(storage).add_client("conn-host", "HOST01")
+    load(storage).add_client("conn-player", "PLAYER")
+
+    quiz = load(storage)
+    assert quiz.clients == {"conn-host": "HOST01", "conn-player": "PLAYER"}
+    assert quiz.get_client_id("conn-player") == "PLAYER"
+    assert storage.quiz_for_connection("conn-player") == "QUIZ01"
+
+    load(storage).remove_client("conn-player")
+    quiz = load(storage)
+    assert quiz.clients == {"conn-host": "HOST01"}
+    assert quiz.get_client_id("conn-player") is None
+    assert storage.quiz_for_connection("conn-player") is None
+
+
+def test_players(storage):
+    storage.create_quiz("QUIZ01", "HOST01", "Test")
+    load(storage).add_or_update_player("PLAYER", "Name")
+    load(storage).add_or_update_player("PLAYER", "New Name", "avatar")
+
+    assert load(storage).players == {"PLAYER": Player("New Name", "avatar")}
+
+
+def test_pool_questions(storage):
+    storage.create_quiz("QUIZ01", "HOST01", "Test")
+    first = Question("PLAYER1", "What is the answer?", ["A", "B", "C", "D"], 1)
+    replaced = Question("PLAYER1", "What is the question?", ["A", "B", "C", "D"], 2)
+    other = Question("PLAYER2", "Who is the author?", ["A", "B", "C", "D"], 3)
+    for question in [first, replaced, other]:
+        assert load(storage).set_pool_question(question)
+
+    quiz = load(storage)
+    assert quiz.get_pool_question("PLAYER1") == replaced
+    assert quiz.get_pool_question("PLAYER3") is None
+    assert sorted(quiz.get_pool_questions(), key=lambda q: q.author_id) == [replaced, other]
+
+
+def test_counts(storage):
+    storage.create_quiz("QUIZ01", "HOST01", "Test")
+    load(storage).add_client("conn-host", "HOST01")
+    load(storage).add_or_update_player("PLAYER", "Name")
+    load(storage).add_client("conn-player-1", "PLAYER")
+    load(storage).add_client("conn-player-2", "PLAYER")
+    load(storage).set_pool_question(Question("PLAYER", "What is the answer?", ["A", "B"], 1))
+
+    assert load(storage).get_counts() == QuizCounts(
+        num_players=1, num_pool_questions=1, num_host_connections=1, num_player_connections=2)
+
+
+def test_globals(storage):
+    globals_access = storage.globals_access()
+    assert globals_access.root_user is None
+
+    assert globals_access.set_root_user("ROOT")
+    assert globals_access.set_default_quiz_id("QUIZ01")
+    assert storage.globals_access().root_user == "ROOT"
+    assert storage.globals_access().default_quiz_id == "QUIZ01"
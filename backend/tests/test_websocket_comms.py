@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+import pytest
+from Common import ConnectionGone, Payload
+from WebSocketHandler import AwsWebsocketComms
+
+
+class GoneException(Exception):
+    pass
+
+
+class FakeGatewayClient:
+    """
+    Management API client that takes a while to post, and tracks how many posts overlap.
+    """
+
+    class exceptions:
+        GoneException = GoneException
+
+    def __init__(self, delay=0.1, gone=()):
+        self.delay = delay
+        self.gone = set(gone)
+        self.posted = {}
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def post_to_connection(self, ConnectionId, Data):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            if ConnectionId in self.gone:
+                raise GoneException(ConnectionId)
+            self.posted[ConnectionId] = Data
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def create_comms(client) -> AwsWebsocketComms:
+    comms = AwsWebsocketComms({"domainName": "example.com", "stage": "test"})
+    comms.gateway_client = client
+    return comms
+
+
+def test_sends_to_recipients_concurrently():
+    client = FakeGatewayClient(delay=0.1)
+    comms = create_comms(client)
+    connections = [f"conn-{i}" for i in range(8)]
+
+    async def broadcast():
+        await asyncio.gather(*(comms.send(connection, "message") for connection in connections))
+
+    start = time.perf_counter()
+    asyncio.run(broadcast())
+
+    assert time.perf_counter() - start < 0.1 * len(connections) / 2
+    assert client.max_active > 1
+    assert client.posted == dict.fromkeys(connections, "message")
+
+
+def test_payload_is_sent_as_encoded_data():
+    client = FakeGatewayClient(delay=0)
+    payload = Payload.from_message({"type": "test"})
+
+    asyncio.run(create_comms(client).send("conn", payload))
+    assert client.posted["conn"] == payload.data
+
+
+def test_gone_connection_raises_connection_gone():
+    client = FakeGatewayClient(delay=0, gone=["conn-gone"])
+
+    with pytest.raises(ConnectionGone):
+        asyncio.run(create_comms(client).send("conn-gone", "message"))